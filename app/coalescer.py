@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from app.command_router import SendMessage
+from app.messages import OutboundMessage, make_message
+from app.metrics import metrics
+from app.text_split import MESSAGE_BYTE_LIMITS
+
+logger = logging.getLogger("assistant")
+
+_coalesced_total = metrics.counter("notify_coalesced_total", "Notifications merged into a preceding message")
+_flushed_total = metrics.counter("notify_coalesce_flushes_total", "Merged notifications sent to WeCom")
+
+
+class _Buffer:
+    __slots__ = ("msg_type", "parts", "size", "timer")
+
+    def __init__(self, msg_type: str, content: str) -> None:
+        self.msg_type = msg_type
+        self.parts = [content]
+        self.size = len(content.encode("utf-8"))
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class _UserLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        # 持有和等待该锁的协程数
+        self.users = 0
+
+
+class NotificationCoalescer:
+    """
+    合并同一用户短时间内连续发送的 text / markdown 小消息：
+    - 同一用户、同一消息类型的连续消息在 window 秒内合并为一条，合并后不超过该类型的字节上限
+    - 其他类型的消息或类型切换会先发送已缓存的内容，保证顺序
+    - 同一用户的消息串行发送；用户没有发送中或等待发送的消息时删除其锁，锁的数量只与正在发送的用户数有关
+    """
+
+    def __init__(self, send: SendMessage, window: float, separator: str = "\n") -> None:
+        self._send = send
+        self.window = window
+        self.separator = separator
+        self._sep_size = len(separator.encode("utf-8"))
+        self._buffers: dict[str, _Buffer] = {}
+        self._locks: dict[str, _UserLock] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    @asynccontextmanager
+    async def _locked(self, to_user: str) -> AsyncIterator[None]:
+        entry = self._locks.get(to_user)
+        if entry is None:
+            entry = self._locks[to_user] = _UserLock()
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if not entry.users:
+                del self._locks[to_user]
+
+    async def send(self, to_user: str, message: OutboundMessage) -> Any:
+        msg_type = message.msg_type.lower()
+        limit = MESSAGE_BYTE_LIMITS.get(msg_type)
+        content = message.payload.get("content") if limit else None
+        if not isinstance(content, str) or len(message.payload) != 1:
+            await self.flush(to_user)
+            async with self._locked(to_user):
+                return await self._send(to_user, message)
+
+        size = len(content.encode("utf-8"))
+        while True:
+            buffer = self._buffers.get(to_user)
+            if buffer is None:
+                break
+            if buffer.msg_type == msg_type and buffer.size + self._sep_size + size <= limit:
+                buffer.parts.append(content)
+                buffer.size += self._sep_size + size
+                _coalesced_total.inc(msg_type=msg_type)
+                return None
+            await self.flush(to_user)
+
+        if size >= limit:
+            async with self._locked(to_user):
+                return await self._send(to_user, message)
+        buffer = self._buffers[to_user] = _Buffer(msg_type, content)
+        buffer.timer = asyncio.get_running_loop().call_later(self.window, self._flush_soon, to_user, buffer)
+        return None
+
+    def _flush_soon(self, to_user: str, buffer: _Buffer) -> None:
+        if self._buffers.get(to_user) is buffer:
+            task = asyncio.create_task(self.flush(to_user))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def flush(self, to_user: str | None = None) -> None:
+        """
+        立即发送缓存的消息，不传 to_user 时发送全部用户的缓存
+        """
+        if to_user is None:
+            await asyncio.gather(*(self.flush(user) for user in list(self._buffers)))
+            return
+
+        async with self._locked(to_user):
+            buffer = self._buffers.pop(to_user, None)
+            if buffer is not None:
+                if buffer.timer:
+                    buffer.timer.cancel()
+                if len(buffer.parts) > 1:
+                    _flushed_total.inc(msg_type=buffer.msg_type)
+                content = self.separator.join(buffer.parts)
+                try:
+                    await self._send(to_user, make_message(buffer.msg_type, {"content": content}))
+                except Exception:
+                    logger.exception("Send coalesced message failed, user=%s", to_user)
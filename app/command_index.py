@@ -0,0 +1,129 @@
+import bisect
+import logging
+from typing import Iterable
+
+logger = logging.getLogger("assistant")
+
+
+def _deletions(word: str, distance: int) -> set[str]:
+    """
+    word 删除至多 distance 个字符得到的所有字符串（含 word 本身）
+    """
+    result = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {item[:i] + item[i + 1:] for item in frontier for i in range(len(item))}
+        result |= frontier
+    return result
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    编辑距离（含相邻字符交换），超过 limit 时提前返回 limit + 1
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: list[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1]
+
+
+class CommandIndex:
+    """
+    指令名索引，构建后只读：
+    - 指令名、别名和只对应一个指令的前缀预先展开到同一个 dict，查找只需一次哈希
+    - 有歧义的前缀通过有序列表 + bisect 列出候选
+    - 相似指令建议：删除索引，把每个名字删除至多 max_distance 个字符的结果映射回名字；
+      查询时对输入做同样的删除，只需与少量候选计算编辑距离，与指令总数无关
+    """
+
+    max_distance = 2
+
+    def __init__(self, entries: Iterable[tuple[str, Iterable[str]]], min_prefix: int = 2) -> None:
+        """
+        :param entries: (指令名, 别名列表)
+        :param min_prefix: 前缀匹配的最短长度
+        """
+        self.min_prefix = min_prefix
+        # 指令名 / 别名 -> 指令名
+        self._names: dict[str, str] = {}
+        aliases: list[tuple[str, str]] = []
+        for command, command_aliases in entries:
+            self._names[command] = command
+            aliases += [(alias.lower(), command) for alias in command_aliases]
+        for alias, command in aliases:
+            owner = self._names.setdefault(alias, command)
+            if owner != command:
+                logger.warning("Command alias %s of %s conflicts with %s, ignored", alias, command, owner)
+        self._sorted = sorted(self._names)
+        self._longest = max((len(name) for name in self._names), default=0)
+
+        owners: dict[str, set[str]] = {}
+        for name, command in self._names.items():
+            for end in range(min_prefix, len(name)):
+                owners.setdefault(name[:end], set()).add(command)
+        self._lookup = {prefix: next(iter(commands)) for prefix, commands in owners.items() if len(commands) == 1}
+        self._lookup.update(self._names)
+
+        self._deletes: dict[str, set[str]] = {}
+        for name in self._names:
+            for variant in _deletions(name, self.max_distance):
+                self._deletes.setdefault(variant, set()).add(name)
+
+    def _distance_for(self, token: str) -> int:
+        # 短输入只允许 1 处差异，否则几乎所有短指令都会成为候选
+        return 1 if len(token) <= 4 else self.max_distance
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def resolve(self, token: str) -> str | None:
+        """
+        返回 token 对应的指令名：精确匹配指令名或别名，或只对应一个指令的前缀
+        """
+        return self._lookup.get(token)
+
+    def completions(self, token: str, limit: int = 3) -> list[str]:
+        """
+        以 token 为前缀的指令名（去重，按名字排序）
+        """
+        if len(token) < self.min_prefix:
+            return []
+        lo = bisect.bisect_left(self._sorted, token)
+        hi = bisect.bisect_left(self._sorted, token + "\U0010ffff", lo)
+        commands: set[str] = set()
+        for i in range(lo, hi):
+            commands.add(self._names[self._sorted[i]])
+        return sorted(commands)[:limit]
+
+    def suggest(self, token: str, limit: int = 3) -> list[str]:
+        """
+        返回与 token 编辑距离最小的若干指令名（去重，按距离和名字排序）
+        """
+        distance = self._distance_for(token)
+        # 删除变体的数量随输入长度平方增长，比最长的名字还长 distance 以上的输入不可能匹配，直接返回
+        if len(token) > self._longest + distance:
+            return []
+        candidates: set[str] = set()
+        for variant in _deletions(token, distance):
+            candidates |= self._deletes.get(variant, set())
+        best: dict[str, tuple[int, str]] = {}
+        for name in candidates:
+            score = edit_distance(token, name, distance)
+            if score > distance:
+                continue
+            command = self._names[name]
+            if command not in best or (score, name) < best[command]:
+                best[command] = (score, name)
+        ranked = sorted(best, key=lambda command: (best[command][0], command))
+        return ranked[:limit]
@@ -1,17 +1,94 @@
 import asyncio
-import datetime as dt
-import os
-from dataclasses import dataclass
-from typing import Any, Awaitable, Callable, TypeAlias
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Collection, Iterator, TypeAlias
 
+from app.command_index import CommandIndex
+from app.messages import OutboundMessage, make_message
+from app.priority import using_priority
+from app.progress import ProgressReporter
+from app.result_cache import ResultCache
+from app.sessions import Session, SessionStore
 
-@dataclass(frozen=True)
-class OutboundMessage:
-    msg_type: str
-    payload: dict[str, Any]
+if TYPE_CHECKING:
+    from app.command_stats import CommandStats, Usage
+    from app.cpu_pool import CpuHandlerPool
+    from app.loop_monitor import LoopMonitor
+    from app.plugins import PluginRegistry
 
+logger = logging.getLogger("assistant")
 
-SendMessage: TypeAlias = Callable[[str, OutboundMessage], Awaitable[None]]
+
+SendMessage: TypeAlias = Callable[[str, OutboundMessage], Awaitable[Any]]
+# (to_user, response_code, template_card) -> 是否更新成功
+UpdateCard: TypeAlias = Callable[[str, str, dict[str, Any]], Awaitable[bool]]
+# (msgid) -> 是否撤回成功
+RecallMessage: TypeAlias = Callable[[str], Awaitable[bool]]
+# (图片路径) -> 永久图片链接，用于图文消息等的 picurl
+UploadImage: TypeAlias = Callable[[str], Awaitable[str | None]]
+# (userid) -> 通讯录中的成员详情，失败时为 None
+LookupUser: TypeAlias = Callable[[str], Awaitable[dict[str, Any] | None]]
+
+
+# 多应用模式下用 "应用名|userid" 区分不同应用的同名用户，"|" 不会出现在 userid 中
+_SCOPE_SEP = "|"
+
+
+def scope_user_id(tenant: str, user_id: str) -> str:
+    return f"{tenant}{_SCOPE_SEP}{user_id}" if tenant else user_id
+
+
+def split_scoped_user_id(scoped: str) -> tuple[str, str]:
+    tenant, sep, user_id = scoped.partition(_SCOPE_SEP)
+    return (tenant, user_id) if sep else ("", scoped)
+
+
+@dataclass
+class TaskInfo:
+    task_id: str
+    # 带应用前缀的用户（scope_user_id），不同应用的同名 userid 互不可见
+    user_id: str
+    command: str
+    arg: str
+    task: asyncio.Task
+    started_at: float = field(default_factory=time.monotonic)
+    deadline: float | None = None
+    progress: str = ""
+
+    def cancel(self) -> bool:
+        return self.task.cancel()
+
+
+class TaskRegistry:
+    """
+    记录正在执行的指令任务，每个任务有唯一ID、截止时间和取消句柄
+    """
+
+    def __init__(self) -> None:
+        self._ids = itertools.count(1)
+        self._tasks: dict[str, TaskInfo] = {}
+
+    def add(self, user_id: str, command: str, arg: str, task: asyncio.Task, timeout: float | None) -> TaskInfo:
+        task_id = str(next(self._ids))
+        deadline = time.monotonic() + timeout if timeout else None
+        info = TaskInfo(task_id=task_id, user_id=user_id, command=command, arg=arg, task=task, deadline=deadline)
+        self._tasks[task_id] = info
+        return info
+
+    def remove(self, task_id: str) -> None:
+        self._tasks.pop(task_id, None)
+
+    def get(self, task_id: str) -> TaskInfo | None:
+        return self._tasks.get(task_id)
+
+    def list_tasks(self, user_id: str | None = None) -> list[TaskInfo]:
+        return [info for info in self._tasks.values() if user_id is None or info.user_id == user_id]
+
+    def __len__(self) -> int:
+        return len(self._tasks)
 
 
 @dataclass
@@ -19,18 +96,100 @@ class CommandContext:
     user_id: str
     content: str
     send_message: SendMessage | None = None
+    task: TaskInfo | None = None
+    update_card: UpdateCard | None = None
+    recall_message: RecallMessage | None = None
+    tenant: str = ""
+    upload_image: UploadImage | None = None
+    lookup_user: LookupUser | None = None
+    sessions: SessionStore | None = None
+
+    @property
+    def scoped_user_id(self) -> str:
+        return scope_user_id(self.tenant, self.user_id)
+
+    def set_progress(self, progress: str) -> None:
+        """
+        更新当前任务进度，`tasks` 指令中可见
+        """
+        if self.task:
+            self.task.progress = progress
+
+    async def run_subprocess(self, *args: str, timeout: float | None = None) -> tuple[int, bytes, bytes]:
+        """
+        执行子进程并返回 (returncode, stdout, stderr)；任务被取消或超时时会杀掉子进程
+        """
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+                await asyncio.shield(proc.wait())
+            raise
+        return proc.returncode, stdout, stderr
+
+    async def session(self) -> Session | None:
+        """
+        当前用户的会话，没有或已过期时返回 None
+        """
+        if self.sessions is None:
+            return None
+        return await self.sessions.get(self.scoped_user_id)
 
-    async def notify(self, msg_type: str, payload: dict[str, Any]) -> None:
-        if self.send_message:
-            await self.send_message(self.user_id, OutboundMessage(msg_type=msg_type, payload=payload))
+    async def continue_with(self, step: str, data: dict[str, Any] | None = None, ttl: float | None = None) -> None:
+        """
+        保存会话数据，并把该用户的下一条消息交给名为 step 的续接处理函数
+        """
+        if self.sessions is None:
+            raise RuntimeError("session store is not configured")
+        session = await self.session() or Session(self.scoped_user_id)
+        session.command = self.task.command if self.task else session.command
+        session.step = step
+        if data is not None:
+            session.data = data
+        await self.sessions.save(session, ttl=ttl)
 
-    async def notify_text(self, content: str) -> None:
-        await self.notify("text", {"content": content})
+    async def end_session(self) -> None:
+        if self.sessions is not None:
+            await self.sessions.delete(self.scoped_user_id)
 
-    async def notify_markdown(self, content: str) -> None:
-        await self.notify("markdown", {"content": content})
+    async def notify(self, msg_type: str, payload: dict[str, Any], priority: str | None = None) -> Any:
+        """
+        :param priority: 发送优先级 interactive / normal / bulk，默认沿用指令来源（用户消息为 interactive，定时任务为 bulk）
+        """
+        if not self.send_message:
+            return None
+        message = make_message(msg_type, payload)
+        if priority is None:
+            return await self.send_message(self.user_id, message)
+        with using_priority(priority):
+            return await self.send_message(self.user_id, message)
 
-    async def notify_textcard(self, title: str, description: str, url: str, btn: str = "详情") -> None:
+    def progress(self, title: str, min_interval: float | None = None) -> ProgressReporter:
+        """
+        创建进度卡片，进度在同一张卡片上节流更新，避免刷屏
+        """
+        return ProgressReporter(self, title, min_interval=min_interval)
+
+    async def notify_text(self, content: str, priority: str | None = None) -> None:
+        await self.notify("text", {"content": content}, priority)
+
+    async def notify_markdown(self, content: str, priority: str | None = None) -> None:
+        await self.notify("markdown", {"content": content}, priority)
+
+    async def notify_textcard(
+            self,
+            title: str,
+            description: str,
+            url: str,
+            btn: str = "详情",
+            priority: str | None = None,
+    ) -> None:
         await self.notify(
             "textcard",
             {
@@ -39,142 +198,373 @@ class CommandContext:
                 "url": url,
                 "btn": btn,
             },
+            priority,
         )
 
-    async def notify_image(self, media_path: str) -> None:
-        await self.notify("image", {"media_path": media_path})
+    async def notify_image(self, media_path: str, priority: str | None = None) -> None:
+        await self.notify("image", {"media_path": media_path}, priority)
 
-    async def notify_file(self, file_path: str) -> None:
-        await self.notify("file", {"file_path": file_path})
+    async def notify_file(self, file_path: str, priority: str | None = None) -> None:
+        await self.notify("file", {"file_path": file_path}, priority)
 
-    async def notify_news(self, articles: list) -> None:
-        await self.notify("news", {"articles": articles})
+    async def notify_news(self, articles: list, priority: str | None = None) -> None:
+        await self.notify("news", {"articles": articles}, priority)
 
 
 Handler: TypeAlias = Callable[[str, CommandContext], Awaitable[None]]
 
+# 处于多步指令中时，发送这些词结束当前会话
+EXIT_WORDS = frozenset({"exit", "quit", "退出"})
+
+
+def _check_module_level(command: str, handler: Handler) -> None:
+    if hasattr(handler, "__self__") or handler.__qualname__ != handler.__name__:
+        raise ValueError(f"cpu bound handler must be a module level function: {command}")
+
 
 class CommandRouter:
-    def __init__(self) -> None:
-        self._handlers: dict[str, Handler] = {
-            "help": self._handle_help,
-            "ping": self._handle_ping,
-            "time": self._handle_time,
-            "echo": self._handle_echo,
-            "msgtest": self._handle_msg_test,
-            "longtask": self._handle_longtask,
-        }
-
-    async def dispatch(self, ctx: CommandContext) -> None:
+    def __init__(
+            self,
+            task_timeout: float | None = None,
+            cpu_pool: "CpuHandlerPool | None" = None,
+            result_cache: ResultCache | None = None,
+            loop_monitor: "LoopMonitor | None" = None,
+            plugins: "PluginRegistry | None" = None,
+            sessions: SessionStore | None = None,
+            stats: "CommandStats | None" = None,
+    ) -> None:
+        self.task_timeout = task_timeout
+        self.stats = stats
+        self.sessions = sessions
+        self.tasks = TaskRegistry()
+        self.result_cache = result_cache or ResultCache()
+        self._cpu_pool = cpu_pool
+        self._loop_monitor = loop_monitor
+        self._plugins = plugins
+        # 进程池子进程对应的插件重新加载次数，变化后重建子进程
+        self._plugin_reloads = plugins.reloads if plugins is not None else 0
+        self._cpu_bound: set[str] = set()
+        self._cache_ttl: dict[str, float] = {}
+        self._handlers: dict[str, Handler] = {}
+        self._steps: dict[str, Handler] = {}
+        # 指令名 -> (用法, 说明, 别名)，按注册顺序生成帮助
+        self._help: dict[str, tuple[str, str, tuple[str, ...]]] = {}
+        # 不在帮助中列出的指令（如管理员指令）
+        self._hidden: set[str] = set()
+        # (插件版本, 帮助文本) / (插件版本, 索引)，注册指令或插件重新加载后失效
+        self._help_cache: tuple[int, str] | None = None
+        self._index_cache: tuple[int, CommandIndex] | None = None
+        self.register("help", self._handle_help, help="查看帮助", aliases=("帮助",))
+        self.register("tasks", self._handle_tasks, help="查看执行中的任务", aliases=("任务",))
+        self.register("cancel", self._handle_cancel, help="取消任务", usage="cancel <任务ID|all>", aliases=("取消",))
+        # 不登记到任务列表、不受超时限制的内置指令
+        self._untracked = {"help", "tasks", "cancel"}
+
+    def register(
+            self,
+            command: str,
+            handler: Handler,
+            cpu_bound: bool = False,
+            cache_ttl: float | None = None,
+            help: str = "",
+            usage: str = "",
+            aliases: tuple[str, ...] = (),
+            hidden: bool = False,
+    ) -> None:
+        """
+        注册指令，同名时优先于插件指令
+        :param command: 指令名
+        :param handler: 处理函数
+        :param cpu_bound: CPU 密集型指令，在进程池中执行，handler 必须是模块级函数
+        :param cache_ttl: 幂等指令的结果缓存秒数，相同指令和参数在有效期内直接回放缓存的消息
+        :param help: 帮助中的说明
+        :param usage: 帮助中的用法，默认为指令名
+        :param aliases: 别名（如中文名），与指令名同样可以使用
+        :param hidden: 不在帮助和相似指令建议中列出
+        """
+        command = command.lower()
+        if cpu_bound:
+            _check_module_level(command, handler)
+            self._cpu_bound.add(command)
+        else:
+            self._cpu_bound.discard(command)
+        if cache_ttl:
+            self._cache_ttl[command] = cache_ttl
+        else:
+            self._cache_ttl.pop(command, None)
+        self._handlers[command] = handler
+        self._help[command] = (usage or command, help, tuple(alias.lower() for alias in aliases))
+        if hidden:
+            self._hidden.add(command)
+        else:
+            self._hidden.discard(command)
+        self._help_cache = self._index_cache = None
+
+    def register_continuation(self, step: str, handler: Handler) -> None:
+        """
+        注册续接处理函数，指令中调用 ctx.continue_with(step, data) 后用户的下一条消息交给它处理；
+        插件中用 @continuation 声明
+        """
+        self._steps[step] = handler
+
+    async def dispatch(self, ctx: CommandContext, commands: Collection[str] | None = None) -> None:
+        """
+        分发指令
+        :param ctx: 指令上下文
+        :param commands: 允许使用的指令，None 表示全部；help / tasks / cancel 始终可用
+        """
         text = (ctx.content or "").strip()
+        if self.sessions is not None:
+            ctx.sessions = self.sessions
+            # 多步指令进行中仍可使用 help / tasks / cancel，不作为续接步骤的输入
+            if not self.is_builtin(text) and await self._continue(text, ctx, commands):
+                return
         if not text:
             await ctx.notify_text(self._help_text())
             return
 
         parts = text.split(maxsplit=1)
-        command = parts[0].lower()
+        token = parts[0].lower()
         arg = parts[1] if len(parts) > 1 else ""
 
-        handler = self._handlers.get(command)
+        if self._plugins is not None and self._plugins.scan_due():
+            await asyncio.to_thread(self._plugins.rescan)
+        command = self._command_index().resolve(token)
+        allowed = command is not None and self._allowed(command, commands)
+        handler = self._handlers.get(command) if allowed else None
+        cpu_bound, cache_ttl = command in self._cpu_bound, self._cache_ttl.get(command)
+        if handler is None and allowed and self._plugins is not None and command in self._plugins:
+            # 首次使用或文件有变化时在线程中导入模块，避免阻塞事件循环
+            handler = self._plugins.ready(command) or await asyncio.to_thread(self._plugins.load, command)
+            await self._sync_cpu_pool()
+            spec = self._plugins.get(command)
+            if handler and spec:
+                if spec.cpu_bound:
+                    _check_module_level(command, handler)
+                cpu_bound, cache_ttl = spec.cpu_bound, spec.cache_ttl
         if not handler:
-            await ctx.notify_text(f"未知指令: {command}\n\n" + self._help_text())
+            await ctx.notify_text(self._unknown_text(token, commands))
+            return
+        if command in self._untracked:
+            with self._track(command, ctx):
+                await self._watch(command, handler(arg, ctx))
             return
-        await handler(arg, ctx)
+        await self._run_tracked(command, handler, arg, ctx, cpu_bound, cache_ttl)
+
+    async def _continue(self, text: str, ctx: CommandContext, commands: Collection[str] | None) -> bool:
+        """
+        用户有等待中的续接步骤时把消息交给对应的处理函数；返回 False 表示按普通指令处理
+        """
+        session = await self.sessions.get(ctx.scoped_user_id)
+        if session is None or not session.step:
+            return False
+        if text.lower() in EXIT_WORDS:
+            await self.sessions.delete(session.key)
+            await ctx.notify_text("已退出")
+            return True
+        handler = self._steps.get(session.step)
+        if handler is None and self._plugins is not None:
+            handler = await asyncio.to_thread(self._plugins.step, session.step, session.command)
+        if handler is None or (session.command and not self._allowed(session.command, commands)):
+            logger.warning("Continuation not found, user=%s, step=%s", ctx.user_id, session.step)
+            await self.sessions.delete(session.key)
+            return False
+        # 续接步骤只执行一次，需要继续时由处理函数再次调用 ctx.continue_with
+        step_name, session.step = session.step, None
+        await self.sessions.save(session)
+        await self._run_tracked(session.command or step_name, handler, text, ctx)
+        return True
+
+    async def _sync_cpu_pool(self) -> None:
+        # 子进程中已导入的仍是旧版本模块，插件重新加载后换用新的子进程
+        if self._cpu_pool is not None and self._plugins.reloads != self._plugin_reloads:
+            self._plugin_reloads = self._plugins.reloads
+            await self._cpu_pool.recycle()
+
+    def resolve(self, content: str) -> str | None:
+        """
+        消息中的指令名（别名、唯一前缀解析为完整指令名），与 dispatch 的查找方式一致；无法识别时返回 None
+        """
+        parts = (content or "").split(maxsplit=1)
+        return self._command_index().resolve(parts[0].lower()) if parts else None
+
+    def is_builtin(self, content: str) -> bool:
+        """
+        消息是否为 help / tasks / cancel 等内置指令（含别名）
+        """
+        return self.resolve(content) in self._untracked
+
+    def _allowed(self, command: str, commands: Collection[str] | None) -> bool:
+        return commands is None or command in commands or command in self._untracked
+
+    def _command_index(self) -> CommandIndex:
+        version = self._plugins.version if self._plugins is not None else 0
+        if self._index_cache is None or self._index_cache[0] != version:
+            entries = [(command, aliases) for command, (_usage, _help, aliases) in self._help.items()]
+            if self._plugins is not None:
+                entries += [(spec.name, spec.aliases) for spec in self._plugins.specs() if spec.name not in self._help]
+            self._index_cache = (version, CommandIndex(entries))
+        return self._index_cache[1]
+
+    def _unknown_text(self, token: str, commands: Collection[str] | None) -> str:
+        index = self._command_index()
+        candidates = index.completions(token, limit=5) or index.suggest(token, limit=5)
+        suggestions = [
+            command for command in candidates if self._allowed(command, commands) and command not in self._hidden
+        ][:3]
+        if not suggestions:
+            return f"未知指令: {token}\n\n" + self._help_text()
+        return f"未知指令: {token}\n你是不是想输入: {'、'.join(suggestions)}\n发送 help 查看全部指令"
+
+    def _watch(self, command: str, awaitable: Awaitable[None]) -> Awaitable[None]:
+        if self._loop_monitor is None:
+            return awaitable
+        return self._loop_monitor.watch(awaitable, f"command {command}")
+
+    @contextmanager
+    def _track(self, command: str, ctx: CommandContext) -> Iterator["Usage | None"]:
+        if self.stats is None:
+            yield None
+            return
+        with self.stats.track(command, ctx) as usage:
+            yield usage
+
+    async def _run_tracked(
+            self,
+            command: str,
+            handler: Handler,
+            arg: str,
+            ctx: CommandContext,
+            cpu_bound: bool = False,
+            cache_ttl: float | None = None,
+    ) -> None:
+        if cache_ttl:
+            coro = self._run_cached(command, handler, arg, ctx, cpu_bound, cache_ttl)
+        else:
+            coro = self._invoke(handler, arg, ctx, cpu_bound)
+        with self._track(command, ctx) as usage:
+            await self._await_task(command, coro, arg, ctx, usage)
+
+    async def _await_task(
+            self,
+            command: str,
+            coro: Awaitable[None],
+            arg: str,
+            ctx: CommandContext,
+            usage: "Usage | None",
+    ) -> None:
+        task = asyncio.create_task(self._watch(command, coro), name=f"command {command} {ctx.scoped_user_id}")
+        info = self.tasks.add(ctx.scoped_user_id, command, arg, task, self.task_timeout)
+        ctx.task = info
+        try:
+            await asyncio.wait_for(task, timeout=self.task_timeout or None)
+        except asyncio.TimeoutError:
+            if usage is not None:
+                usage.outcome = "timeout"
+            logger.warning("Command timeout, user=%s, task=%s, command=%s", ctx.user_id, info.task_id, command)
+            await ctx.notify_text(f"任务 #{info.task_id} {command} 执行超时（{self.task_timeout:g} 秒），已终止")
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if current and current.cancelling():
+                raise
+            if usage is not None:
+                usage.outcome = "cancelled"
+            logger.info("Command cancelled, user=%s, task=%s, command=%s", ctx.user_id, info.task_id, command)
+            await ctx.notify_text(f"任务 #{info.task_id} {command} 已取消")
+        finally:
+            self.tasks.remove(info.task_id)
+
+    def _invoke(self, handler: Handler, arg: str, ctx: CommandContext, cpu_bound: bool) -> Awaitable[None]:
+        if cpu_bound and self._cpu_pool:
+            return self._cpu_pool.run(handler, arg, ctx)
+        return handler(arg, ctx)
+
+    async def _run_cached(
+            self,
+            command: str,
+            handler: Handler,
+            arg: str,
+            ctx: CommandContext,
+            cpu_bound: bool,
+            cache_ttl: float,
+    ) -> None:
+        async def produce() -> list[OutboundMessage]:
+            recorded: list[OutboundMessage] = []
+
+            async def record(_to_user: str, message: OutboundMessage) -> None:
+                recorded.append(message)
+
+            recorder = CommandContext(
+                user_id=ctx.user_id,
+                content=ctx.content,
+                send_message=record,
+                task=ctx.task,
+                tenant=ctx.tenant,
+                upload_image=ctx.upload_image,
+                lookup_user=ctx.lookup_user,
+                sessions=ctx.sessions,
+            )
+            await self._watch(command, self._invoke(handler, arg, recorder, cpu_bound))
+            return recorded
+
+        # 不同应用的同名指令可能返回不同内容，按应用区分缓存
+        key = (ctx.tenant, command, arg.strip())
+        messages = await self.result_cache.get_or_run(key, cache_ttl, produce)
+        if ctx.send_message:
+            for message in messages:
+                await ctx.send_message(ctx.user_id, message)
 
     async def _handle_help(self, arg: str, ctx: CommandContext) -> None:
         await ctx.notify_text(self._help_text())
 
-    async def _handle_ping(self, arg: str, ctx: CommandContext) -> None:
-        await ctx.notify_text("pong")
-
-    async def _handle_time(self, arg: str, ctx: CommandContext) -> None:
-        now = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        await ctx.notify_text(f"当前服务时间: {now}")
+    async def _handle_tasks(self, arg: str, ctx: CommandContext) -> None:
+        tasks = self.tasks.list_tasks(ctx.scoped_user_id)
+        if not tasks:
+            await ctx.notify_text("当前没有执行中的任务")
+            return
+        now = time.monotonic()
+        lines = ["执行中的任务:"]
+        for info in tasks:
+            line = f"#{info.task_id} {info.command} 已运行 {now - info.started_at:.0f} 秒"
+            if info.deadline:
+                line += f"，剩余 {max(0.0, info.deadline - now):.0f} 秒"
+            if info.progress:
+                line += f"，进度 {info.progress}"
+            lines.append(line)
+        await ctx.notify_text("\n".join(lines))
 
-    async def _handle_echo(self, arg: str, ctx: CommandContext) -> None:
-        if not arg:
-            await ctx.notify_text("用法: echo 你的内容")
+    async def _handle_cancel(self, arg: str, ctx: CommandContext) -> None:
+        target = arg.strip().lstrip("#")
+        if not target:
+            await ctx.notify_text("用法: cancel <任务ID> 或 cancel all")
             return
-        await ctx.notify_text(arg)
-
-    async def _handle_msg_test(self, arg: str, ctx: CommandContext) -> None:
-        # 任务卡片
-        title = "任务卡片通知"
-        description = "这是一个 textcard 示例消息。"
-        await ctx.notify_textcard(
-            title=title,
-            description=description,
-            url="https://github.com/yanxiang1120/wecom_assistant",
-            btn="查看",
-        )
-        # markdown
-        content = "`markdown` 通知" \
-                  "\n您的会议室已经预定，稍后会同步到`邮箱`" \
-                  "\n>**事项详情**" \
-                  "\n>事　项：<font color=\"info\">开会</font>" \
-                  "\n>组织者：@miglioguan" \
-                  "\n>参与者：@miglioguan、@kunliu、@jamdeezhou、@kanexiong、@kisonwang" \
-                  "\n>" \
-                  "\n>会议室：<font color=\"info\">广州TIT 1楼 301</font>" \
-                  "\n>日　期：<font color=\"warning\">2026年2月10日</font>" \
-                  "\n>时　间：<font color=\"comment\">上午9:00-11:00</font>" \
-                  "\n>" \
-                  "\n>请准时参加会议。" \
-                  "\n>" \
-                  "\n>如需修改会议信息，请点击：[修改会议信息](https://github.com/yanxiang1120/wecom_assistant)"
-        await ctx.notify_markdown(content)
-        # Image
-        script_path = os.path.dirname(__file__)
-        project_path = os.path.abspath(os.path.dirname(script_path))
-        await ctx.notify_image(f"{project_path}/tmp/goodluck.png")
-        # File
-        await ctx.notify_file(f"{project_path}/tmp/record.csv")
-        # 图文卡片
-        articles = [
-            {
-                "title": "标题1",
-                "description": "简介1",
-                "url": "https://github.com/yanxiang1120/wecom_assistant",
-                "picurl": "https://avatars.githubusercontent.com/u/4798762?v=4"
-            },
-            {
-                "title": "标题2",
-                "description": "简介2",
-                "url": "https://github.com/yanxiang1120/wecom_assistant",
-                "picurl": "https://avatars.githubusercontent.com/u/4798762?v=4"
-            },
-            {
-                "title": "标题3",
-                "description": "简介3",
-                "url": "https://github.com/yanxiang1120/wecom_assistant",
-                "picurl": "https://avatars.githubusercontent.com/u/4798762?v=4"
-            },
-            {
-                "title": "标题4",
-                "description": "简介4",
-                "url": "https://github.com/yanxiang1120/wecom_assistant",
-                "picurl": "https://avatars.githubusercontent.com/u/4798762?v=4"
-            }
-        ]
-        await ctx.notify_news(articles)
-
-    async def _handle_longtask(self, arg: str, ctx: CommandContext) -> None:
-        # task start
-        await ctx.notify_text(f"任务开始执行。。。")
-        # exec task
-        seconds = 5
-        await asyncio.sleep(seconds)
-        # task finish
-        await ctx.notify_markdown(f"**任务执行完成**\n耗时：`{seconds}` 秒")
-
-    @staticmethod
-    def _help_text() -> str:
-        return (
-            "可用指令:\n"
-            "1) help - 查看帮助\n"
-            "2) ping - 你还活着吗\n"
-            "3) time - 返回服务当前时间\n"
-            "4) echo <文本> - 回显文本\n"
-            "5) msgtest - 消息模板测试\n"
-            "6) longtask - 耗时任务模板\n"
-        )
+        if target.lower() == "all":
+            infos = self.tasks.list_tasks(ctx.scoped_user_id)
+        else:
+            info = self.tasks.get(target)
+            infos = [info] if info and info.user_id == ctx.scoped_user_id else []
+        if not infos:
+            await ctx.notify_text(f"未找到任务: {target}")
+            return
+        for info in infos:
+            info.cancel()
+
+    def _help_text(self) -> str:
+        version = self._plugins.version if self._plugins is not None else 0
+        if self._help_cache is None or self._help_cache[0] != version:
+            entries = [self._help["help"]]
+            if self._plugins is not None:
+                entries += [
+                    (spec.usage, spec.help, spec.aliases) for spec in self._plugins.specs() if spec.name not in self._help
+                ]
+            entries += [
+                entry for command, entry in self._help.items() if command != "help" and command not in self._hidden
+            ]
+            lines = ["可用指令:"]
+            for i, (usage, description, aliases) in enumerate(entries, start=1):
+                line = f"{i}) {usage} - {description}" if description else f"{i}) {usage}"
+                if aliases:
+                    line += f"（{'/'.join(aliases)}）"
+                lines.append(line)
+            self._help_cache = (version, "\n".join(lines) + "\n")
+        return self._help_cache[1]
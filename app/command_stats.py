@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Collection, Iterator
+
+from app.command_router import CommandContext, CommandRouter, SendMessage
+from app.messages import OutboundMessage
+from app.metrics import DEFAULT_BUCKETS, metrics
+
+logger = logging.getLogger("assistant")
+
+_KB = 1024
+_MB = 1024 * 1024
+WALL_BUCKETS = DEFAULT_BUCKETS + (120.0, 300.0, 600.0)
+MESSAGE_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+BYTE_BUCKETS = (0, 16 * _KB, 64 * _KB, 256 * _KB, _MB, 4 * _MB, 16 * _MB, 64 * _MB, 256 * _MB, 1024 * _MB)
+
+calls_total = metrics.counter("command_calls_total", "Command invocations by outcome")
+wall_seconds = metrics.histogram("command_wall_seconds", "Wall time of one command invocation", WALL_BUCKETS)
+send_wait_seconds = metrics.histogram(
+    "command_send_wait_seconds", "Time one command invocation spent blocked sending messages", WALL_BUCKETS
+)
+messages_sent = metrics.histogram("command_messages", "Outbound messages sent by one command invocation", MESSAGE_BUCKETS)
+upload_bytes = metrics.histogram("command_upload_bytes", "Bytes uploaded by one command invocation", BYTE_BUCKETS)
+alloc_bytes = metrics.histogram(
+    "command_alloc_bytes", "Traced memory growth during one command invocation (tracemalloc)", BYTE_BUCKETS
+)
+
+OUTCOMES = ("ok", "error", "timeout", "cancelled")
+
+
+class Usage:
+    """
+    一次指令执行的资源占用，同一指令创建的子任务共享同一个对象
+    """
+
+    __slots__ = ("command", "started", "send_wait", "messages", "upload_bytes", "alloc_start", "outcome")
+
+    def __init__(self, command: str) -> None:
+        self.command = command
+        self.started = time.perf_counter()
+        self.send_wait = 0.0
+        self.messages = 0
+        self.upload_bytes = 0
+        self.alloc_start: int | None = None
+        self.outcome = "ok"
+
+    def wrap(self, send: SendMessage) -> SendMessage:
+        async def send_message(to_user: str, message: OutboundMessage) -> Any:
+            start = time.perf_counter()
+            try:
+                return await send(to_user, message)
+            finally:
+                self.send_wait += time.perf_counter() - start
+                self.messages += 1
+
+        return send_message
+
+
+_current: ContextVar[Usage | None] = ContextVar("command_usage", default=None)
+
+
+def record_upload(path: str) -> None:
+    """
+    把上传的文件大小计入当前指令，不在指令中时忽略
+    """
+    usage = _current.get()
+    if usage is not None:
+        try:
+            usage.upload_bytes += os.path.getsize(path)
+        except OSError:
+            pass
+
+
+def _ms(value: float | None) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}ms"
+
+
+class CommandStats:
+    """
+    按指令统计调用次数、结果、耗时、发送阻塞时间、发送消息数和上传字节数；
+    tracemalloc 开启时（CMD_STATS_TRACEMALLOC 或 POST /admin/profile/memory/start）同时统计内存增长，
+    多个指令并发时增长量互相包含，只作为粗略参考。
+    分位数来自固定桶直方图，内存占用与调用次数无关。
+    """
+
+    def __init__(self) -> None:
+        self._commands: set[str] = set()
+        self._admins: frozenset[str] = frozenset()
+
+    @contextmanager
+    def track(self, command: str, ctx: CommandContext) -> Iterator[Usage]:
+        """
+        统计 with 块内的一次指令执行；执行期间 ctx.send_message 替换为计时的版本
+        """
+        usage = Usage(command)
+        token = _current.set(usage)
+        send = ctx.send_message
+        if send is not None:
+            ctx.send_message = usage.wrap(send)
+        if tracemalloc.is_tracing():
+            usage.alloc_start = tracemalloc.get_traced_memory()[0]
+        try:
+            yield usage
+        except asyncio.CancelledError:
+            usage.outcome = "cancelled"
+            raise
+        except Exception:
+            usage.outcome = "error"
+            raise
+        finally:
+            ctx.send_message = send
+            _current.reset(token)
+            self._record(usage)
+
+    def _record(self, usage: Usage) -> None:
+        command = usage.command
+        self._commands.add(command)
+        calls_total.inc(command=command, outcome=usage.outcome)
+        wall_seconds.observe(time.perf_counter() - usage.started, command=command)
+        send_wait_seconds.observe(usage.send_wait, command=command)
+        messages_sent.observe(usage.messages, command=command)
+        upload_bytes.observe(usage.upload_bytes, command=command)
+        if usage.alloc_start is not None and tracemalloc.is_tracing():
+            alloc_bytes.observe(max(0, tracemalloc.get_traced_memory()[0] - usage.alloc_start), command=command)
+
+    def report(self) -> list[dict[str, Any]]:
+        """
+        每个指令的统计，按总耗时从大到小
+        """
+        rows = []
+        # /admin/stats 在线程池中调用，事件循环线程可能同时新增指令，先复制
+        for command in list(self._commands):
+            outcomes = {outcome: int(calls_total.value(command=command, outcome=outcome)) for outcome in OUTCOMES}
+            rows.append({
+                "command": command,
+                "calls": sum(outcomes.values()),
+                "outcomes": outcomes,
+                "wall_seconds": {
+                    "total": wall_seconds.total(command=command),
+                    "p50": wall_seconds.quantile(0.5, command=command),
+                    "p95": wall_seconds.quantile(0.95, command=command),
+                    "p99": wall_seconds.quantile(0.99, command=command),
+                },
+                "send_wait_seconds": {
+                    "total": send_wait_seconds.total(command=command),
+                    "p95": send_wait_seconds.quantile(0.95, command=command),
+                },
+                "messages": int(messages_sent.total(command=command)),
+                "upload_bytes": int(upload_bytes.total(command=command)),
+                "alloc_bytes_p95": alloc_bytes.quantile(0.95, command=command),
+            })
+        rows.sort(key=lambda row: row["wall_seconds"]["total"], reverse=True)
+        return rows
+
+    def format_report(self, limit: int = 10) -> str:
+        rows = self.report()
+        if not rows:
+            return "暂无指令统计"
+        lines = [f"指令统计（按总耗时，前 {min(limit, len(rows))} 个）:"]
+        for row in rows[:limit]:
+            wall, send = row["wall_seconds"], row["send_wait_seconds"]
+            failed = row["calls"] - row["outcomes"]["ok"]
+            line = (
+                f"{row['command']}: {row['calls']} 次"
+                + (f"（失败 {failed}）" if failed else "")
+                + f"，p50 {_ms(wall['p50'])} p95 {_ms(wall['p95'])} p99 {_ms(wall['p99'])}"
+                + f"，发送等待 p95 {_ms(send['p95'])}，消息 {row['messages']} 条"
+            )
+            if row["upload_bytes"]:
+                line += f"，上传 {row['upload_bytes'] / _MB:.1f}MB"
+            if row["alloc_bytes_p95"] is not None:
+                line += f"，内存增长 p95 {row['alloc_bytes_p95'] / _KB:.0f}KB"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def register_commands(self, router: CommandRouter, admins: Collection[str]) -> None:
+        """
+        :param admins: 可以使用 stats 指令的用户（默认应用为 userid，其他应用为 应用名|userid）
+        """
+        self._admins = frozenset(admins)
+        router.register("stats", self._handle_stats, help="指令耗时统计（管理员）", usage="stats [条数]", hidden=True)
+
+    async def _handle_stats(self, arg: str, ctx: CommandContext) -> None:
+        if ctx.scoped_user_id not in self._admins:
+            await ctx.notify_text("没有权限")
+            return
+        try:
+            limit = min(50, max(1, int(arg.strip() or 10)))
+        except ValueError:
+            await ctx.notify_text("用法: stats [条数]")
+            return
+        await ctx.notify_text(self.format_report(limit))
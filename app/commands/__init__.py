@@ -0,0 +1,6 @@
+"""
+插件指令：本目录下每个模块用 @command 声明指令，服务启动时只读取声明，首次使用时才导入模块
+"""
+import os
+
+PROJECT_PATH = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
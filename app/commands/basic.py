@@ -0,0 +1,23 @@
+import datetime as dt
+
+from app.command_router import CommandContext
+from app.plugins import command
+
+
+@command("ping", help="你还活着吗", aliases=("在吗",))
+async def handle_ping(arg: str, ctx: CommandContext) -> None:
+    await ctx.notify_text("pong")
+
+
+@command("time", help="返回服务当前时间", aliases=("时间",))
+async def handle_time(arg: str, ctx: CommandContext) -> None:
+    now = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    await ctx.notify_text(f"当前服务时间: {now}")
+
+
+@command("echo", help="回显文本", usage="echo <文本>", aliases=("复读",))
+async def handle_echo(arg: str, ctx: CommandContext) -> None:
+    if not arg:
+        await ctx.notify_text("用法: echo 你的内容")
+        return
+    await ctx.notify_text(arg)
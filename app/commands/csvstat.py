@@ -0,0 +1,42 @@
+import csv
+import os
+
+from app.command_router import CommandContext
+from app.commands import PROJECT_PATH
+from app.plugins import command
+
+
+@command(
+    "csvstat",
+    help="统计 tmp 目录下 CSV 文件",
+    usage="csvstat [文件名]",
+    cpu_bound=True,
+    cache_ttl=30,
+    aliases=("统计",),
+)
+async def handle_csv_stat(arg: str, ctx: CommandContext) -> None:
+    """
+    统计 tmp 目录下 CSV 文件的行数和各列非空数量；CPU 密集型示例，在进程池中执行
+    """
+    name = os.path.basename(arg.strip()) or "record.csv"
+    path = os.path.join(PROJECT_PATH, "tmp", name)
+    if not os.path.isfile(path):
+        await ctx.notify_text(f"文件不存在: {name}")
+        return
+
+    with open(path, newline="", encoding="utf-8") as fp:
+        reader = csv.reader(fp)
+        header = next(reader, [])
+        filled = [0] * len(header)
+        rows = 0
+        for row in reader:
+            rows += 1
+            for i, value in enumerate(row[:len(header)]):
+                if value:
+                    filled[i] += 1
+            if rows % 100000 == 0:
+                ctx.set_progress(f"{rows} 行")
+
+    lines = [f"**{name}**", f"行数：`{rows}`", f"列数：`{len(header)}`"]
+    lines += [f">{column}：非空 `{count}`" for column, count in zip(header, filled)]
+    await ctx.notify_markdown("\n".join(lines))
@@ -0,0 +1,82 @@
+import asyncio
+
+from app.command_router import CommandContext
+from app.commands import PROJECT_PATH
+from app.plugins import command
+
+
+@command("msgtest", help="消息模板测试")
+async def handle_msg_test(arg: str, ctx: CommandContext) -> None:
+    # 任务卡片
+    title = "任务卡片通知"
+    description = "这是一个 textcard 示例消息。"
+    await ctx.notify_textcard(
+        title=title,
+        description=description,
+        url="https://github.com/yanxiang1120/wecom_assistant",
+        btn="查看",
+    )
+    # markdown
+    content = "`markdown` 通知" \
+              "\n您的会议室已经预定，稍后会同步到`邮箱`" \
+              "\n>**事项详情**" \
+              "\n>事　项：<font color=\"info\">开会</font>" \
+              "\n>组织者：@miglioguan" \
+              "\n>参与者：@miglioguan、@kunliu、@jamdeezhou、@kanexiong、@kisonwang" \
+              "\n>" \
+              "\n>会议室：<font color=\"info\">广州TIT 1楼 301</font>" \
+              "\n>日　期：<font color=\"warning\">2026年2月10日</font>" \
+              "\n>时　间：<font color=\"comment\">上午9:00-11:00</font>" \
+              "\n>" \
+              "\n>请准时参加会议。" \
+              "\n>" \
+              "\n>如需修改会议信息，请点击：[修改会议信息](https://github.com/yanxiang1120/wecom_assistant)"
+    await ctx.notify_markdown(content)
+    # Image
+    await ctx.notify_image(f"{PROJECT_PATH}/tmp/goodluck.png")
+    # File
+    await ctx.notify_file(f"{PROJECT_PATH}/tmp/record.csv")
+    # 图文卡片
+    articles = [
+        {
+            "title": "标题1",
+            "description": "简介1",
+            "url": "https://github.com/yanxiang1120/wecom_assistant",
+            "picurl": "https://avatars.githubusercontent.com/u/4798762?v=4"
+        },
+        {
+            "title": "标题2",
+            "description": "简介2",
+            "url": "https://github.com/yanxiang1120/wecom_assistant",
+            "picurl": "https://avatars.githubusercontent.com/u/4798762?v=4"
+        },
+        {
+            "title": "标题3",
+            "description": "简介3",
+            "url": "https://github.com/yanxiang1120/wecom_assistant",
+            "picurl": "https://avatars.githubusercontent.com/u/4798762?v=4"
+        },
+        {
+            "title": "标题4",
+            "description": "简介4",
+            "url": "https://github.com/yanxiang1120/wecom_assistant",
+            "picurl": "https://avatars.githubusercontent.com/u/4798762?v=4"
+        }
+    ]
+    await ctx.notify_news(articles)
+
+
+@command("longtask", help="耗时任务模板")
+async def handle_longtask(arg: str, ctx: CommandContext) -> None:
+    # task start
+    task_id = ctx.task.task_id if ctx.task else "-"
+    progress = ctx.progress("耗时任务")
+    await progress.start(f"任务 #{task_id} 开始执行。。。（发送 cancel {task_id} 可取消）")
+    # exec task
+    seconds = 5
+    for i in range(seconds):
+        await progress.update(f"执行中 {i}/{seconds}", percent=i * 100 / seconds)
+        await asyncio.sleep(1)
+    await progress.finish(f"任务 #{task_id} 执行完成", percent=100)
+    # task finish
+    await ctx.notify_markdown(f"**任务执行完成**\n耗时：`{seconds}` 秒")
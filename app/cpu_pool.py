@@ -0,0 +1,241 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from typing import Any
+
+from app.command_router import CommandContext, Handler
+from app.messages import OutboundMessage
+from app.metrics import metrics
+
+logger = logging.getLogger("assistant")
+
+_START = "start"
+_SEND = "send"
+_PROGRESS = "progress"
+_DONE = "done"
+# 记录最近取消的任务 ID 个数，子进程据此判断收到的中断信号是否针对当前任务
+_CANCELLED_SLOTS = 64
+# 中断子进程中正在执行的 handler；不用 SIGTERM，Pool.terminate() 关闭子进程时使用 SIGTERM
+_INTERRUPT = signal.SIGUSR1
+
+interrupted_total = metrics.counter(
+    "cpu_pool_interrupted_total", "CPU-bound handlers interrupted in a worker process after cancellation or timeout"
+)
+
+# 子进程中的全局状态，由 _init_worker 设置
+_channel: Any = None
+_cancelled: Any = None
+_current_job = 0
+
+
+class _Interrupted(BaseException):
+    """
+    子进程中断当前 handler，继承 BaseException 以免被 handler 中的 except Exception 吞掉
+    """
+
+
+class _WorkerContext(CommandContext):
+    """
+    子进程中的 CommandContext，notify_* / set_progress 通过队列转发回主进程
+    """
+
+    def __init__(self, job_id: int, user_id: str, content: str) -> None:
+        super().__init__(user_id=user_id, content=content, send_message=self._forward)
+        self._job_id = job_id
+
+    async def _forward(self, to_user: str, message: OutboundMessage) -> None:
+        _channel.put((self._job_id, _SEND, to_user, message))
+
+    def set_progress(self, progress: str) -> None:
+        _channel.put((self._job_id, _PROGRESS, progress, None))
+
+
+def _is_cancelled(job_id: int) -> bool:
+    return job_id in _cancelled[:]
+
+
+def _on_interrupt(_signum: int, _frame: Any) -> None:
+    # 信号可能在任务结束后才到达，只中断已被取消的当前任务
+    if _current_job and _is_cancelled(_current_job):
+        raise _Interrupted()
+
+
+def _init_worker(channel: Any, cancelled: Any) -> None:
+    global _channel, _cancelled
+    _channel = channel
+    _cancelled = cancelled
+    signal.signal(_INTERRUPT, _on_interrupt)
+
+
+def _run_in_worker(job_id: int, handler: Handler, arg: str, user_id: str, content: str) -> None:
+    global _current_job
+    if _is_cancelled(job_id):
+        return
+    _channel.put((job_id, _START, os.getpid(), None))
+    try:
+        _current_job = job_id
+        try:
+            asyncio.run(handler(arg, _WorkerContext(job_id, user_id, content)))
+        finally:
+            _current_job = 0
+    except _Interrupted:
+        pass
+    finally:
+        _channel.put((job_id, _DONE, None, None))
+
+
+class _Job:
+    __slots__ = ("events", "result", "pid", "cancelled")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.result = loop.create_future()
+        self.pid: int | None = None
+        self.cancelled = False
+
+
+class CpuHandlerPool:
+    """
+    CPU 密集型指令的进程池，handler 必须是模块级函数（可 pickle），参数仅 arg 和用户信息。
+    - start() 在线程中创建子进程，服务启动时调用；未调用时在首次使用前创建，同样不阻塞事件循环
+    - 所有子进程的消息通过同一个队列转发，由专用线程读取后交给事件循环
+    - 任务被取消或超时后向执行它的子进程发送 SIGUSR1 中断 handler，子进程随即可以执行下一个任务；
+      handler 正在执行的 C 扩展调用（如大数组运算、正则匹配）不会被打断，要等该调用返回后才会中断
+    """
+
+    def __init__(self, max_workers: int | None = None) -> None:
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self._mp = multiprocessing.get_context("spawn")
+        self._pool = None
+        self._channel = None
+        self._cancelled = None
+        self._cancel_index = 0
+        self._reader: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._start_lock: asyncio.Lock | None = None
+        self._jobs: dict[int, _Job] = {}
+        self._ids = itertools.count(1)
+
+    async def start(self) -> None:
+        if self._pool is not None:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._pool is None:
+                self._loop = asyncio.get_running_loop()
+                await asyncio.to_thread(self._start)
+
+    def _start(self) -> None:
+        self._channel = self._mp.Queue()
+        self._cancelled = self._mp.Array("q", _CANCELLED_SLOTS, lock=False)
+        self._reader = threading.Thread(target=self._read, name="cpu-pool-reader", daemon=True)
+        self._reader.start()
+        self._pool = self._new_pool()
+        logger.info("CPU handler pool started, workers=%s", self.max_workers)
+
+    def _new_pool(self):
+        return self._mp.Pool(self.max_workers, initializer=_init_worker, initargs=(self._channel, self._cancelled))
+
+    async def recycle(self) -> None:
+        """
+        换用新的子进程（如插件代码更新后），旧子进程执行完已提交的任务后退出
+        """
+        if self._pool is None:
+            return
+        old, self._pool = self._pool, await asyncio.to_thread(self._new_pool)
+        old.close()
+        threading.Thread(target=old.join, name="cpu-pool-retire", daemon=True).start()
+        logger.info("CPU handler pool recycled")
+
+    def _read(self) -> None:
+        while True:
+            item = self._channel.get()
+            if item is None:
+                return
+            try:
+                self._loop.call_soon_threadsafe(self._dispatch, item)
+            except RuntimeError:
+                # 事件循环已关闭
+                return
+
+    def _dispatch(self, item: tuple) -> None:
+        job_id, kind, first, second = item
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        if kind == _START:
+            job.pid = first
+            if job.cancelled:
+                # 取消时任务还在排队，开始执行后再中断
+                self._interrupt(job)
+            return
+        job.events.put_nowait((kind, first, second))
+
+    async def run(self, handler: Handler, arg: str, ctx: CommandContext) -> None:
+        await self.start()
+        loop = asyncio.get_running_loop()
+        job_id = next(self._ids)
+        job = self._jobs[job_id] = _Job(loop)
+
+        def resolve(setter, value) -> None:
+            if not job.result.done():
+                setter(value)
+            if job.cancelled:
+                self._jobs.pop(job_id, None)
+
+        self._pool.apply_async(
+            _run_in_worker,
+            (job_id, handler, arg, ctx.user_id, ctx.content),
+            callback=lambda value: loop.call_soon_threadsafe(resolve, job.result.set_result, value),
+            error_callback=lambda exc: loop.call_soon_threadsafe(resolve, job.result.set_exception, exc),
+        )
+        try:
+            while True:
+                kind, first, second = await job.events.get()
+                if kind == _DONE:
+                    break
+                if kind == _PROGRESS:
+                    ctx.set_progress(first)
+                elif ctx.send_message:
+                    await ctx.send_message(first, second)
+            await job.result
+        except asyncio.CancelledError:
+            self._cancel(job_id, job)
+            raise
+        finally:
+            # 被取消的任务保留登记，直到子进程开始执行（以便中断）或执行结束
+            if not job.cancelled or job.result.done():
+                self._jobs.pop(job_id, None)
+
+    def _cancel(self, job_id: int, job: _Job) -> None:
+        job.cancelled = True
+        self._cancelled[self._cancel_index % _CANCELLED_SLOTS] = job_id
+        self._cancel_index += 1
+        if job.pid is not None:
+            self._interrupt(job)
+
+    def _interrupt(self, job: _Job) -> None:
+        try:
+            os.kill(job.pid, _INTERRUPT)
+        except ProcessLookupError:
+            return
+        interrupted_total.inc()
+        logger.info("CPU-bound handler interrupted, pid=%s", job.pid)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        if self._reader is not None:
+            self._channel.put(None)
+            self._reader.join()
+            self._reader = None
+            self._channel.close()
+            self._channel = None
+            logger.info("CPU handler pool stopped")
@@ -0,0 +1,128 @@
+import asyncio
+import contextvars
+import logging
+from collections import deque
+from typing import Awaitable, Callable, TypeAlias
+
+logger = logging.getLogger("assistant")
+
+RunCommand: TypeAlias = Callable[[str, str], Awaitable[None]]
+RejectCommand: TypeAlias = Callable[[str, str], Awaitable[None]]
+
+ACCEPTED = "accepted"
+COALESCED = "coalesced"
+REJECTED = "rejected"
+
+
+class FairCommandScheduler:
+    """
+    按用户公平调度指令执行：
+    - 全局并发上限 max_concurrency
+    - 每个用户的并发上限 per_user_concurrency，serialize_per_user=True 时固定为 1，保证同一用户回复有序
+    - 每个用户的等待队列上限 per_user_queue，队列中已存在相同指令时合并，队列满时拒绝
+    - 有空闲槽位时按用户轮转取任务，单个用户刷指令不会占满全部槽位
+    - 指令在提交时的 contextvars 上下文中执行（如消息发送优先级）
+    """
+
+    def __init__(
+            self,
+            run: RunCommand,
+            max_concurrency: int = 32,
+            per_user_concurrency: int = 2,
+            per_user_queue: int = 10,
+            serialize_per_user: bool = False,
+            on_reject: RejectCommand | None = None,
+    ) -> None:
+        self._run = run
+        self._on_reject = on_reject
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_user_concurrency = 1 if serialize_per_user else max(1, per_user_concurrency)
+        self.per_user_queue = max(0, per_user_queue)
+        self._queues: dict[str, deque[tuple[str, contextvars.Context]]] = {}
+        self._running: dict[str, int] = {}
+        self._ready: deque[str] = deque()
+        self._in_ready: set[str] = set()
+        self._active = 0
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def pending(self, user_id: str | None = None) -> int:
+        if user_id is not None:
+            return len(self._queues.get(user_id, ()))
+        return sum(len(q) for q in self._queues.values())
+
+    def submit(self, user_id: str, content: str) -> str:
+        queue = self._queues.get(user_id)
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+
+        if any(queued == content for queued, _context in queue):
+            logger.info("Command coalesced, user=%s, content=%s", user_id, content)
+            return COALESCED
+
+        if len(queue) >= self.per_user_queue and not self._can_start(user_id):
+            logger.warning("Command rejected, user=%s queue is full (%s)", user_id, len(queue))
+            if not queue:
+                del self._queues[user_id]
+            if self._on_reject:
+                self._spawn(self._on_reject(user_id, content))
+            return REJECTED
+
+        queue.append((content, contextvars.copy_context()))
+        self._mark_ready(user_id)
+        self._pump()
+        return ACCEPTED
+
+    def _can_start(self, user_id: str) -> bool:
+        return (
+                self._active < self.max_concurrency
+                and self._running.get(user_id, 0) < self.per_user_concurrency
+                and not self._queues.get(user_id)
+        )
+
+    def _mark_ready(self, user_id: str) -> None:
+        if user_id not in self._in_ready:
+            self._in_ready.add(user_id)
+            self._ready.append(user_id)
+
+    def _pump(self) -> None:
+        # 达到个人上限的用户先移出就绪队列，等其任务结束后再重新入队
+        while self._active < self.max_concurrency and self._ready:
+            user_id = self._ready.popleft()
+            self._in_ready.discard(user_id)
+            queue = self._queues.get(user_id)
+            if not queue:
+                self._queues.pop(user_id, None)
+                continue
+            if self._running.get(user_id, 0) >= self.per_user_concurrency:
+                continue
+
+            content, context = queue.popleft()
+            if queue:
+                self._mark_ready(user_id)
+            else:
+                del self._queues[user_id]
+            self._active += 1
+            self._running[user_id] = self._running.get(user_id, 0) + 1
+            task = self._spawn(self._run(user_id, content), context)
+            task.add_done_callback(lambda _t, uid=user_id: self._on_done(uid))
+
+    def _on_done(self, user_id: str) -> None:
+        self._active -= 1
+        running = self._running.get(user_id, 1) - 1
+        if running > 0:
+            self._running[user_id] = running
+        else:
+            self._running.pop(user_id, None)
+        if self._queues.get(user_id):
+            self._mark_ready(user_id)
+        self._pump()
+
+    def _spawn(self, coro: Awaitable[None], context: contextvars.Context | None = None) -> asyncio.Task:
+        task = asyncio.create_task(coro, context=context)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
@@ -0,0 +1,123 @@
+import gzip
+import os
+import zlib
+from dataclasses import dataclass
+
+# 企业微信普通文件上传大小上限
+FILE_SIZE_LIMIT = 10 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+# 已压缩格式再压缩收益很小，直接按字节切分
+COMPRESSED_SUFFIXES = frozenset(
+    {".gz", ".tgz", ".zip", ".7z", ".rar", ".xz", ".bz2", ".zst", ".jpg", ".jpeg", ".png", ".mp4", ".mp3"}
+)
+
+
+@dataclass(frozen=True)
+class FileParts:
+    source: str
+    paths: list[str]
+    compressed: bool
+
+    @property
+    def joined_name(self) -> str:
+        # 各分片按顺序拼接后的文件名，与 split_file 的命名一致
+        name = os.path.basename(self.source)
+        return f"{name}.gz" if self.compressed else name
+
+    def join_hint(self) -> str:
+        if len(self.paths) == 1:
+            return f"gunzip {self.joined_name}" if self.compressed else ""
+        pattern = f"{self.joined_name}.part*"
+        hint = f"cat {pattern} > {self.joined_name}"
+        return f"{hint} && gunzip {self.joined_name}" if self.compressed else hint
+
+
+class _PartWriter:
+    """
+    依次写入 name.001、name.002…，单个文件不超过 limit 字节
+    """
+
+    def __init__(self, directory: str, name: str, limit: int) -> None:
+        self.directory = directory
+        self.name = name
+        self.limit = limit
+        self.paths: list[str] = []
+        self._fp = None
+
+    def open_next(self):
+        self.close()
+        path = os.path.join(self.directory, f"{self.name}.{len(self.paths) + 1:03d}")
+        self.paths.append(path)
+        self._fp = open(path, "wb")
+        return self._fp
+
+    def close(self) -> None:
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def finish(self, final_name: str) -> list[str]:
+        """
+        按总数重命名为 final_name.part1of3 形式；只有一个分片时直接命名为 final_name
+        """
+        self.close()
+        total = len(self.paths)
+        width = len(str(total))
+        renamed = []
+        for index, path in enumerate(self.paths, start=1):
+            # 序号补零，保证 cat name.part* 按顺序拼接
+            target = final_name if total == 1 else f"{final_name}.part{index:0{width}d}of{total}"
+            target = os.path.join(self.directory, target)
+            os.replace(path, target)
+            renamed.append(target)
+        return renamed
+
+
+def _gzip_parts(src, writer: _PartWriter, limit: int, level: int) -> None:
+    # 每个分片是独立完整的 gzip 成员，可单独解压，按顺序拼接后也是合法的 gzip 文件
+    chunk_size = max(64 * 1024, min(CHUNK_SIZE, limit // 8))
+    fp = writer.open_next()
+    gz = gzip.GzipFile(filename="", mode="wb", fileobj=fp, compresslevel=level, mtime=0)
+    while chunk := src.read(chunk_size):
+        # 预留 deflate 最坏情况的膨胀和 gzip 尾部
+        if fp.tell() > 32 and fp.tell() + len(chunk) + len(chunk) // 1000 + 64 > limit:
+            gz.close()
+            fp = writer.open_next()
+            gz = gzip.GzipFile(filename="", mode="wb", fileobj=fp, compresslevel=level, mtime=0)
+        gz.write(chunk)
+        gz.flush(zlib.Z_SYNC_FLUSH)
+    gz.close()
+
+
+def _raw_parts(src, writer: _PartWriter, limit: int) -> None:
+    fp = writer.open_next()
+    written = 0
+    while chunk := src.read(min(CHUNK_SIZE, limit - written)):
+        fp.write(chunk)
+        written += len(chunk)
+        if written >= limit:
+            fp = writer.open_next()
+            written = 0
+    if written == 0 and len(writer.paths) > 1:
+        writer.close()
+        os.remove(writer.paths.pop())
+
+
+def split_file(path: str, directory: str, limit: int = FILE_SIZE_LIMIT, level: int = 6) -> FileParts:
+    """
+    把超过 limit 的文件流式压缩（已压缩格式不再压缩）并切分为不超过 limit 的分片，写入 directory。
+    内存占用只与 CHUNK_SIZE 有关，与源文件大小无关。
+    """
+    name = os.path.basename(path)
+    compressed = os.path.splitext(name)[1].lower() not in COMPRESSED_SUFFIXES
+    writer = _PartWriter(directory, name, limit)
+    try:
+        with open(path, "rb") as src:
+            if compressed:
+                _gzip_parts(src, writer, limit, level)
+            else:
+                _raw_parts(src, writer, limit)
+    finally:
+        writer.close()
+    joined_name = f"{name}.gz" if compressed else name
+    return FileParts(source=path, paths=writer.finish(joined_name), compressed=compressed)
@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from app.metrics import metrics
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow 为可选依赖，缺失时图片原样上传
+    Image = ImageOps = None
+
+logger = logging.getLogger("assistant")
+
+# 企业微信图片素材：jpg / png，5B ~ 2MB
+IMAGE_SIZE_LIMIT = 2 * 1024 * 1024
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+JPEG_QUALITIES = (90, 80, 70, 60, 50)
+
+image_prepared_total = metrics.counter("image_prepared_total", "Images transcoded or downscaled before upload")
+image_cache_hits_total = metrics.counter("image_cache_hits_total", "Image derivatives served from cache")
+
+
+def needs_prepare(path: str, limit: int = IMAGE_SIZE_LIMIT) -> bool:
+    return os.path.splitext(path)[1].lower() not in IMAGE_SUFFIXES or os.path.getsize(path) > limit
+
+
+def _encode(image, fmt: str, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+def _transcode(src: str, limit: int, max_side: int) -> tuple[bytes, str]:
+    """
+    在子进程中执行：转码为 png / jpg，必要时缩小尺寸、降低质量，直到不超过 limit 字节
+    :return: (图片内容, 扩展名)
+    """
+    with Image.open(src) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    has_alpha = image.mode in ("RGBA", "LA", "P") and (image.mode != "P" or "transparency" in image.info)
+    if has_alpha:
+        # 带透明通道的图（图表、截图）优先保留 png
+        data = _encode(image, "PNG", optimize=True)
+        if len(data) <= limit:
+            return data, ".png"
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image.convert("RGBA"), mask=image.convert("RGBA").split()[-1])
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    while True:
+        for quality in JPEG_QUALITIES:
+            data = _encode(image, "JPEG", quality=quality, optimize=True, progressive=True)
+            if len(data) <= limit:
+                return data, ".jpg"
+        width, height = image.size
+        if max(width, height) <= 64:
+            return data, ".jpg"
+        image = image.resize((max(1, width * 3 // 4), max(1, height * 3 // 4)), Image.LANCZOS)
+
+
+def _ready() -> None:
+    pass
+
+
+class ImagePreparer:
+    """
+    上传前处理图片：非 jpg/png 或超过 2MB 的图片在进程池中转码、缩放、压缩。
+    结果按源文件内容 sha256 缓存在 cache_dir，相同图片再次发送直接复用；缓存超过 max_cache_bytes 时删除最久未用的文件。
+    """
+
+    def __init__(
+            self,
+            cache_dir: str = "data/image_cache",
+            max_workers: int = 2,
+            max_side: int = 2560,
+            limit: int = IMAGE_SIZE_LIMIT,
+            max_cache_bytes: int = 256 * 1024 * 1024,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_workers = max(1, max_workers)
+        self.max_side = max_side
+        self.limit = limit
+        self.max_cache_bytes = max_cache_bytes
+        self._executor: ProcessPoolExecutor | None = None
+        self._start_lock = threading.Lock()
+        self._inflight: dict[str, asyncio.Future] = {}
+        # (路径, mtime, 大小) -> sha256，避免重复读取未变化的源文件
+        self._digests: dict[tuple[str, int, int], str] = {}
+        self._warned = False
+
+    @property
+    def available(self) -> bool:
+        return Image is not None
+
+    def _digest(self, path: str) -> str:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(path, "rb") as fp:
+                while chunk := fp.read(1024 * 1024):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            if len(self._digests) >= 4096:
+                self._digests.clear()
+            self._digests[key] = digest
+        return digest
+
+    def _cached(self, digest: str) -> str | None:
+        for suffix in (".png", ".jpg"):
+            path = os.path.join(self.cache_dir, f"{digest}-{self.max_side}{suffix}")
+            if os.path.exists(path):
+                os.utime(path)
+                return path
+        return None
+
+    async def prepare(self, path: str) -> str:
+        """
+        返回可直接上传的图片路径：符合要求的原样返回，否则返回缓存中的处理结果
+        """
+        if not needs_prepare(path, self.limit):
+            return path
+        if not self.available:
+            if not self._warned:
+                self._warned = True
+                logger.warning("Pillow is not installed, images are uploaded without preprocessing")
+            return path
+        digest = await asyncio.to_thread(self._digest, path)
+        cached = await asyncio.to_thread(self._cached, digest)
+        if cached:
+            image_cache_hits_total.inc()
+            return cached
+        future = self._inflight.get(digest)
+        if future is None:
+            future = self._inflight[digest] = asyncio.ensure_future(self._produce(path, digest))
+            future.add_done_callback(lambda _f: self._inflight.pop(digest, None))
+        return await asyncio.shield(future)
+
+    async def start(self) -> None:
+        """
+        在线程中创建进程池并启动全部子进程（spawn 方式启动需要导入模块，较慢），避免首次发送图片时阻塞事件循环
+        """
+        if self._executor is None and self.available:
+            await asyncio.to_thread(self._start)
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._executor is not None:
+                return
+            executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            # 子进程在提交任务时才创建，提交空任务让它们现在启动
+            for future in [executor.submit(_ready) for _ in range(self.max_workers)]:
+                future.result()
+            self._executor = executor
+        logger.info("Image pool started, workers=%s", self.max_workers)
+
+    async def _produce(self, path: str, digest: str) -> str:
+        if self._executor is None:
+            # 未在启动时调用 start（如回调进程）时首次使用才启动，同样不阻塞事件循环
+            await self.start()
+        loop = asyncio.get_running_loop()
+        data, suffix = await loop.run_in_executor(self._executor, _transcode, path, self.limit, self.max_side)
+        target = await asyncio.to_thread(self._store, digest, data, suffix)
+        image_prepared_total.inc()
+        logger.info("Image prepared, src=%s, size=%s -> %s", path, os.path.getsize(path), len(data))
+        return target
+
+    def _store(self, digest: str, data: bytes, suffix: str) -> str:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        target = os.path.join(self.cache_dir, f"{digest}-{self.max_side}{suffix}")
+        tmp_path = f"{target}.tmp"
+        with open(tmp_path, "wb") as fp:
+            fp.write(data)
+        os.replace(tmp_path, target)
+        self._prune()
+        return target
+
+    def _prune(self) -> None:
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        for _mtime, size, path in sorted(entries):
+            if total <= self.max_cache_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def shutdown(self) -> None:
+        with self._start_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
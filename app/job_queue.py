@@ -0,0 +1,433 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+
+@dataclass
+class QueuedJob:
+    job_id: int
+    user_id: str
+    content: str
+    dedup_key: str | None = None
+    status: str = "pending"
+    attempts: int = 0
+    lease_owner: str | None = None
+    lease_expires: float | None = None
+    enqueued_at: float = field(default_factory=time.time)
+    cancel_requested: bool = False
+
+
+class JobQueue(ABC):
+    """
+    指令任务队列接口：回调节点 enqueue，worker 租约（lease）取任务，执行完成后 ack。
+    - 租约过期未 ack 的任务可被其他 worker 重新领取
+    - 超过 max_attempts 次仍未完成的任务标记为 dead
+    - dedup_key 相同的任务只入队一次
+    - 按用户公平领取：同一用户排第 n 的任务，与其他用户排第 n 的任务轮流领取；
+      per_user 大于 0 时，一个用户在所有 worker 上同时执行的任务不超过 per_user 个
+    - 用户取消时，待执行的任务直接标记为 cancelled，执行中的任务由持有租约的 worker 通过 cancel_requests 得知后取消
+    """
+
+    max_attempts = 3
+
+    @abstractmethod
+    def enqueue(self, user_id: str, content: str, dedup_key: str | None = None) -> bool:
+        """
+        :return: False 表示 dedup_key 重复，未入队
+        """
+
+    @abstractmethod
+    def lease(self, owner: str, limit: int, lease_seconds: float, per_user: int = 0) -> list[QueuedJob]:
+        pass
+
+    @abstractmethod
+    def extend(self, job_id: int, owner: str, lease_seconds: float) -> bool:
+        pass
+
+    @abstractmethod
+    def ack(self, job_id: int, owner: str) -> bool:
+        pass
+
+    @abstractmethod
+    def release(self, job_id: int, owner: str) -> bool:
+        """
+        放弃租约，任务回到待执行状态
+        """
+
+    @abstractmethod
+    def leases(self) -> list[QueuedJob]:
+        """
+        当前持有租约的任务
+        """
+
+    @abstractmethod
+    def user_jobs(self, user_id: str) -> list[QueuedJob]:
+        """
+        用户待执行和执行中的任务
+        """
+
+    @abstractmethod
+    def cancel(self, job_id: int, user_id: str) -> QueuedJob | None:
+        """
+        取消用户的任务
+        :return: 取消前的任务；不存在、已结束或不属于该用户时返回 None
+        """
+
+    @abstractmethod
+    def cancel_requests(self, owner: str) -> list[int]:
+        """
+        owner 持有租约且已被用户取消的任务
+        """
+
+    @abstractmethod
+    def stats(self) -> dict[str, int]:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryJobQueue(JobQueue):
+    """
+    进程内队列，用于单机调试和测试
+    """
+
+    def __init__(self) -> None:
+        self._jobs: dict[int, QueuedJob] = {}
+        self._dedup: set[str] = set()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def enqueue(self, user_id: str, content: str, dedup_key: str | None = None) -> bool:
+        with self._lock:
+            if dedup_key is not None:
+                if dedup_key in self._dedup:
+                    return False
+                self._dedup.add(dedup_key)
+            job = QueuedJob(job_id=self._next_id, user_id=user_id, content=content, dedup_key=dedup_key)
+            self._jobs[job.job_id] = job
+            self._next_id += 1
+            return True
+
+    def lease(self, owner: str, limit: int, lease_seconds: float, per_user: int = 0) -> list[QueuedJob]:
+        now = time.time()
+        with self._lock:
+            # 用户正在执行的任务数 + 任务在该用户排队中的序号，越小越先领取
+            load: dict[str, int] = {}
+            for job in self._jobs.values():
+                if job.status == "leased" and job.lease_expires >= now:
+                    load[job.user_id] = load.get(job.user_id, 0) + 1
+            ready = []
+            for job in self._jobs.values():
+                if job.status == "pending" or (job.status == "leased" and job.lease_expires < now):
+                    if job.cancel_requested:
+                        job.status = "cancelled"
+                        continue
+                    if job.attempts >= self.max_attempts:
+                        job.status = "dead"
+                        continue
+                    load[job.user_id] = rank = load.get(job.user_id, 0) + 1
+                    if not per_user or rank <= per_user:
+                        ready.append((rank, job.job_id, job))
+            ready.sort(key=lambda item: item[:2])
+            leased = []
+            for _rank, _job_id, job in ready[:limit]:
+                job.status = "leased"
+                job.attempts += 1
+                job.lease_owner = owner
+                job.lease_expires = now + lease_seconds
+                leased.append(QueuedJob(**job.__dict__))
+        return leased
+
+    def _owned(self, job_id: int, owner: str) -> QueuedJob | None:
+        job = self._jobs.get(job_id)
+        if job and job.status == "leased" and job.lease_owner == owner:
+            return job
+        return None
+
+    def extend(self, job_id: int, owner: str, lease_seconds: float) -> bool:
+        with self._lock:
+            job = self._owned(job_id, owner)
+            if job:
+                job.lease_expires = time.time() + lease_seconds
+            return job is not None
+
+    def ack(self, job_id: int, owner: str) -> bool:
+        with self._lock:
+            job = self._owned(job_id, owner)
+            if job:
+                del self._jobs[job_id]
+            return job is not None
+
+    def release(self, job_id: int, owner: str) -> bool:
+        with self._lock:
+            job = self._owned(job_id, owner)
+            if job:
+                job.status = "pending"
+                job.lease_owner = None
+                job.lease_expires = None
+            return job is not None
+
+    def leases(self) -> list[QueuedJob]:
+        with self._lock:
+            return [QueuedJob(**job.__dict__) for job in self._jobs.values() if job.status == "leased"]
+
+    def user_jobs(self, user_id: str) -> list[QueuedJob]:
+        with self._lock:
+            return [
+                QueuedJob(**job.__dict__)
+                for job in self._jobs.values()
+                if job.user_id == user_id and job.status in ("pending", "leased")
+            ]
+
+    def cancel(self, job_id: int, user_id: str) -> QueuedJob | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.user_id != user_id or job.status not in ("pending", "leased"):
+                return None
+            before = QueuedJob(**job.__dict__)
+            if job.status == "pending":
+                job.status = "cancelled"
+            else:
+                job.cancel_requested = True
+            return before
+
+    def cancel_requests(self, owner: str) -> list[int]:
+        with self._lock:
+            return [
+                job.job_id
+                for job in self._jobs.values()
+                if job.status == "leased" and job.lease_owner == owner and job.cancel_requested
+            ]
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            result = {"pending": 0, "leased": 0, "dead": 0, "cancelled": 0}
+            for job in self._jobs.values():
+                result[job.status] = result.get(job.status, 0) + 1
+            return result
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    基于 SQLite（WAL）的队列，同一台机器上的多个回调进程和 worker 进程可共用一个数据库文件。
+    已完成的任务保留 dedup_window 秒用于去重，之后清理。
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dedup_key TEXT UNIQUE,
+        user_id TEXT NOT NULL,
+        content TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        lease_owner TEXT,
+        lease_expires REAL,
+        enqueued_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        cancel_requested INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id);
+    CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs(user_id, status);
+    """
+    _COLUMNS = (
+        "id, user_id, content, dedup_key, status, attempts, lease_owner, lease_expires, enqueued_at, cancel_requested"
+    )
+
+    def __init__(self, path: str, dedup_window: float = 86400) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.dedup_window = dedup_window
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self._SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "cancel_requested" not in columns:
+            # 旧版本创建的数据库
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+        self._last_purge = 0.0
+
+    @staticmethod
+    def _row_to_job(row: tuple) -> QueuedJob:
+        return QueuedJob(
+            job_id=row[0],
+            user_id=row[1],
+            content=row[2],
+            dedup_key=row[3],
+            status=row[4],
+            attempts=row[5],
+            lease_owner=row[6],
+            lease_expires=row[7],
+            enqueued_at=row[8],
+            cancel_requested=bool(row[9]),
+        )
+
+    def enqueue(self, user_id: str, content: str, dedup_key: str | None = None) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (dedup_key, user_id, content, enqueued_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (dedup_key, user_id, content, now, now),
+            )
+            return cursor.rowcount == 1
+
+    def lease(self, owner: str, limit: int, lease_seconds: float, per_user: int = 0) -> list[QueuedJob]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 已请求取消但 worker 未能处理（如进程崩溃）的任务不再重新执行
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', lease_owner = NULL, updated_at = ? "
+                    "WHERE status = 'leased' AND cancel_requested = 1 AND lease_expires < ?",
+                    (now, now),
+                )
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'dead', lease_owner = NULL, updated_at = ? "
+                    "WHERE attempts >= ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))",
+                    (now, self.max_attempts, now),
+                )
+                # rank: 用户正在执行的任务数 + 任务在该用户排队中的序号
+                ids = [
+                    row[0]
+                    for row in self._conn.execute(
+                        "WITH active AS ("
+                        "  SELECT user_id, COUNT(*) AS running FROM jobs"
+                        "  WHERE status = 'leased' AND lease_expires >= ? GROUP BY user_id"
+                        "), ready AS ("
+                        "  SELECT id, user_id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id) AS position FROM jobs"
+                        "  WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)"
+                        ") "
+                        "SELECT id, position + COALESCE(running, 0) AS rank FROM ready LEFT JOIN active USING (user_id) "
+                        "WHERE ? <= 0 OR position + COALESCE(running, 0) <= ? "
+                        "ORDER BY rank, id LIMIT ?",
+                        (now, now, per_user, per_user, limit),
+                    )
+                ]
+                if ids:
+                    marks = ",".join("?" * len(ids))
+                    self._conn.execute(
+                        f"UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                        f"lease_expires = ?, updated_at = ? WHERE id IN ({marks})",
+                        (owner, now + lease_seconds, now, *ids),
+                    )
+                    rows = self._conn.execute(f"SELECT {self._COLUMNS} FROM jobs WHERE id IN ({marks})", ids).fetchall()
+                    order = {job_id: i for i, job_id in enumerate(ids)}
+                    rows.sort(key=lambda row: order[row[0]])
+                else:
+                    rows = []
+                if now - self._last_purge > 60:
+                    self._last_purge = now
+                    self._conn.execute(
+                        "DELETE FROM jobs WHERE status IN ('done', 'cancelled') AND updated_at < ?",
+                        (now - self.dedup_window,),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [self._row_to_job(row) for row in rows]
+
+    def _update_owned(self, sql: str, params: tuple, job_id: int, owner: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                f"{sql} WHERE id = ? AND status = 'leased' AND lease_owner = ?", (*params, job_id, owner)
+            )
+            return cursor.rowcount == 1
+
+    def extend(self, job_id: int, owner: str, lease_seconds: float) -> bool:
+        now = time.time()
+        return self._update_owned(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ?", (now + lease_seconds, now), job_id, owner
+        )
+
+    def ack(self, job_id: int, owner: str) -> bool:
+        return self._update_owned(
+            "UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'done' END, lease_owner = NULL, lease_expires = NULL, updated_at = ?",
+            (time.time(),), job_id, owner,
+        )
+
+    def release(self, job_id: int, owner: str) -> bool:
+        return self._update_owned(
+            "UPDATE jobs SET status = 'pending', lease_owner = NULL, lease_expires = NULL, updated_at = ?",
+            (time.time(),), job_id, owner,
+        )
+
+    def leases(self) -> list[QueuedJob]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM jobs WHERE status = 'leased' ORDER BY lease_expires"
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def user_jobs(self, user_id: str) -> list[QueuedJob]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM jobs WHERE user_id = ? AND status IN ('pending', 'leased') ORDER BY id",
+                (user_id,),
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def cancel(self, job_id: int, user_id: str) -> QueuedJob | None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT {self._COLUMNS} FROM jobs WHERE id = ? AND user_id = ? AND status IN ('pending', 'leased')",
+                    (job_id, user_id),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = CASE status WHEN 'pending' THEN 'cancelled' ELSE status END, "
+                        "cancel_requested = 1, updated_at = ? WHERE id = ?",
+                        (now, job_id),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._row_to_job(row) if row is not None else None
+
+    def cancel_requests(self, owner: str) -> list[int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'leased' AND lease_owner = ? AND cancel_requested = 1", (owner,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        result = {"pending": 0, "leased": 0, "dead": 0, "done": 0, "cancelled": 0}
+        result.update(dict(rows))
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_job_queue(url: str) -> JobQueue:
+    """
+    按 URL 创建队列：sqlite:///data/jobs.db（相对路径）、sqlite:////var/lib/jobs.db（绝对路径）、memory://
+    """
+    parts = urlsplit(url)
+    if parts.scheme == "memory":
+        return MemoryJobQueue()
+    if parts.scheme == "sqlite":
+        path = parts.path[1:] if parts.path.startswith("/") else parts.path
+        if not path:
+            raise ValueError(f"sqlite queue path is required: {url}")
+        return SQLiteJobQueue(path)
+    raise ValueError(f"unsupported job queue: {url}")
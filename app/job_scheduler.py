@@ -0,0 +1,604 @@
+import asyncio
+import datetime as dt
+import fcntl
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import IO, Awaitable, Callable, Iterator, TypeAlias
+from zoneinfo import ZoneInfo
+
+from app.command_router import CommandContext, CommandRouter
+from app.messages import OutboundMessage, make_message
+
+logger = logging.getLogger("assistant")
+
+FireCommand: TypeAlias = Callable[[str, str], object]
+FireMessage: TypeAlias = Callable[[str, OutboundMessage], Awaitable[None]]
+
+_INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_INTERVAL_RE = re.compile(r"^(\d+)([smhd])$")
+# 分 时 日 月 周
+_CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+class CronSpec:
+    """
+    5 段 cron 表达式（分 时 日 月 周），每段支持 *、*/n、a-b、a-b/n、a,b；周日为 0 或 7
+    """
+
+    __slots__ = ("expr", "minutes", "hours", "days", "months", "weekdays", "_dom_any", "_dow_any")
+
+    def __init__(self, expr: str) -> None:
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron 表达式需要 5 段: {expr}")
+        self.expr = " ".join(fields)
+        parsed = [self._parse_field(f, lo, hi) for f, (lo, hi) in zip(fields, _CRON_RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = frozenset(d % 7 for d in weekdays)
+        self._dom_any = fields[2] == "*"
+        self._dow_any = fields[4] == "*"
+
+    @staticmethod
+    def _parse_field(field: str, lo: int, hi: int) -> frozenset[int]:
+        values: set[int] = set()
+        upper = 7 if (lo, hi) == (0, 6) else hi
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_text = part.split("/", 1)
+                step = int(step_text)
+                if step <= 0:
+                    raise ValueError(f"cron 步长必须大于 0: {field}")
+            if part == "*":
+                start, end = lo, hi
+            elif "-" in part:
+                start_text, end_text = part.split("-", 1)
+                start, end = int(start_text), int(end_text)
+            else:
+                start = end = int(part)
+            if start < lo or end > upper or start > end:
+                raise ValueError(f"cron 字段超出范围: {field}")
+            values.update(range(start, end + 1, step))
+        return frozenset(values)
+
+    def _day_matches(self, day: dt.datetime) -> bool:
+        dom = day.day in self.days
+        dow = (day.weekday() + 1) % 7 in self.weekdays
+        if self._dom_any or self._dow_any:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, when: dt.datetime) -> dt.datetime:
+        t = when.replace(second=0, microsecond=0) + dt.timedelta(minutes=1)
+        limit = t + dt.timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + dt.timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + dt.timedelta(days=1)
+                continue
+            if t.hour not in self.hours:
+                t = t.replace(minute=0) + dt.timedelta(hours=1)
+                continue
+            if t.minute not in self.minutes:
+                t += dt.timedelta(minutes=1)
+                continue
+            return t
+        raise ValueError(f"cron 表达式无可执行时间: {self.expr}")
+
+
+@dataclass
+class ScheduledJob:
+    job_id: str
+    user_id: str
+    spec: str
+    command: str | None = None
+    message: OutboundMessage | None = None
+    next_run: float = 0.0
+    # 间隔任务按创建时间对齐，各进程计算出的下次执行时间一致，接替触发的进程也保持原来的节奏
+    created_at: float = 0.0
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "ScheduledJob":
+        job_id, user_id, spec, command, message, created_at = row
+        if message is not None:
+            message = json.loads(message)
+            message = make_message(message["msg_type"], message["payload"])
+        return cls(
+            job_id=str(job_id), user_id=user_id, spec=spec, command=command, message=message, created_at=created_at
+        )
+
+
+class JobScheduler:
+    """
+    进程内定时任务：所有任务共用一个最小堆和一个后台协程，只在堆顶任务到期或任务有变化时唤醒。
+    任务支持 `every <N>[s|m|h|d]` 间隔和 `cron <分> <时> <日> <月> <周>` 两种周期，保存在 SQLite（WAL）中。
+    多个进程共用同一个数据库时：
+    - 只有持有 .owner 文件锁的进程触发任务，其他进程的后台线程阻塞等待该锁，owner 退出后立即接替
+    - 添加、删除任务只写一行并在 schedule_changes 中记录任务 ID，再通过 .notify 命名管道通知 owner；
+      owner 只读取变化的行更新堆，不轮询、不重新加载全部任务
+    - 查看任务、单用户上限直接查询数据库（按 user_id 索引），不需要在内存中保存全部任务
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS schedules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        spec TEXT NOT NULL,
+        command TEXT,
+        message TEXT,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_schedules_user ON schedules(user_id);
+    CREATE TABLE IF NOT EXISTS schedule_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id INTEGER NOT NULL
+    );
+    """
+    _COLUMNS = "id, user_id, spec, command, message, created_at"
+
+    def __init__(
+            self,
+            fire_command: FireCommand,
+            fire_message: FireMessage,
+            store_path: str = "data/schedules.db",
+            tz: ZoneInfo | None = None,
+            max_jobs_per_user: int = 20,
+    ) -> None:
+        self._fire_command = fire_command
+        self._fire_message = fire_message
+        self.store_path = store_path
+        self.tz = tz or ZoneInfo("Asia/Shanghai")
+        self.max_jobs_per_user = max_jobs_per_user
+        # 以下只在触发任务的进程（owner）中使用
+        self._jobs: dict[str, ScheduledJob] = {}
+        self._cron_cache: dict[str, CronSpec] = {}
+        self._heap: list[tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._last_change = 0
+        self._changed = False
+        self._wakeup = asyncio.Event()
+        self._runner: asyncio.Task | None = None
+        self._owner: IO | None = None
+        self._notify_fds: tuple[int, int] | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._router: CommandRouter | None = None
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM schedules").fetchone()[0]
+
+    def parse_spec(self, spec: str) -> CronSpec | float:
+        kind, _, rest = spec.strip().partition(" ")
+        if kind == "every":
+            match = _INTERVAL_RE.match(rest.strip().lower())
+            if not match or int(match.group(1)) <= 0:
+                raise ValueError(f"间隔格式错误: {rest}，示例: every 30m")
+            return int(match.group(1)) * _INTERVAL_UNITS[match.group(2)]
+        if kind == "cron":
+            cron = self._cron_cache.get(rest)
+            if cron is None:
+                cron = self._cron_cache[rest] = CronSpec(rest)
+            return cron
+        raise ValueError(f"不支持的周期: {spec}")
+
+    def _next_run(self, job: ScheduledJob, after: float) -> float:
+        parsed = self.parse_spec(job.spec)
+        if isinstance(parsed, CronSpec):
+            return parsed.next_after(dt.datetime.fromtimestamp(after, tz=self.tz)).timestamp()
+        if after < job.created_at:
+            return job.created_at + parsed
+        return job.created_at + (int((after - job.created_at) // parsed) + 1) * parsed
+
+    async def add(
+            self,
+            user_id: str,
+            spec: str,
+            command: str | None = None,
+            message: OutboundMessage | None = None,
+    ) -> ScheduledJob:
+        if (command is None) == (message is None):
+            raise ValueError("command 和 message 必须且只能指定一个")
+        self.parse_spec(spec)
+        job = ScheduledJob(
+            job_id="", user_id=user_id, spec=spec, command=command, message=message, created_at=time.time()
+        )
+        await asyncio.to_thread(self._insert, job)
+        job.next_run = self._next_run(job, time.time())
+        return job
+
+    def _insert(self, job: ScheduledJob) -> None:
+        message = None
+        if job.message is not None:
+            message = json.dumps({"msg_type": job.message.msg_type, "payload": job.message.payload}, ensure_ascii=False)
+        with self._transaction() as conn:
+            # 计数和写入在同一个写事务中，多个进程同时为同一用户添加也不会超出上限
+            if self.max_jobs_per_user:
+                count = conn.execute("SELECT COUNT(*) FROM schedules WHERE user_id = ?", (job.user_id,)).fetchone()[0]
+                if count >= self.max_jobs_per_user:
+                    raise ValueError(f"定时任务数量已达上限 {self.max_jobs_per_user}")
+            cursor = conn.execute(
+                "INSERT INTO schedules (user_id, spec, command, message, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job.user_id, job.spec, job.command, message, job.created_at),
+            )
+            job.job_id = str(cursor.lastrowid)
+            conn.execute("INSERT INTO schedule_changes (job_id) VALUES (?)", (cursor.lastrowid,))
+        self._notify()
+
+    async def remove(self, job_id: str, user_id: str | None = None) -> bool:
+        return await asyncio.to_thread(self._delete, job_id, user_id)
+
+    def _delete(self, job_id: str, user_id: str | None) -> bool:
+        if not job_id.isdigit():
+            return False
+        with self._transaction() as conn:
+            if user_id is None:
+                cursor = conn.execute("DELETE FROM schedules WHERE id = ?", (int(job_id),))
+            else:
+                cursor = conn.execute("DELETE FROM schedules WHERE id = ? AND user_id = ?", (int(job_id), user_id))
+            if not cursor.rowcount:
+                return False
+            conn.execute("INSERT INTO schedule_changes (job_id) VALUES (?)", (int(job_id),))
+        self._notify()
+        return True
+
+    def list_jobs(self, user_id: str | None = None) -> list[ScheduledJob]:
+        """
+        查询数据库（阻塞，事件循环中需在线程中调用）
+        """
+        with self._lock:
+            if user_id is None:
+                rows = self._db().execute(f"SELECT {self._COLUMNS} FROM schedules ORDER BY id").fetchall()
+            else:
+                rows = self._db().execute(
+                    f"SELECT {self._COLUMNS} FROM schedules WHERE user_id = ? ORDER BY id", (user_id,)
+                ).fetchall()
+        now = time.time()
+        jobs = []
+        for row in rows:
+            job = ScheduledJob.from_row(row)
+            job.next_run = self._next_run(job, now)
+            jobs.append(job)
+        return jobs
+
+    def _db(self) -> sqlite3.Connection:
+        # 调用方持有 self._lock
+        if self._conn is None:
+            directory = os.path.dirname(self.store_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.store_path, isolation_level=None, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self._SCHEMA)
+            self._conn = conn
+            self._import_json(conn)
+        return self._conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _import_json(self, conn: sqlite3.Connection) -> None:
+        """
+        导入旧版本保存的同名 .json 文件（只在数据库为空时导入一次，导入后改名为 .json.imported）
+        """
+        legacy = os.path.splitext(self.store_path)[0] + ".json"
+        if legacy == self.store_path or not os.path.exists(legacy):
+            return
+        if conn.execute("SELECT 1 FROM schedules LIMIT 1").fetchone():
+            return
+        with open(legacy, encoding="utf-8") as fp:
+            items = json.load(fp).get("jobs", [])
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for item in items:
+                message = item.get("message")
+                conn.execute(
+                    "INSERT INTO schedules (id, user_id, spec, command, message, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        int(item["job_id"]), item["user_id"], item["spec"], item.get("command"),
+                        json.dumps(message, ensure_ascii=False) if message else None, now,
+                    ),
+                )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        os.replace(legacy, f"{legacy}.imported")
+        logger.info("Imported %s schedules from %s", len(items), legacy)
+
+    def _push(self, job: ScheduledJob) -> None:
+        heapq.heappush(self._heap, (job.next_run, next(self._seq), job.job_id))
+        if self._heap[0][2] == job.job_id:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        self._owner = await self._wait_owner()
+        logger.info("Schedule owner acquired, pid=%s, store=%s", os.getpid(), self.store_path)
+        self._listen()
+        try:
+            await self._load()
+            while True:
+                self._wakeup.clear()
+                if self._changed:
+                    self._changed = False
+                    try:
+                        await self._sync()
+                    except (OSError, sqlite3.Error):
+                        logger.exception("Sync schedules failed: %s", self.store_path)
+                delay = self._heap[0][0] - time.time() if self._heap else None
+                if delay is None or delay > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    run_at, _, job_id = heapq.heappop(self._heap)
+                    job = self._jobs.get(job_id)
+                    if job is None or job.next_run != run_at:
+                        continue
+                    self._fire(job)
+                    job.next_run = self._next_run(job, now)
+                    self._push(job)
+        finally:
+            self._unlisten()
+
+    def _fire(self, job: ScheduledJob) -> None:
+        logger.info("Scheduled job fired, job=%s, user=%s, spec=%s", job.job_id, job.user_id, job.spec)
+        try:
+            if job.command is not None:
+                self._fire_command(job.user_id, job.command)
+            else:
+                task = asyncio.create_task(self._fire_message(job.user_id, job.message))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except Exception:
+            logger.exception("Scheduled job fire failed, job=%s", job.job_id)
+
+    async def _wait_owner(self) -> IO:
+        """
+        等待成为触发定时任务的进程：后台线程阻塞在 .owner 文件锁上，拿到锁后持有到进程退出或 stop
+        """
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[IO] = loop.create_future()
+
+        def deliver(fp: IO) -> None:
+            if future.cancelled():
+                fp.close()
+            else:
+                future.set_result(fp)
+
+        def wait() -> None:
+            fp = open(f"{self.store_path}.owner", "a")
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                loop.call_soon_threadsafe(deliver, fp)
+            except RuntimeError:
+                # 事件循环已关闭
+                fp.close()
+
+        directory = os.path.dirname(self.store_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        threading.Thread(target=wait, name="schedule-owner", daemon=True).start()
+        return await future
+
+    def _listen(self) -> None:
+        path = f"{self.store_path}.notify"
+        try:
+            os.mkfifo(path)
+        except FileExistsError:
+            pass
+        reader = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        # 自己也保持一个写端，其他进程关闭写端后管道不会一直处于 EOF 可读状态
+        writer = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        self._notify_fds = (reader, writer)
+        asyncio.get_running_loop().add_reader(reader, self._on_notify)
+
+    def _unlisten(self) -> None:
+        if self._notify_fds is None:
+            return
+        reader, writer = self._notify_fds
+        self._notify_fds = None
+        asyncio.get_running_loop().remove_reader(reader)
+        os.close(reader)
+        os.close(writer)
+
+    def _on_notify(self) -> None:
+        try:
+            while os.read(self._notify_fds[0], 4096):
+                pass
+        except BlockingIOError:
+            pass
+        self._changed = True
+        self._wakeup.set()
+
+    def _notify(self) -> None:
+        """
+        通知 owner 读取变化；没有 owner 时忽略，接替的进程会加载全部任务
+        """
+        try:
+            fd = os.open(f"{self.store_path}.notify", os.O_WRONLY | os.O_NONBLOCK)
+        except OSError:
+            return
+        try:
+            os.write(fd, b"\0")
+        except BlockingIOError:
+            # 管道已满，owner 还有未读取的通知
+            pass
+        finally:
+            os.close(fd)
+
+    def _read_all(self) -> tuple[list[tuple], int]:
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN")
+            try:
+                rows = conn.execute(f"SELECT {self._COLUMNS} FROM schedules").fetchall()
+                last = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM schedule_changes").fetchone()[0]
+            finally:
+                conn.execute("COMMIT")
+            # 只有 owner 读取变化记录，已加载的可以删除
+            conn.execute("DELETE FROM schedule_changes WHERE seq <= ?", (last,))
+        return rows, last
+
+    def _read_changes(self, after: int) -> tuple[set[int], list[tuple], int]:
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN")
+            try:
+                changes = conn.execute(
+                    "SELECT seq, job_id FROM schedule_changes WHERE seq > ? ORDER BY seq", (after,)
+                ).fetchall()
+                ids = {job_id for _seq, job_id in changes}
+                rows = []
+                if ids:
+                    marks = ",".join("?" * len(ids))
+                    rows = conn.execute(
+                        f"SELECT {self._COLUMNS} FROM schedules WHERE id IN ({marks})", tuple(ids)
+                    ).fetchall()
+            finally:
+                conn.execute("COMMIT")
+            last = changes[-1][0] if changes else after
+            if changes:
+                conn.execute("DELETE FROM schedule_changes WHERE seq <= ?", (last,))
+        return ids, rows, last
+
+    async def _load(self) -> None:
+        rows, self._last_change = await asyncio.to_thread(self._read_all)
+        self._jobs, self._heap = {}, []
+        for row in rows:
+            self._apply_row(row)
+        logger.info("Loaded %s schedules from %s", len(self._jobs), self.store_path)
+
+    async def _sync(self) -> None:
+        """
+        只处理上次以来变化的任务：新增的入堆，删除的从索引中去掉（堆条目惰性删除）
+        """
+        ids, rows, self._last_change = await asyncio.to_thread(self._read_changes, self._last_change)
+        present = {row[0] for row in rows}
+        for job_id in ids - present:
+            self._jobs.pop(str(job_id), None)
+        for row in rows:
+            if str(row[0]) not in self._jobs:
+                self._apply_row(row)
+        if len(self._heap) > 2 * len(self._jobs) + 64:
+            # 删除较多时重建堆，避免已删除任务的条目堆积
+            self._heap = [(job.next_run, next(self._seq), job.job_id) for job in self._jobs.values()]
+            heapq.heapify(self._heap)
+        if rows or ids:
+            logger.info("Schedules changed, changed=%s, total=%s", len(ids), len(self._jobs))
+
+    def _apply_row(self, row: tuple) -> None:
+        try:
+            job = ScheduledJob.from_row(row)
+            job.next_run = self._next_run(job, time.time())
+        except (KeyError, TypeError, ValueError):
+            logger.warning("Skip invalid schedule: %s", row)
+            return
+        self._jobs[job.job_id] = job
+        self._push(job)
+
+    def start(self) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def register_commands(self, router: CommandRouter) -> None:
+        self._router = router
+        router.register(
+            "schedule",
+            self._handle_schedule,
+            help="添加定时任务",
+            usage="schedule every <N>[s|m|h|d] <指令> | schedule cron <分> <时> <日> <月> <周> <指令>",
+            aliases=("定时",),
+        )
+        router.register("schedules", self._handle_schedules, help="查看定时任务", aliases=("定时任务",))
+        router.register(
+            "unschedule", self._handle_unschedule, help="删除定时任务", usage="unschedule <定时任务ID>", aliases=("删除定时",)
+        )
+
+    async def _handle_schedule(self, arg: str, ctx: CommandContext) -> None:
+        usage = (
+            "用法:\n"
+            "schedule every <N>[s|m|h|d] <指令>\n"
+            "schedule cron <分> <时> <日> <月> <周> <指令>\n"
+            "示例: schedule every 1h time / schedule cron 0 9 * * 1-5 echo 早上好"
+        )
+        tokens = arg.split()
+        spec_len = {"every": 2, "cron": 6}.get(tokens[0].lower() if tokens else "")
+        if not spec_len or len(tokens) <= spec_len:
+            await ctx.notify_text(usage)
+            return
+        spec = " ".join([tokens[0].lower()] + tokens[1:spec_len])
+        command = " ".join(tokens[spec_len:])
+        # 按 dispatch 的方式解析，别名和唯一前缀（如 定时、sched）同样不能用于定时任务
+        if self._router.resolve(command) in ("schedule", "unschedule", "schedules"):
+            await ctx.notify_text("定时任务中不能再管理定时任务")
+            return
+        try:
+            job = await self.add(ctx.scoped_user_id, spec, command=command)
+        except ValueError as exc:
+            await ctx.notify_text(f"添加定时任务失败: {exc}\n\n{usage}")
+            return
+        next_run = dt.datetime.fromtimestamp(job.next_run, tz=self.tz).strftime("%Y-%m-%d %H:%M:%S")
+        await ctx.notify_text(f"已添加定时任务 #{job.job_id}: {spec} -> {command}\n下次执行: {next_run}")
+
+    async def _handle_unschedule(self, arg: str, ctx: CommandContext) -> None:
+        job_id = arg.strip().lstrip("#")
+        if not job_id:
+            await ctx.notify_text("用法: unschedule <定时任务ID>")
+            return
+        if await self.remove(job_id, user_id=ctx.scoped_user_id):
+            await ctx.notify_text(f"已删除定时任务 #{job_id}")
+        else:
+            await ctx.notify_text(f"未找到定时任务: {job_id}")
+
+    async def _handle_schedules(self, arg: str, ctx: CommandContext) -> None:
+        jobs = await asyncio.to_thread(self.list_jobs, ctx.scoped_user_id)
+        if not jobs:
+            await ctx.notify_text("当前没有定时任务")
+            return
+        lines = ["定时任务:"]
+        for job in sorted(jobs, key=lambda j: j.next_run):
+            next_run = dt.datetime.fromtimestamp(job.next_run, tz=self.tz).strftime("%Y-%m-%d %H:%M:%S")
+            target = job.command if job.command is not None else f"[{job.message.msg_type}]"
+            lines.append(f"#{job.job_id} {job.spec} -> {target}，下次 {next_run}")
+        await ctx.notify_text("\n".join(lines))
@@ -0,0 +1,231 @@
+import asyncio
+import datetime as dt
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from zoneinfo import ZoneInfo
+
+from app.command_router import CommandContext, CommandRouter
+from app.metrics import metrics
+
+logger = logging.getLogger("assistant")
+
+journal_written_total = metrics.counter("journal_written_total", "Inbound messages written to the journal")
+journal_dropped_total = metrics.counter("journal_dropped_total", "Inbound messages dropped because the journal buffer was full")
+journal_flush_seconds = metrics.histogram("journal_flush_seconds", "Time spent writing one journal batch")
+
+
+@dataclass(frozen=True)
+class JournalEntry:
+    ts: float
+    tenant: str
+    user_id: str
+    msg_type: str
+    event: str
+    msg_id: str
+    content: str
+
+    def to_dict(self) -> dict:
+        return {
+            "ts": self.ts,
+            "tenant": self.tenant,
+            "user_id": self.user_id,
+            "msg_type": self.msg_type,
+            "event": self.event,
+            "msg_id": self.msg_id,
+            "content": self.content,
+        }
+
+
+class MessageJournal:
+    """
+    收到的消息日志（SQLite，只追加）：
+    - record() 只把消息放入内存缓冲，后台协程每 flush_interval 秒或攒够 batch_size 条后在线程中批量写入
+    - 按 (应用, 用户, 时间)、(消息类型, 时间)、时间建索引
+    - 每小时删除超过 retention_days 天的记录并回收空间
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS messages (
+        ts REAL NOT NULL,
+        tenant TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        msg_type TEXT NOT NULL,
+        event TEXT NOT NULL,
+        msg_id TEXT NOT NULL,
+        content TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_messages_user ON messages(tenant, user_id, ts);
+    CREATE INDEX IF NOT EXISTS idx_messages_type ON messages(msg_type, ts);
+    CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages(ts);
+    """
+    _COLUMNS = "ts, tenant, user_id, msg_type, event, msg_id, content"
+
+    def __init__(
+            self,
+            path: str = "data/journal.db",
+            retention_days: float = 30,
+            batch_size: int = 500,
+            flush_interval: float = 0.5,
+            max_pending: int = 50000,
+            tz: ZoneInfo | None = None,
+    ) -> None:
+        self.path = path
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.tz = tz or ZoneInfo("Asia/Shanghai")
+        self._pending: list[tuple] = []
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._writer: asyncio.Task | None = None
+        self._last_compact = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        # 调用方持有 self._lock
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self._SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def record(
+            self,
+            tenant: str,
+            user_id: str,
+            msg_type: str,
+            content: str = "",
+            event: str = "",
+            msg_id: str = "",
+            ts: float | None = None,
+    ) -> None:
+        if len(self._pending) >= self.max_pending:
+            journal_dropped_total.inc()
+            return
+        self._pending.append((ts or time.time(), tenant, user_id, msg_type, event, msg_id, content))
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._writer is None:
+            self._wakeup = asyncio.Event()
+            self._writer = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        await self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if time.time() - self._last_compact > 3600:
+                self._last_compact = time.time()
+                try:
+                    await asyncio.to_thread(self.compact)
+                except sqlite3.Error:
+                    logger.exception("Journal compaction failed: %s", self.path)
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except sqlite3.Error:
+            logger.exception("Journal write failed, %s messages lost", len(rows))
+
+    def _write(self, rows: list[tuple]) -> None:
+        start = time.perf_counter()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(f"INSERT INTO messages ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        journal_written_total.inc(len(rows))
+        journal_flush_seconds.observe(time.perf_counter() - start)
+
+    def compact(self) -> int:
+        cutoff = time.time() - self.retention_days * 86400
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                deleted = conn.execute("DELETE FROM messages WHERE ts < ?", (cutoff,)).rowcount
+            if deleted:
+                conn.execute("PRAGMA incremental_vacuum")
+        if deleted:
+            logger.info("Journal compacted, %s messages older than %s days removed", deleted, self.retention_days)
+        return deleted
+
+    def query(
+            self,
+            tenant: str | None = None,
+            user_id: str | None = None,
+            msg_type: str | None = None,
+            since: float | None = None,
+            until: float | None = None,
+            limit: int = 50,
+    ) -> list[JournalEntry]:
+        """
+        按条件查询，按时间倒序返回最多 limit 条
+        """
+        clauses, params = [], []
+        for column, value in (("tenant", tenant), ("user_id", user_id), ("msg_type", msg_type)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {self._COLUMNS} FROM messages {where} ORDER BY ts DESC LIMIT ?", (*params, limit)
+            ).fetchall()
+        return [JournalEntry(*row) for row in rows]
+
+    def register_commands(self, router: CommandRouter) -> None:
+        router.register(
+            "history", self._handle_history, help="查看自己最近发送的消息", usage="history [条数]", aliases=("历史",)
+        )
+
+    async def _handle_history(self, arg: str, ctx: CommandContext) -> None:
+        try:
+            limit = min(50, max(1, int(arg.strip() or 10)))
+        except ValueError:
+            await ctx.notify_text("用法: history [条数]，最多 50 条")
+            return
+        entries = await asyncio.to_thread(self.query, tenant=ctx.tenant, user_id=ctx.user_id, limit=limit)
+        if not entries:
+            await ctx.notify_text("没有消息记录")
+            return
+        lines = [f"最近 {len(entries)} 条消息:"]
+        for entry in reversed(entries):
+            when = dt.datetime.fromtimestamp(entry.ts, tz=self.tz).strftime("%Y-%m-%d %H:%M:%S")
+            detail = entry.content or entry.event
+            lines.append(f"{when} [{entry.msg_type}] {detail}")
+        await ctx.notify_text("\n".join(lines))
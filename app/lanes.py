@@ -0,0 +1,104 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from app.metrics import metrics
+
+logger = logging.getLogger("assistant")
+
+T = TypeVar("T")
+
+lane_active = metrics.gauge("executor_lane_active", "Blocking calls currently running in each executor lane")
+lane_queued = metrics.gauge("executor_lane_queued", "Blocking calls waiting for a thread in each executor lane")
+lane_wait_seconds = metrics.histogram("executor_lane_wait_seconds", "Time a call waited for a lane thread")
+lane_run_seconds = metrics.histogram("executor_lane_run_seconds", "Time a call ran in a lane thread")
+lane_rejected_total = metrics.counter("executor_lane_rejected_total", "Calls rejected because the lane queue was full")
+
+
+class LaneFullError(RuntimeError):
+    pass
+
+
+class ExecutorLane:
+    """
+    独立的线程池，代替共享的 asyncio.to_thread 默认线程池，避免慢调用（如上传文件）占满线程后快调用（如发送文本）排队。
+    排队中的调用超过 max_queue 时直接拒绝（LaneFullError）。
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int) -> None:
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"lane-{name}")
+        self._active = 0
+        self._queued = 0
+
+    @property
+    def saturated(self) -> bool:
+        return self._active >= self.max_workers
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        if self._queued >= self.max_queue and self.saturated:
+            lane_rejected_total.inc(lane=self.name)
+            raise LaneFullError(f"executor lane {self.name} is full ({self._queued} queued)")
+        loop = asyncio.get_running_loop()
+        self._queued += 1
+        lane_queued.set(self._queued, lane=self.name)
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, self._call, func, args, kwargs, time.perf_counter(), loop)
+        future.add_done_callback(functools.partial(self._on_done, loop))
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, loop: asyncio.AbstractEventLoop, future) -> None:
+        # 排队中被取消（调用方取消或关闭线程池）的调用不会执行 _call，在这里扣减排队数
+        if future.cancelled():
+            try:
+                loop.call_soon_threadsafe(self._dropped)
+            except RuntimeError:
+                pass
+
+    def _dropped(self) -> None:
+        self._queued -= 1
+        lane_queued.set(self._queued, lane=self.name)
+
+    def _call(
+            self,
+            func: Callable[..., T],
+            args: tuple,
+            kwargs: dict,
+            submitted: float,
+            loop: asyncio.AbstractEventLoop,
+    ) -> T:
+        started = time.perf_counter()
+        loop.call_soon_threadsafe(self._started, started - submitted)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            loop.call_soon_threadsafe(self._finished, time.perf_counter() - started)
+
+    def _started(self, waited: float) -> None:
+        self._queued -= 1
+        self._active += 1
+        lane_queued.set(self._queued, lane=self.name)
+        lane_active.set(self._active, lane=self.name)
+        lane_wait_seconds.observe(waited, lane=self.name)
+
+    def _finished(self, elapsed: float) -> None:
+        self._active -= 1
+        lane_active.set(self._active, lane=self.name)
+        lane_run_seconds.observe(elapsed, lane=self.name)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queued": self._queued,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
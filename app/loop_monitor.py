@@ -0,0 +1,187 @@
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections.abc import Awaitable, Generator, Iterator
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+from app.metrics import metrics
+
+logger = logging.getLogger("assistant")
+
+T = TypeVar("T")
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUANTILES = (0.5, 0.9, 0.99)
+
+loop_lag = metrics.histogram("event_loop_lag_seconds", "Event loop scheduling lag", buckets=LAG_BUCKETS)
+loop_lag_recent = metrics.gauge("event_loop_lag_recent_seconds", "Event loop lag quantiles over the recent window")
+slow_steps_total = metrics.counter("event_loop_slow_steps_total", "Steps that held the event loop over the threshold")
+stalls_total = metrics.counter("event_loop_stalls_total", "Event loop stalls caught by the watchdog")
+
+
+class _TimedAwaitable:
+    """
+    逐段计时的 awaitable：协程每次被恢复执行到下一个 await 之间的耗时即占用事件循环的时间
+    """
+
+    __slots__ = ("_awaitable", "_iterator", "_label", "_monitor")
+
+    def __init__(self, awaitable: Awaitable[T], label: str, monitor: "LoopMonitor") -> None:
+        # 保留原对象，任务栈转储时沿 await 链展开
+        self._awaitable = awaitable
+        self._iterator = awaitable.__await__()
+        self._label = label
+        self._monitor = monitor
+
+    def __await__(self) -> Generator[Any, Any, T]:
+        iterator = self._iterator
+        value, error = None, None
+        while True:
+            start = time.perf_counter()
+            try:
+                if error is not None:
+                    yielded = iterator.throw(error)
+                else:
+                    yielded = iterator.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self._monitor.check(self._label, time.perf_counter() - start)
+            try:
+                value, error = (yield yielded), None
+            except BaseException as exc:
+                value, error = None, exc
+
+
+class LoopMonitor:
+    """
+    事件循环延迟监控：
+    - 每 interval 秒测量一次调度延迟，写入 event_loop_lag_seconds 及最近 window 次的分位数
+    - step() / watch() 标记的同步步骤或指令 handler 单次占用事件循环超过 threshold 时记录日志
+    - 看门狗线程在事件循环阻塞超过 threshold 时采样事件循环线程的调用栈
+    """
+
+    def __init__(self, interval: float = 0.25, threshold: float = 0.1, window: int = 240) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self._recent: collections.deque[float] = collections.deque(maxlen=window)
+        self._step: str | None = None
+        self._beat = time.monotonic()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def start(self) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch_loop, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info("Loop monitor started, interval=%ss, threshold=%ss", self.interval, self.threshold)
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _measure(self) -> None:
+        ticks = 0
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - expected)
+            loop_lag.observe(lag)
+            self._recent.append(lag)
+            ticks += 1
+            if ticks % 10 == 0:
+                self._publish_quantiles()
+
+    def _publish_quantiles(self) -> None:
+        ordered = sorted(self._recent)
+        if not ordered:
+            return
+        for q in QUANTILES:
+            loop_lag_recent.set(ordered[min(len(ordered) - 1, int(q * len(ordered)))], quantile=q)
+        loop_lag_recent.set(ordered[-1], quantile=1)
+
+    def quantiles(self) -> dict[float, float]:
+        ordered = sorted(self._recent)
+        if not ordered:
+            return {}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES + (1,)}
+
+    def check(self, label: str, elapsed: float) -> None:
+        if self.enabled and elapsed >= self.threshold:
+            slow_steps_total.inc(where=label)
+            logger.warning("Slow step held the event loop for %.3fs: %s", elapsed, label)
+
+    @contextmanager
+    def step(self, label: str) -> Iterator[None]:
+        """
+        标记回调处理中的一个同步步骤，如解密、XML 解析
+        """
+        previous, self._step = self._step, label
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._step = previous
+            self.check(label, time.perf_counter() - start)
+
+    async def watch(self, awaitable: Awaitable[T], label: str) -> T:
+        """
+        包装指令 handler，逐段统计其占用事件循环的时间
+        """
+        if not self.enabled:
+            return await awaitable
+        return await _TimedAwaitable(awaitable, label, self)
+
+    def _watch_loop(self) -> None:
+        reported = None
+        poll = max(0.01, self.threshold / 2)
+        while not self._stopped.wait(poll):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or beat == reported:
+                continue
+            reported = beat
+            stalls_total.inc()
+            logger.warning(
+                "Event loop blocked for %.3fs, task=%s, step=%s\n%s",
+                blocked, self._current_task_name(), self._step, self._sample_stack(),
+            )
+
+    def _current_task_name(self) -> str | None:
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            return None
+        return task.get_name() if task else None
+
+    def _sample_stack(self) -> str:
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return ""
+        return "".join(traceback.format_stack(frame, limit=20))
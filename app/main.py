@@ -1,19 +1,47 @@
 import asyncio
+import hmac
 import os
+import shutil
+import tempfile
+import time
+import tracemalloc
 import xml.etree.ElementTree as ET
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from datetime import timedelta, datetime
 from functools import partial
 from zoneinfo import ZoneInfo
-from typing import Optional
+from typing import Awaitable, Optional
 
-from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.responses import PlainTextResponse, Response
 
-from app.command_router import CommandContext, CommandRouter, OutboundMessage
+from app.coalescer import NotificationCoalescer
+from app.command_router import CommandContext, CommandRouter, scope_user_id, split_scoped_user_id
+from app.command_stats import CommandStats, record_upload
+from app.cpu_pool import CpuHandlerPool
+from app.fair_scheduler import FairCommandScheduler
+from app.file_parts import FILE_SIZE_LIMIT, split_file
+from app.image_prep import ImagePreparer
+from app.job_queue import JobQueue, open_job_queue
+from app.journal import MessageJournal
+from app.lanes import ExecutorLane
+from app.job_scheduler import JobScheduler
+from app.result_cache import ResultCache
+from app.sessions import SessionStore
+from app.text_split import MESSAGE_BYTE_LIMITS, split_message
 from app.logging_setup import setup_logging
-from app.wechat.WXBizMsgCrypt import WXBizMsgCrypt, WeComReceiverConfig
-from app.wechat.wecom_sender import WeComSender, WeComSenderConfig
+from app.loop_monitor import LoopMonitor
+from app.messages import FileMessage, ImageMessage, OutboundMessage, TextMessage
+from app.metrics import metrics
+from app.plugins import PluginRegistry
+from app.priority import BULK, INTERACTIVE, PriorityGate, using_priority
+from app.queued_tasks import QueuedTaskCommands
+from app.profiling import MAX_PROFILE_SECONDS, Profiler, ProfilerBusyError, dump_tasks
+from app.suppression import OutboundSuppressor
+from app.tenants import DEFAULT_TENANT, Tenant, TenantConfig, TenantRegistry
+from app.wechat.http_pool import DEFAULT_BASE_URL, ConnectionKeeper, close_sessions
+from app.wechat.wecom_sender import WeComSender
 
 
 @dataclass(frozen=True)
@@ -63,6 +91,29 @@ def load_settings() -> Settings:
     )
 
 
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        logger.warning("Invalid %s, fallback to %s", name, default)
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        logger.warning("Invalid %s, fallback to %s", name, default)
+        return default
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 def xml_to_dict(xml_text: str) -> dict[str, str]:
     try:
         root = ET.fromstring(xml_text)
@@ -94,30 +145,223 @@ def format_time(time_second):
 
 
 settings = load_settings()
-router = CommandRouter()
-crypto = (
-    WXBizMsgCrypt(
-        WeComReceiverConfig(
+cpu_pool = CpuHandlerPool(max_workers=_env_int("CPU_POOL_SIZE", os.cpu_count() or 1))
+loop_monitor = LoopMonitor(
+    interval=_env_float("LOOP_LAG_INTERVAL", 0.25),
+    threshold=_env_int("LOOP_SLOW_MS", 100) / 1000,
+)
+# 开启后指令统计中包含内存增长，tracemalloc 会使内存分配变慢
+if _env_bool("CMD_STATS_TRACEMALLOC") and not tracemalloc.is_tracing():
+    tracemalloc.start()
+command_stats = CommandStats()
+router = CommandRouter(
+    task_timeout=_env_float("CMD_TASK_TIMEOUT", 600),
+    cpu_pool=cpu_pool,
+    result_cache=ResultCache(max_entries=_env_int("CMD_CACHE_SIZE", 256)),
+    loop_monitor=loop_monitor,
+    plugins=PluginRegistry("app.commands", reload_interval=_env_float("PLUGIN_RELOAD_INTERVAL", 2)),
+    sessions=SessionStore(
+        path=os.getenv("SESSION_FILE", ""),
+        ttl=_env_float("SESSION_TTL", 600),
+        max_sessions=_env_int("SESSION_MAX", 10000),
+    ),
+    stats=command_stats,
+)
+tenants = TenantRegistry()
+default_tenant = tenants.add(
+    Tenant(
+        TenantConfig(
+            name=DEFAULT_TENANT,
             corp_id=settings.corp_id,
             token=settings.token,
             encoding_aes_key=settings.encoding_aes_key,
+            agent_id=settings.agent_id if settings.has_sender else None,
+            agent_secret=settings.agent_secret if settings.has_sender else None,
+            rate_limit=_env_float("WECOM_RATE_LIMIT", 0),
         )
     )
-    if settings.has_crypto
-    else None
 )
-sender = (
-    WeComSender(
-        WeComSenderConfig(
-            corp_id=settings.corp_id,
-            agent_secret=settings.agent_secret,
-            agent_id=settings.agent_id,
-        )
-    )
-    if settings.has_sender
-    else None
+if os.getenv("WECOM_TENANTS_FILE"):
+    tenants.load(os.environ["WECOM_TENANTS_FILE"])
+# 启动时预建到企业微信接口的连接，空闲期间定时探测保持连接
+connection_keeper = ConnectionKeeper(
+    [tenant.config.base_url or DEFAULT_BASE_URL for tenant in tenants if tenant.sender is not None],
+    warm=_env_int("WECOM_HTTP_WARM", 2),
+    probe_interval=_env_float("WECOM_HTTP_PROBE_INTERVAL", 30),
+)
+
+# all: 回调进程直接执行指令；ingress: 回调进程只校验、去重并写入任务队列，由 python -m app.worker 执行
+app_role = os.getenv("APP_ROLE", "all").strip().lower()
+if app_role not in ("all", "ingress"):
+    raise RuntimeError(f"APP_ROLE must be all or ingress: {app_role}")
+job_queue: Optional[JobQueue] = (
+    open_job_queue(os.getenv("JOB_QUEUE_URL", "sqlite:///data/jobs.db")) if app_role == "ingress" else None
 )
-app = FastAPI(title="WeCom Command Service")
+# 定时任务保存在回调进程，管理定时任务的指令不进入队列
+INGRESS_COMMANDS = frozenset({"schedule", "unschedule", "schedules"})
+if job_queue is not None:
+    QueuedTaskCommands(job_queue).register_commands(router)
+admin_token = os.getenv("ADMIN_TOKEN", "")
+
+
+async def close_resources() -> None:
+    await connection_keeper.stop()
+    if journal is not None:
+        await journal.stop()
+    for coalescer in coalescers.values():
+        await coalescer.flush()
+    if suppressor is not None:
+        await suppressor.flush()
+    await asyncio.to_thread(cpu_pool.shutdown)
+    await asyncio.to_thread(image_preparer.shutdown)
+    await asyncio.to_thread(router.sessions.close)
+    for lane in (quick_lane, media_lane, directory_lane):
+        await asyncio.to_thread(lane.shutdown)
+    close_sessions()
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    logger.info("Service starting, role=%s", app_role)
+    loop_monitor.start()
+    connection_keeper.start()
+    if app_role == "all":
+        await cpu_pool.start()
+        await image_preparer.start()
+    job_scheduler.start()
+    if journal is not None:
+        journal.start()
+    yield
+    await job_scheduler.stop()
+    await loop_monitor.stop()
+    await close_resources()
+    if job_queue is not None:
+        job_queue.close()
+
+
+app = FastAPI(title="WeCom Command Service", lifespan=lifespan)
+
+
+def resolve_scoped_user(scoped_user_id: str) -> tuple[Optional[Tenant], str]:
+    tenant_name, user_id = split_scoped_user_id(scoped_user_id)
+    tenant = tenants.get(tenant_name)
+    if tenant is None:
+        logger.warning("Unknown tenant %r, user=%s", tenant_name, user_id)
+    return tenant, user_id
+
+
+async def send_to_scoped_user(scoped_user_id: str, message: OutboundMessage) -> Optional[dict]:
+    tenant, user_id = resolve_scoped_user(scoped_user_id)
+    if tenant is None:
+        return None
+    return await send_message_to_user(user_id, message, tenant=tenant)
+
+
+async def send_scheduled_message(scoped_user_id: str, message: OutboundMessage) -> Optional[dict]:
+    with using_priority(BULK):
+        return await send_to_scoped_user(scoped_user_id, message)
+
+
+async def notify_command_rejected(scoped_user_id: str, content: str) -> None:
+    await send_to_scoped_user(scoped_user_id, TextMessage(f"指令过多，请等待当前任务完成后再试: {content}"))
+
+
+async def run_command(scoped_user_id: str, content: str) -> None:
+    tenant, user_id = resolve_scoped_user(scoped_user_id)
+    if tenant is not None:
+        await handle_command_and_notify(from_user=user_id, content=content, tenant=tenant)
+
+
+async def accept_command(
+        scoped_user_id: str,
+        content: str,
+        dedup_key: Optional[str] = None,
+        priority: str = INTERACTIVE,
+) -> None:
+    """
+    接收一条指令：all 模式直接交给调度器；ingress 模式写入任务队列，dedup_key 相同的重试回调只入队一次
+    :param priority: 指令回复消息的默认发送优先级
+    """
+    if router.is_builtin(content):
+        # help / tasks / cancel 在本进程立即执行，不经过调度器或任务队列排队，用户的执行槽位被占满时也能查看、取消任务
+        with using_priority(priority):
+            _spawn(run_command(scoped_user_id, content))
+        return
+    # 别名和唯一前缀（如 定时、sched）按 dispatch 的方式解析
+    if job_queue is None or router.resolve(content) in INGRESS_COMMANDS:
+        with using_priority(priority):
+            scheduler.submit(scoped_user_id, content)
+        return
+    added = await asyncio.to_thread(job_queue.enqueue, scoped_user_id, content, dedup_key)
+    if not added:
+        logger.info("Duplicate command ignored, user=%s, key=%s", scoped_user_id, dedup_key)
+
+
+_accept_tasks: set[asyncio.Task] = set()
+
+
+def _spawn(coro: Awaitable[None]) -> None:
+    task = asyncio.create_task(coro)
+    _accept_tasks.add(task)
+    task.add_done_callback(_accept_tasks.discard)
+
+
+def submit_command(scoped_user_id: str, content: str) -> None:
+    # 定时任务触发的指令，回复按 bulk 优先级发送
+    _spawn(accept_command(scoped_user_id, content, priority=BULK))
+
+
+scheduler = FairCommandScheduler(
+    run=run_command,
+    max_concurrency=_env_int("CMD_MAX_CONCURRENCY", 32),
+    per_user_concurrency=_env_int("CMD_USER_CONCURRENCY", 2),
+    per_user_queue=_env_int("CMD_USER_QUEUE_SIZE", 10),
+    serialize_per_user=_env_bool("CMD_USER_SERIAL"),
+    on_reject=notify_command_rejected,
+)
+coalesce_ms = _env_int("NOTIFY_COALESCE_MS", 0)
+coalescers: dict[str, NotificationCoalescer] = {}
+send_requests_total = metrics.counter("wecom_send_requests_total", "Message send requests issued to WeCom")
+split_parts_total = metrics.counter("notify_split_parts_total", "Extra parts produced by splitting oversized messages")
+split_as_file_total = metrics.counter("notify_split_as_file_total", "Oversized text messages sent as a file")
+file_parts_total = metrics.counter("notify_file_parts_total", "File parts sent for files over the upload size limit")
+file_upload_concurrency = max(1, _env_int("FILE_UPLOAD_CONCURRENCY", 3))
+# 文本切分的段数上限，内容超过上限可容纳的字节数时改为以文件发送
+text_max_parts = max(1, _env_int("TEXT_MAX_PARTS", 10))
+# 企业微信接口调用按类型使用独立线程池，线程总数默认与 WECOM_HTTP_POOL_SIZE 一致
+quick_lane = ExecutorLane("quick", _env_int("LANE_QUICK_WORKERS", 12), _env_int("LANE_QUICK_QUEUE", 1000))
+media_lane = ExecutorLane("media", _env_int("LANE_MEDIA_WORKERS", 4), _env_int("LANE_MEDIA_QUEUE", 100))
+directory_lane = ExecutorLane("directory", _env_int("LANE_DIRECTORY_WORKERS", 4), _env_int("LANE_DIRECTORY_QUEUE", 100))
+# 发送槽位按优先级分配，默认与 quick 线程池大小一致
+outbound_gate = PriorityGate(
+    capacity=_env_int("SEND_CONCURRENCY", quick_lane.max_workers),
+    aging=_env_float("SEND_PRIORITY_AGING", 5),
+)
+image_preparer = ImagePreparer(
+    cache_dir=os.getenv("IMAGE_CACHE_DIR", "data/image_cache"),
+    max_workers=_env_int("IMAGE_POOL_SIZE", 2),
+    max_side=_env_int("IMAGE_MAX_SIDE", 2560),
+)
+job_scheduler = JobScheduler(
+    fire_command=submit_command,
+    fire_message=send_scheduled_message,
+    store_path=os.getenv("SCHEDULE_FILE", "data/schedules.db"),
+    tz=tz,
+    max_jobs_per_user=_env_int("SCHEDULE_MAX_PER_USER", 20),
+)
+job_scheduler.register_commands(router)
+# 收到的消息日志，JOURNAL_FILE 为空时关闭
+journal: Optional[MessageJournal] = None
+if os.getenv("JOURNAL_FILE", "data/journal.db"):
+    journal = MessageJournal(
+        path=os.getenv("JOURNAL_FILE", "data/journal.db"),
+        retention_days=_env_float("JOURNAL_RETENTION_DAYS", 30),
+        tz=tz,
+    )
+    journal.register_commands(router)
+# 可以使用管理员指令的用户，默认应用填 userid，其他应用填 应用名|userid
+admin_users = frozenset(user.strip() for user in os.getenv("ADMIN_USERS", "").split(",") if user.strip())
+command_stats.register_commands(router, admin_users)
 
 
 @app.get("/health")
@@ -125,6 +369,157 @@ def health() -> dict[str, bool]:
     return {"ok": True}
 
 
+@app.get("/metrics")
+def metrics_endpoint() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def require_admin(x_admin_token: str = Header(default="")) -> None:
+    if not admin_token or not hmac.compare_digest(x_admin_token.encode(), admin_token.encode()):
+        raise HTTPException(status_code=403, detail="forbidden")
+
+
+def _parse_admin_time(value: str) -> Optional[float]:
+    # 支持 Unix 时间戳或 ISO 格式时间（东八区），如 2024-05-01、2024-05-01T09:00
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"invalid time: {value}") from exc
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=tz)
+    return parsed.timestamp()
+
+
+@app.get("/admin/journal", dependencies=[Depends(require_admin)])
+async def admin_journal(
+        user: str = Query(default=""),
+        tenant: str = Query(default=DEFAULT_TENANT),
+        msg_type: str = Query(default=""),
+        since: str = Query(default=""),
+        until: str = Query(default=""),
+        limit: int = Query(default=100, ge=1, le=1000),
+) -> dict:
+    if journal is None:
+        raise HTTPException(status_code=404, detail="journal is disabled")
+    entries = await asyncio.to_thread(
+        journal.query,
+        tenant=tenant,
+        user_id=user or None,
+        msg_type=msg_type or None,
+        since=_parse_admin_time(since),
+        until=_parse_admin_time(until),
+        limit=limit,
+    )
+    return {"messages": [entry.to_dict() for entry in entries]}
+
+
+@app.get("/admin/sessions", dependencies=[Depends(require_admin)])
+async def admin_sessions(limit: int = Query(default=100, ge=1, le=1000)) -> dict:
+    return await asyncio.to_thread(router.sessions.report, limit)
+
+
+@app.get("/admin/stats", dependencies=[Depends(require_admin)])
+def admin_stats() -> dict:
+    return {"tracemalloc": tracemalloc.is_tracing(), "commands": command_stats.report()}
+
+
+profiler = Profiler()
+
+
+@app.get("/admin/profile/cpu", dependencies=[Depends(require_admin)])
+async def admin_profile_cpu(
+        seconds: float = Query(default=10, gt=0, le=MAX_PROFILE_SECONDS),
+        mode: str = Query(default="sample", pattern="^(sample|cprofile)$"),
+        interval_ms: float = Query(default=5, ge=1, le=1000),
+) -> Response:
+    try:
+        if mode == "cprofile":
+            data = await profiler.cprofile(seconds)
+            return Response(
+                data,
+                media_type="application/octet-stream",
+                headers={"Content-Disposition": 'attachment; filename="profile.prof"'},
+            )
+        return PlainTextResponse(await profiler.sample(seconds, interval_ms / 1000))
+    except ProfilerBusyError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+
+
+@app.post("/admin/profile/memory/start", dependencies=[Depends(require_admin)])
+def admin_memory_start(frames: int = Query(default=10, ge=1, le=100)) -> dict:
+    return {"started": profiler.start_tracing(frames)}
+
+
+@app.post("/admin/profile/memory/snapshot", dependencies=[Depends(require_admin)])
+async def admin_memory_snapshot(
+        limit: int = Query(default=30, ge=1, le=500),
+        group_by: str = Query(default="lineno", pattern="^(lineno|filename|traceback)$"),
+) -> dict:
+    try:
+        return await asyncio.to_thread(profiler.snapshot, limit, group_by)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+
+
+@app.post("/admin/profile/memory/stop", dependencies=[Depends(require_admin)])
+def admin_memory_stop() -> dict:
+    profiler.stop_tracing()
+    return {"stopped": True}
+
+
+@app.get("/admin/tasks", dependencies=[Depends(require_admin)])
+async def admin_tasks(name: str = Query(default="")) -> PlainTextResponse:
+    return PlainTextResponse(dump_tasks(name))
+
+
+@app.get("/admin/queue", dependencies=[Depends(require_admin)])
+async def admin_queue() -> dict:
+    if job_queue is None:
+        raise HTTPException(status_code=404, detail="job queue is disabled")
+    stats, leases = await asyncio.gather(asyncio.to_thread(job_queue.stats), asyncio.to_thread(job_queue.leases))
+    now = time.time()
+    return {
+        "stats": stats,
+        "leases": [
+            {
+                "job_id": job.job_id,
+                "user_id": job.user_id,
+                "content": job.content,
+                "attempts": job.attempts,
+                "owner": job.lease_owner,
+                "expires_in": round(job.lease_expires - now, 1),
+            }
+            for job in leases
+        ],
+    }
+
+
+def get_tenant(tenant_name: str) -> Tenant:
+    tenant = tenants.get(tenant_name) if tenant_name else None
+    if tenant is None:
+        logger.warning("Callback for unknown tenant: %s", tenant_name)
+        raise HTTPException(status_code=404, detail="unknown tenant")
+    return tenant
+
+
+def get_coalescer(tenant: Tenant) -> Optional[NotificationCoalescer]:
+    if coalesce_ms <= 0:
+        return None
+    coalescer = coalescers.get(tenant.name)
+    if coalescer is None:
+        coalescer = coalescers[tenant.name] = NotificationCoalescer(
+            send=partial(send_message_to_user, tenant=tenant),
+            window=coalesce_ms / 1000,
+        )
+    return coalescer
+
+
 @app.get("/wecom/callback")
 def verify_wecom_url(
         msg_signature: str = Query(default=""),
@@ -132,6 +527,22 @@ def verify_wecom_url(
         nonce: str = Query(default=""),
         echostr: str = Query(default=""),
 ) -> PlainTextResponse:
+    return verify_tenant_url(default_tenant, msg_signature, timestamp, nonce, echostr)
+
+
+@app.get("/wecom/callback/{tenant_name}")
+def verify_wecom_tenant_url(
+        tenant_name: str,
+        msg_signature: str = Query(default=""),
+        timestamp: str = Query(default=""),
+        nonce: str = Query(default=""),
+        echostr: str = Query(default=""),
+) -> PlainTextResponse:
+    return verify_tenant_url(get_tenant(tenant_name), msg_signature, timestamp, nonce, echostr)
+
+
+def verify_tenant_url(tenant: Tenant, msg_signature: str, timestamp: str, nonce: str, echostr: str) -> PlainTextResponse:
+    crypto = tenant.crypto
     if not echostr:
         logger.warning("URL verify failed: missing echostr")
         raise HTTPException(status_code=400, detail="echostr is required")
@@ -167,12 +578,47 @@ async def wecom_callback(
         logger.warning("Message callback failed: request body is empty")
         raise HTTPException(status_code=400, detail="request body is empty")
 
+    # 多应用共用回调地址时，按消息外层的 AgentID 选择应用
+    tenant = default_tenant
+    if len(tenants) > 1:
+        try:
+            agent_id = xml_to_dict(raw_xml).get("AgentID", "")
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        tenant = tenants.by_agent_id(agent_id) or default_tenant
+    return await handle_callback(tenant, raw_xml, msg_signature, timestamp, nonce)
+
+
+@app.post("/wecom/callback/{tenant_name}")
+async def wecom_tenant_callback(
+        request: Request,
+        tenant_name: str,
+        msg_signature: str = Query(default=""),
+        timestamp: str = Query(default=""),
+        nonce: str = Query(default=""),
+) -> Response:
+    tenant = get_tenant(tenant_name)
+    raw_xml = (await request.body()).decode("utf-8")
+    if not raw_xml:
+        logger.warning("Message callback failed: request body is empty, tenant=%s", tenant_name)
+        raise HTTPException(status_code=400, detail="request body is empty")
+    return await handle_callback(tenant, raw_xml, msg_signature, timestamp, nonce)
+
+
+async def handle_callback(tenant: Tenant, raw_xml: str, msg_signature: str, timestamp: str, nonce: str) -> Response:
+    crypto = tenant.crypto
+    if not crypto:
+        logger.error("Message callback failed: crypto is disabled, tenant=%s", tenant.name)
+        raise HTTPException(status_code=400, detail="crypto is disabled")
+
     try:
-        ret, sMsg = crypto.DecryptMsg(raw_xml, msg_signature, timestamp, nonce)
+        with loop_monitor.step(f"callback decrypt {tenant.name}"):
+            ret, sMsg = crypto.DecryptMsg(raw_xml, msg_signature, timestamp, nonce)
         if ret != 0:
             logger.error("Message callback failed: decrypt message error")
             raise HTTPException(status_code=400, detail=f"decrypt failed: ret: {ret}")
-        xml_data = xml_to_dict(sMsg)
+        with loop_monitor.step(f"callback parse {tenant.name}"):
+            xml_data = xml_to_dict(sMsg)
         logger.debug(f"Received message {xml_data}")
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -194,99 +640,281 @@ async def wecom_callback(
             pass
 
     logger.info(f"Received message {content} from {fromUser} at {msg_time}")
+    if journal is not None:
+        journal.record(
+            tenant.name,
+            fromUser,
+            msgType,
+            content=content or xml_data.get("EventKey", ""),
+            event=event,
+            msg_id=msgId,
+            ts=float(creatTime) if creatTime.isdigit() else None,
+        )
+    if msgType == "event" and event == "template_card_event":
+        # 卡片按钮 key 为 "cmd:<指令>" 时按该用户发送的指令处理，如进度卡片上的取消按钮
+        event_key = xml_data.get("EventKey", "")
+        if event_key.startswith("cmd:"):
+            await accept_command(
+                scope_user_id(tenant.name, fromUser),
+                event_key[len("cmd:"):],
+                dedup_key=f"{tenant.name}:{fromUser}:{creatTime}:{event_key}",
+            )
+        return PlainTextResponse("success")
     if msgType != "text":
         return PlainTextResponse("success")
 
-    asyncio.create_task(handle_command_and_notify(from_user=fromUser, content=content))
+    await accept_command(
+        scope_user_id(tenant.name, fromUser),
+        content,
+        dedup_key=f"{tenant.name}:{msgId}" if msgId else None,
+    )
     return PlainTextResponse("success")
 
 
-async def handle_command_and_notify(from_user: str, content: str) -> None:
+async def handle_command_and_notify(from_user: str, content: str, tenant: Optional[Tenant] = None) -> None:
+    tenant = tenant or default_tenant
+    coalescer = get_coalescer(tenant)
     try:
         await router.dispatch(
             CommandContext(
                 user_id=from_user,
                 content=content,
-                send_message=send_message_to_user,
-            )
+                send_message=coalescer.send if coalescer else partial(send_message_to_user, tenant=tenant),
+                update_card=partial(update_card_for_user, tenant=tenant),
+                recall_message=partial(recall_message, tenant=tenant),
+                tenant=tenant.name,
+                upload_image=partial(upload_image, tenant=tenant),
+                lookup_user=partial(lookup_user, tenant=tenant),
+            ),
+            commands=tenant.config.commands,
         )
     except Exception:
         logger.exception("Async command dispatch failed, user=%s, content=%s", from_user, content)
         return
+    finally:
+        if coalescer:
+            await coalescer.flush(from_user)
 
     logger.info("Async command completed, user=%s", from_user)
 
 
-async def send_message_to_user(to_user: str, message: OutboundMessage) -> None:
+async def _send_body(sender: WeComSender, msg_type: str, body: bytes, to_user: str) -> Optional[dict]:
+    # 每个 message/send 请求在这里计数一次
+    send_requests_total.inc(msg_type=msg_type)
+    return await quick_lane.run(sender.send_body, msg_type, body, to_user)
+
+
+async def _send_text_parts(sender: WeComSender, to_user: str, message: OutboundMessage) -> Optional[dict]:
+    # 超过字节上限的内容切分后按顺序逐段发送，过长的内容改为以文件发送，避免刷屏
+    msg_type = message.msg_type
+    limit = MESSAGE_BYTE_LIMITS[msg_type]
+    if len(message.content.encode("utf-8")) > limit * text_max_parts:
+        return await _send_text_as_file(sender, to_user, message)
+    parts = split_message(message.content, limit, markdown=msg_type == "markdown", max_parts=text_max_parts)
+    if len(parts) > 1:
+        split_parts_total.inc(len(parts) - 1, msg_type=msg_type)
+        messages = [type(message)(part) for part in parts]
+    else:
+        messages = [message]
+    result = None
+    for part in messages:
+        body = part.to_request_body(sender.agent_id, to_user)
+        result = await _send_body(sender, msg_type, body, to_user)
+    return result
+
+
+async def _send_text_as_file(sender: WeComSender, to_user: str, message: OutboundMessage) -> Optional[dict]:
+    workdir = tempfile.mkdtemp(prefix="wecom-text-")
+    try:
+        path = os.path.join(workdir, "message.md" if message.msg_type == "markdown" else "message.txt")
+        await asyncio.to_thread(_write_text, path, message.content)
+        split_as_file_total.inc(msg_type=message.msg_type)
+        notice = f"内容过长（超过 {text_max_parts} 条消息），已转为文件发送"
+        body = TextMessage(notice).to_request_body(sender.agent_id, to_user)
+        await _send_body(sender, "text", body, to_user)
+        return await _send_file_parts(sender, to_user, FileMessage(path))
+    finally:
+        try:
+            await asyncio.to_thread(shutil.rmtree, workdir, True)
+        except Exception:
+            logger.exception("Remove text file failed, dir=%s", workdir)
+
+
+def _write_text(path: str, content: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+async def _send_serialized(sender: WeComSender, to_user: str, message: OutboundMessage) -> Optional[dict]:
+    media_id = None
+    if message.upload_path:
+        media_id = await media_lane.run(sender.upload_media, message.media_type, message.upload_path)
+        record_upload(message.upload_path)
+    body = message.to_request_body(sender.agent_id, to_user, media_id)
+    return await _send_body(sender, message.msg_type, body, to_user)
+
+
+async def _send_file_parts(sender: WeComSender, to_user: str, message: OutboundMessage) -> Optional[dict]:
+    # 超过上传上限的文件流式压缩并切分，分片并发上传（最多 FILE_UPLOAD_CONCURRENCY 个），按顺序发送
+    if os.path.getsize(message.file_path) <= FILE_SIZE_LIMIT:
+        return await _send_serialized(sender, to_user, message)
+    workdir = tempfile.mkdtemp(prefix="wecom-file-")
+    try:
+        parts = await media_lane.run(split_file, message.file_path, workdir)
+        total = len(parts.paths)
+        file_parts_total.inc(total)
+        semaphore = asyncio.Semaphore(file_upload_concurrency)
+
+        async def upload(path: str) -> str:
+            async with semaphore:
+                media_id = await media_lane.run(sender.upload_media, "file", path)
+                record_upload(path)
+                return media_id
+
+        uploads = [asyncio.create_task(upload(path)) for path in parts.paths]
+        try:
+            name = os.path.basename(message.file_path)
+            notice = f"文件 {name} 超过 {FILE_SIZE_LIMIT // 1024 // 1024}MB，" + (
+                f"已压缩为 {parts.joined_name}" if total == 1 else f"已{'压缩并' if parts.compressed else ''}分为 {total} 个文件"
+            )
+            if parts.join_hint():
+                notice += f"，还原: {parts.join_hint()}"
+            body = TextMessage(notice).to_request_body(sender.agent_id, to_user)
+            result = await _send_body(sender, "text", body, to_user)
+            for index, task in enumerate(uploads, start=1):
+                media_id = await task
+                body = FileMessage(parts.paths[index - 1]).to_request_body(sender.agent_id, to_user, media_id)
+                result = await _send_body(sender, "file", body, to_user)
+                logger.info("File part sent, user=%s, file=%s, part=%s/%s", to_user, name, index, total)
+        finally:
+            for task in uploads:
+                task.cancel()
+        return result
+    finally:
+        # 不经过有界的 media 线程池：发送大文件时线程池可能已满，清理仍要执行，且不能掩盖发送结果或原异常
+        try:
+            await asyncio.to_thread(shutil.rmtree, workdir, True)
+        except Exception:
+            logger.exception("Remove file parts failed, dir=%s", workdir)
+
+
+async def _send_image(sender: WeComSender, to_user: str, message: OutboundMessage) -> Optional[dict]:
+    # 非 jpg/png 或超过 2MB 的图片先转码压缩（结果按内容缓存）
+    prepared = await image_preparer.prepare(message.media_path)
+    if prepared != message.media_path:
+        message = ImageMessage(prepared)
+    return await _send_serialized(sender, to_user, message)
+
+
+# 需要特殊处理的消息类型，其余类型直接序列化发送
+SEND_HANDLERS = {
+    "text": _send_text_parts,
+    "markdown": _send_text_parts,
+    "file": _send_file_parts,
+    "image": _send_image,
+}
+
+
+async def send_message_to_user(
+        to_user: str,
+        message: OutboundMessage,
+        tenant: Optional[Tenant] = None,
+) -> Optional[dict]:
+    tenant = tenant or default_tenant
+    sender = tenant.sender
     if not sender:
         logger.warning("Message sender is not configured, skip notify user=%s", to_user)
-        return
+        return None
+    if suppressor is not None and not suppressor.allow(tenant.name, to_user, message):
+        return None
+    return await _deliver_message(to_user, message, tenant)
 
+
+async def _deliver_message(to_user: str, message: OutboundMessage, tenant: Tenant) -> Optional[dict]:
+    sender = tenant.sender
+    if not sender:
+        return None
     try:
-        msg_type = message.msg_type.lower()
-        payload = message.payload
-
-        if msg_type == "text":
-            call = partial(sender.send_text, message=payload["content"], touser=to_user)
-            await asyncio.to_thread(call)
-        elif msg_type == "markdown":
-            call = partial(sender.send_markdown, message=payload["content"], touser=to_user)
-            await asyncio.to_thread(call)
-        elif msg_type == "textcard":
-            call = partial(
-                sender.send_textcard,
-                card_title=payload["title"],
-                desc=payload["description"],
-                link=payload["url"],
-                btn=payload.get("btn", "详情"),
-                touser=to_user,
-            )
-            await asyncio.to_thread(call)
-        elif msg_type == "image":
-            call = partial(sender.send_image, iamge_path=payload["media_path"], touser=to_user)
-            await asyncio.to_thread(call)
-        elif msg_type == "voice":
-            call = partial(sender.send_voice, voice_path=payload["voice_path"], touser=to_user)
-            await asyncio.to_thread(call)
-        elif msg_type == "video":
-            call = partial(
-                sender.send_video,
-                video_path=payload["video_path"],
-                title=payload.get("title"),
-                desc=payload.get("description"),
-                touser=to_user,
-            )
-            await asyncio.to_thread(call)
-        elif msg_type == "file":
-            call = partial(sender.send_file, file_path=payload["file_path"], touser=to_user)
-            await asyncio.to_thread(call)
-        elif msg_type == "news":
-            if "articles" in payload:
-                call = partial(sender.send_graphic_list, articles=payload["articles"], touser=to_user)
-                await asyncio.to_thread(call)
-            else:
-                call = partial(
-                    sender.send_graphic,
-                    card_title=payload["title"],
-                    desc=payload["description"],
-                    link=payload["url"],
-                    image_link=payload["image_url"],
-                    touser=to_user,
-                )
-                await asyncio.to_thread(call)
-        elif msg_type in ("miniprogram_notice", "mini_program"):
-            call = partial(
-                sender.send_mini_program,
-                title=payload["title"],
-                description=payload["description"],
-                content_item=payload["content_item"],
-                emphasis_first_item=payload.get("emphasis_first_item", False),
-                appid=payload["appid"],
-                page=payload["page"],
-                touser=to_user,
-            )
-            await asyncio.to_thread(call)
-        else:
-            raise ValueError(f"unsupported message type: {message.msg_type}")
+        async with tenant.send_slot(outbound_gate):
+            send = SEND_HANDLERS.get(message.msg_type, _send_serialized)
+            return await send(sender, to_user, message)
     except Exception:
         logger.exception("Send async reply failed, user=%s, msg_type=%s", to_user, message.msg_type)
+    return None
+
+
+async def send_suppression_summary(tenant_name: str, to_user: str, message: OutboundMessage) -> None:
+    tenant = tenants.get(tenant_name)
+    if tenant is not None:
+        await _deliver_message(to_user, message, tenant)
+
+
+# 相同消息在窗口内重复发送给同一用户时只发一次，NOTIFY_DEDUP_WINDOW 为 0 时关闭
+dedup_window = _env_float("NOTIFY_DEDUP_WINDOW", 0)
+suppressor: Optional[OutboundSuppressor] = (
+    OutboundSuppressor(
+        send_summary=send_suppression_summary,
+        window=dedup_window,
+        max_entries=_env_int("NOTIFY_DEDUP_MAX", 10000),
+        mode=os.getenv("NOTIFY_DEDUP_MODE", "summary").strip().lower(),
+    )
+    if dedup_window > 0
+    else None
+)
+
+
+async def update_card_for_user(
+        to_user: str,
+        response_code: str,
+        template_card: dict,
+        tenant: Optional[Tenant] = None,
+) -> bool:
+    sender = (tenant or default_tenant).sender
+    if not sender:
+        return False
+    try:
+        call = partial(sender.update_template_card, response_code=response_code, template_card=template_card,
+                       userids=[to_user])
+        result = await quick_lane.run(call)
+    except Exception:
+        logger.exception("Update template card failed, user=%s", to_user)
+        return False
+    return bool(result) and result.get("errcode") == 0
+
+
+async def recall_message(msgid: str, tenant: Optional[Tenant] = None) -> bool:
+    sender = (tenant or default_tenant).sender
+    if not sender:
+        return False
+    try:
+        result = await quick_lane.run(sender.recall_message, msgid)
+    except Exception:
+        logger.exception("Recall message failed, msgid=%s", msgid)
+        return False
+    return bool(result) and result.get("errcode") == 0
+
+
+async def upload_image(image_path: str, tenant: Optional[Tenant] = None) -> Optional[str]:
+    sender = (tenant or default_tenant).sender
+    if not sender:
+        return None
+    try:
+        prepared = await image_preparer.prepare(image_path)
+        url = await media_lane.run(sender.upload_image, prepared)
+        record_upload(prepared)
+        return url
+    except Exception:
+        logger.exception("Upload image failed, path=%s", image_path)
+        return None
+
+
+async def lookup_user(user_id: str, tenant: Optional[Tenant] = None) -> Optional[dict]:
+    sender = (tenant or default_tenant).sender
+    if not sender:
+        return None
+    try:
+        result = await directory_lane.run(sender.get_user_info, user_id)
+    except Exception:
+        logger.exception("Lookup user failed, user=%s", user_id)
+        return None
+    return result if result and result.get("errcode") == 0 else None
@@ -0,0 +1,311 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Any, ClassVar
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 为可选依赖，缺失时退回标准库
+    orjson = None
+
+
+def dumps(data: Any) -> bytes:
+    """
+    序列化为请求体字节，优先使用 orjson
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _require_str(field: str, value: Any) -> str:
+    if not isinstance(value, str) or not value:
+        raise ValueError(f"{field} must be a non-empty string")
+    return value
+
+
+def _optional_str(field: str, value: Any) -> str | None:
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value or None
+
+
+class OutboundMessage(ABC):
+    """
+    发送给用户的消息基类，每种企业微信 msgtype 对应一个子类，构造时校验参数。
+    素材文件在发送时才读取，文件不存在时与其他发送失败一样记录日志，不在构造时抛出。
+    - payload: 与 ctx.notify(msg_type, payload) 一致的参数字典，用于持久化和兼容旧代码
+    - body: 请求体中 msgtype 对应的内容
+    - to_request_body: 直接序列化为 message/send 的请求体字节
+    """
+
+    __slots__ = ()
+    msg_type: ClassVar[str] = ""
+    # 发送前需要上传的素材类型（image/voice/video/file），None 表示不需要上传
+    media_type: ClassVar[str | None] = None
+    # 含父类在内的全部 slots，子类定义时计算一次
+    _fields: ClassVar[tuple[str, ...]] = ()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        fields: list[str] = []
+        for klass in reversed(cls.__mro__):
+            fields.extend(klass.__dict__.get("__slots__", ()))
+        cls._fields = tuple(fields)
+
+    @property
+    def payload(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in self._fields if getattr(self, name) is not None}
+
+    @property
+    def upload_path(self) -> str | None:
+        """
+        需要上传的本地素材路径
+        """
+        return None
+
+    @classmethod
+    def from_payload(cls, payload: dict[str, Any]) -> "OutboundMessage":
+        try:
+            return cls(**payload)
+        except TypeError as exc:
+            raise ValueError(f"invalid {cls.msg_type} payload: {exc}") from exc
+
+    @abstractmethod
+    def body(self, media_id: str | None = None) -> dict[str, Any]:
+        pass
+
+    def to_request_body(self, agentid: str, touser: str, media_id: str | None = None) -> bytes:
+        if self.media_type and not media_id:
+            raise ValueError(f"{self.msg_type} message requires media_id")
+        return dumps({
+            "touser": touser,
+            "msgtype": self.msg_type,
+            "agentid": agentid,
+            self.msg_type: self.body(media_id),
+        })
+
+    def __eq__(self, other: object) -> bool:
+        return type(self) is type(other) and self.payload == other.payload
+
+    def __hash__(self) -> int:
+        # 与 __eq__ 一致：相等的 payload 键顺序可能不同，按排序后的序列化结果计算
+        return hash((type(self), json.dumps(self.payload, sort_keys=True, ensure_ascii=False, default=str)))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.payload!r})"
+
+
+class TextMessage(OutboundMessage):
+    __slots__ = ("content",)
+    msg_type = "text"
+
+    def __init__(self, content: str) -> None:
+        if not isinstance(content, str):
+            raise ValueError("content must be a string")
+        self.content = content
+
+    def body(self, media_id: str | None = None) -> dict[str, Any]:
+        return {"content": self.content}
+
+
+class MarkdownMessage(TextMessage):
+    __slots__ = ()
+    msg_type = "markdown"
+
+
+class TextCardMessage(OutboundMessage):
+    __slots__ = ("title", "description", "url", "btn")
+    msg_type = "textcard"
+
+    def __init__(self, title: str, description: str, url: str, btn: str = "详情") -> None:
+        self.title = _require_str("title", title)
+        self.description = _require_str("description", description)
+        self.url = _require_str("url", url)
+        self.btn = _optional_str("btn", btn) or "详情"
+
+    def body(self, media_id: str | None = None) -> dict[str, Any]:
+        return {"title": self.title, "description": self.description, "url": self.url, "btntxt": self.btn}
+
+
+class ImageMessage(OutboundMessage):
+    __slots__ = ("media_path",)
+    msg_type = "image"
+    media_type = "image"
+
+    def __init__(self, media_path: str) -> None:
+        self.media_path = _require_str("media_path", media_path)
+
+    @property
+    def upload_path(self) -> str | None:
+        return self.media_path
+
+    def body(self, media_id: str | None = None) -> dict[str, Any]:
+        return {"media_id": media_id}
+
+
+class VoiceMessage(OutboundMessage):
+    __slots__ = ("voice_path",)
+    msg_type = "voice"
+    media_type = "voice"
+
+    def __init__(self, voice_path: str) -> None:
+        self.voice_path = _require_str("voice_path", voice_path)
+
+    @property
+    def upload_path(self) -> str | None:
+        return self.voice_path
+
+    def body(self, media_id: str | None = None) -> dict[str, Any]:
+        return {"media_id": media_id}
+
+
+class VideoMessage(OutboundMessage):
+    __slots__ = ("video_path", "title", "description")
+    msg_type = "video"
+    media_type = "video"
+
+    def __init__(self, video_path: str, title: str | None = None, description: str | None = None) -> None:
+        self.video_path = _require_str("video_path", video_path)
+        self.title = _optional_str("title", title)
+        self.description = _optional_str("description", description)
+
+    @property
+    def upload_path(self) -> str | None:
+        return self.video_path
+
+    def body(self, media_id: str | None = None) -> dict[str, Any]:
+        body = {"media_id": media_id}
+        if self.title:
+            body["title"] = self.title
+        if self.description:
+            body["description"] = self.description
+        return body
+
+
+class FileMessage(OutboundMessage):
+    __slots__ = ("file_path",)
+    msg_type = "file"
+    media_type = "file"
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = _require_str("file_path", file_path)
+
+    @property
+    def upload_path(self) -> str | None:
+        return self.file_path
+
+    def body(self, media_id: str | None = None) -> dict[str, Any]:
+        return {"media_id": media_id}
+
+
+class NewsMessage(OutboundMessage):
+    __slots__ = ("articles",)
+    msg_type = "news"
+
+    def __init__(self, articles: list[dict[str, Any]]) -> None:
+        if not isinstance(articles, list) or not 1 <= len(articles) <= 8:
+            raise ValueError("articles must be a list of 1~8 items")
+        for article in articles:
+            if not isinstance(article, dict):
+                raise ValueError("article must be a dict")
+            _require_str("article.title", article.get("title"))
+        self.articles = articles
+
+    @classmethod
+    def from_payload(cls, payload: dict[str, Any]) -> "OutboundMessage":
+        if "articles" in payload:
+            return super().from_payload(payload)
+        # 单条图文: title / description / url / image_url
+        article = {
+            "title": payload.get("title"),
+            "description": payload.get("description"),
+            "url": payload.get("url"),
+            "picurl": payload.get("image_url"),
+        }
+        return cls([article])
+
+    def body(self, media_id: str | None = None) -> dict[str, Any]:
+        return {"articles": self.articles}
+
+
+class MiniProgramMessage(OutboundMessage):
+    __slots__ = ("appid", "page", "title", "description", "content_item", "emphasis_first_item")
+    msg_type = "miniprogram_notice"
+
+    def __init__(
+            self,
+            appid: str,
+            page: str,
+            title: str,
+            description: str,
+            content_item: list[dict[str, str]],
+            emphasis_first_item: bool = False,
+    ) -> None:
+        self.appid = _require_str("appid", appid)
+        self.page = _require_str("page", page)
+        self.title = _require_str("title", title)
+        self.description = _optional_str("description", description)
+        if not isinstance(content_item, list):
+            raise ValueError("content_item must be a list")
+        self.content_item = content_item
+        self.emphasis_first_item = bool(emphasis_first_item)
+
+    def body(self, media_id: str | None = None) -> dict[str, Any]:
+        return {
+            "appid": self.appid,
+            "page": self.page,
+            "title": self.title,
+            "description": self.description,
+            "emphasis_first_item": self.emphasis_first_item,
+            "content_item": self.content_item,
+        }
+
+
+class TemplateCardMessage(OutboundMessage):
+    __slots__ = ("card",)
+    msg_type = "template_card"
+
+    def __init__(self, card: dict[str, Any]) -> None:
+        if not isinstance(card, dict):
+            raise ValueError("template card must be a dict")
+        _require_str("card_type", card.get("card_type"))
+        self.card = card
+
+    @property
+    def payload(self) -> dict[str, Any]:
+        return self.card
+
+    @classmethod
+    def from_payload(cls, payload: dict[str, Any]) -> "OutboundMessage":
+        return cls(payload)
+
+    def body(self, media_id: str | None = None) -> dict[str, Any]:
+        return self.card
+
+
+MESSAGE_TYPES: dict[str, type[OutboundMessage]] = {
+    cls.msg_type: cls
+    for cls in (
+        TextMessage,
+        MarkdownMessage,
+        TextCardMessage,
+        ImageMessage,
+        VoiceMessage,
+        VideoMessage,
+        FileMessage,
+        NewsMessage,
+        MiniProgramMessage,
+        TemplateCardMessage,
+    )
+}
+MESSAGE_TYPES["mini_program"] = MiniProgramMessage
+
+
+def make_message(msg_type: str, payload: dict[str, Any]) -> OutboundMessage:
+    """
+    按 msg_type 构造对应的消息对象
+    """
+    cls = MESSAGE_TYPES.get((msg_type or "").lower())
+    if cls is None:
+        raise ValueError(f"unsupported message type: {msg_type}")
+    return cls.from_payload(payload)
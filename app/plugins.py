@@ -0,0 +1,305 @@
+import ast
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from app.metrics import metrics
+
+logger = logging.getLogger("assistant")
+
+plugin_import_seconds = metrics.gauge("plugin_import_seconds", "Time spent importing each command plugin module")
+plugin_reloads_total = metrics.counter("plugin_reloads_total", "Command plugin modules reloaded after a change")
+
+# 模块名 -> {指令名: handler}，由 @command 在模块导入时填充
+_loaded: dict[str, dict[str, Callable[..., Awaitable[None]]]] = {}
+# 续接处理函数名 -> handler，由 @continuation 在模块导入时填充
+_steps: dict[str, Callable[..., Awaitable[None]]] = {}
+_SPEC_FIELDS = ("help", "usage", "cpu_bound", "cache_ttl", "aliases")
+
+
+@dataclass(frozen=True)
+class CommandSpec:
+    name: str
+    module: str
+    help: str = ""
+    # 帮助中显示的用法，默认为指令名
+    usage: str = ""
+    cpu_bound: bool = False
+    cache_ttl: float | None = None
+    aliases: tuple[str, ...] = ()
+    lineno: int = 0
+
+
+def command(
+        name: str,
+        help: str = "",
+        usage: str = "",
+        cpu_bound: bool = False,
+        cache_ttl: float | None = None,
+        aliases: tuple[str, ...] = (),
+):
+    """
+    声明插件指令。参数必须是字面量：服务启动时只解析模块源码读取这些参数，首次使用该指令时才导入模块。
+
+        @command("ping", help="你还活着吗", aliases=("在吗",))
+        async def handle_ping(arg: str, ctx: CommandContext) -> None:
+            ...
+    """
+
+    def decorate(func):
+        _loaded.setdefault(func.__module__, {})[name.lower()] = func
+        return func
+
+    return decorate
+
+
+def continuation(name: str):
+    """
+    声明续接处理函数：指令中调用 ctx.continue_with(name, data) 后，该用户的下一条消息交给它处理。
+    函数签名与指令 handler 相同，用 await ctx.session() 读取会话数据。
+    """
+
+    def decorate(func):
+        _steps[name] = func
+        return func
+
+    return decorate
+
+
+def _is_command_decorator(node: ast.expr) -> bool:
+    if not isinstance(node, ast.Call):
+        return False
+    func = node.func
+    return (isinstance(func, ast.Name) and func.id == "command") or (
+        isinstance(func, ast.Attribute) and func.attr == "command"
+    )
+
+
+def parse_specs(path: str, module: str) -> list[CommandSpec]:
+    """
+    从源码中读取 @command(...) 声明，不导入模块
+    """
+    with open(path, encoding="utf-8") as fp:
+        tree = ast.parse(fp.read(), filename=path)
+    specs = []
+    for node in tree.body:
+        if not isinstance(node, (ast.AsyncFunctionDef, ast.FunctionDef)):
+            continue
+        for decorator in node.decorator_list:
+            if not _is_command_decorator(decorator):
+                continue
+            try:
+                args = [ast.literal_eval(arg) for arg in decorator.args]
+                kwargs: dict[str, Any] = {kw.arg: ast.literal_eval(kw.value) for kw in decorator.keywords}
+            except ValueError:
+                logger.warning("Plugin %s:%s: @command arguments must be literals", path, node.lineno)
+                continue
+            names = dict(zip(("name",) + _SPEC_FIELDS, args))
+            names.update(kwargs)
+            if not isinstance(names.get("name"), str):
+                logger.warning("Plugin %s:%s: @command name is required", path, node.lineno)
+                continue
+            specs.append(
+                CommandSpec(
+                    name=names["name"].lower(),
+                    module=module,
+                    help=names.get("help", ""),
+                    usage=names.get("usage", "") or names["name"].lower(),
+                    cpu_bound=bool(names.get("cpu_bound", False)),
+                    cache_ttl=names.get("cache_ttl"),
+                    aliases=tuple(alias.lower() for alias in names.get("aliases", ())),
+                    lineno=node.lineno,
+                )
+            )
+    return specs
+
+
+class PluginRegistry:
+    """
+    插件指令注册表：扫描 package 目录下的模块源码获取指令元数据，首次分发到某个指令时才导入其模块。
+    reload_interval > 0 时，分发前最多每 reload_interval 秒检查一次模块文件修改时间，文件变化后重新解析并重新加载模块；
+    同样最多每 reload_interval 秒扫描一次目录（rescan），新增的模块文件无需重启即可使用，删除的模块其指令不再可用。
+    重新加载只影响当前进程，进程池中的子进程由调用方根据 reloads 的变化重建。
+    """
+
+    def __init__(self, package: str = "app.commands", reload_interval: float = 2.0) -> None:
+        self.package = package
+        self.reload_interval = reload_interval
+        self._specs: dict[str, CommandSpec] = {}
+        # 模块名 -> (文件路径, mtime)
+        self._files: dict[str, tuple[str, float]] = {}
+        self._checked: dict[str, float] = {}
+        self._scanned = 0.0
+        self.import_seconds: dict[str, float] = {}
+        self.version = 0
+        # 成功重新加载模块的次数
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self.discover()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def get(self, name: str) -> CommandSpec | None:
+        return self._specs.get(name)
+
+    def specs(self) -> list[CommandSpec]:
+        return sorted(self._specs.values(), key=lambda spec: (spec.module, spec.lineno))
+
+    def _list_files(self) -> dict[str, str]:
+        """
+        模块名 -> 文件路径
+        """
+        files = {}
+        for directory in importlib.import_module(self.package).__path__:
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith(".py") and not filename.startswith("_"):
+                    files.setdefault(f"{self.package}.{filename[:-3]}", os.path.join(directory, filename))
+        return files
+
+    def _add_specs(self, specs: dict[str, CommandSpec], path: str, module: str) -> None:
+        for spec in self._parse(path, module):
+            if spec.name in specs:
+                logger.warning("Duplicate plugin command %s in %s, ignored", spec.name, module)
+                continue
+            specs[spec.name] = spec
+
+    def discover(self) -> None:
+        specs: dict[str, CommandSpec] = {}
+        files: dict[str, tuple[str, float]] = {}
+        for module, path in self._list_files().items():
+            files[module] = (path, os.path.getmtime(path))
+            self._add_specs(specs, path, module)
+        self._specs, self._files = specs, files
+        self._scanned = time.monotonic()
+        self.version += 1
+        logger.info("Plugin commands discovered: %s", ", ".join(sorted(specs)))
+
+    def scan_due(self) -> bool:
+        return self.reload_interval > 0 and time.monotonic() - self._scanned >= self.reload_interval
+
+    def rescan(self) -> None:
+        """
+        检查目录中新增和删除的模块文件（已有模块的修改在使用其指令时由 load 检查）；在事件循环中应放到线程里调用
+        """
+        with self._lock:
+            self._scanned = time.monotonic()
+            try:
+                found = self._list_files()
+            except OSError:
+                logger.exception("Scan plugin directory failed, package=%s", self.package)
+                return
+            added = sorted(found.keys() - self._files.keys())
+            removed = sorted(self._files.keys() - found.keys())
+            if not added and not removed:
+                return
+            specs = {name: spec for name, spec in self._specs.items() if spec.module not in removed}
+            for module in removed:
+                del self._files[module]
+                self._checked.pop(module, None)
+            for module in added:
+                path = found[module]
+                try:
+                    self._files[module] = (path, os.path.getmtime(path))
+                except OSError:
+                    continue
+                self._add_specs(specs, path, module)
+            self._specs = specs
+            self.version += 1
+            logger.info("Plugin modules changed, added=%s, removed=%s", ",".join(added), ",".join(removed))
+
+    @staticmethod
+    def _parse(path: str, module: str) -> list[CommandSpec]:
+        try:
+            return parse_specs(path, module)
+        except (OSError, SyntaxError):
+            logger.exception("Parse plugin failed: %s", path)
+            return []
+
+    def ready(self, name: str) -> Callable[..., Awaitable[None]] | None:
+        """
+        模块已导入且未到修改检查时间时直接返回 handler，否则返回 None，由调用方在线程中 load()
+        """
+        spec = self._specs.get(name)
+        if spec is None or spec.module not in sys.modules:
+            return None
+        if self.reload_interval > 0 and time.monotonic() - self._checked.get(spec.module, 0.0) >= self.reload_interval:
+            return None
+        return _loaded.get(spec.module, {}).get(name)
+
+    def load(self, name: str) -> Callable[..., Awaitable[None]] | None:
+        """
+        返回指令 handler，必要时导入或重新加载模块；导入可能较慢，在事件循环中应放到线程里调用
+        """
+        with self._lock:
+            spec = self._specs.get(name)
+            if spec is None:
+                return None
+            if self.reload_interval > 0:
+                self._check_reload(spec.module)
+                spec = self._specs.get(name)
+                if spec is None:
+                    return None
+            if spec.module not in sys.modules or spec.module not in _loaded:
+                self._import(spec.module, reload=spec.module in sys.modules)
+            return _loaded.get(spec.module, {}).get(name)
+
+    def step(self, name: str, command: str) -> Callable[..., Awaitable[None]] | None:
+        """
+        返回续接处理函数；服务重启后会话可能早于模块导入，先加载创建该会话的指令所在模块
+        """
+        if name not in _steps and command in self._specs:
+            self.load(command)
+        return _steps.get(name)
+
+    def _import(self, module: str, reload: bool) -> None:
+        start = time.perf_counter()
+        previous = _loaded.pop(module, None)
+        try:
+            if reload:
+                importlib.reload(sys.modules[module])
+            else:
+                importlib.import_module(module)
+        except Exception:
+            if previous is not None:
+                _loaded[module] = previous
+            raise
+        elapsed = time.perf_counter() - start
+        self.import_seconds[module] = elapsed
+        plugin_import_seconds.set(elapsed, module=module)
+        logger.info(
+            "Plugin %s, module=%s, commands=%s, took %.1fms",
+            "reloaded" if reload else "imported", module, ",".join(sorted(_loaded.get(module, {}))), elapsed * 1000,
+        )
+
+    def _check_reload(self, module: str) -> None:
+        now = time.monotonic()
+        if now - self._checked.get(module, 0.0) < self.reload_interval:
+            return
+        self._checked[module] = now
+        path, mtime = self._files[module]
+        try:
+            current = os.path.getmtime(path)
+        except OSError:
+            return
+        if current == mtime:
+            return
+        self._files[module] = (path, current)
+        specs = {name: spec for name, spec in self._specs.items() if spec.module != module}
+        for spec in self._parse(path, module):
+            specs.setdefault(spec.name, spec)
+        self._specs = specs
+        self.version += 1
+        if module in sys.modules:
+            try:
+                self._import(module, reload=True)
+                plugin_reloads_total.inc(module=module)
+                self.reloads += 1
+            except Exception:
+                # 保留旧版本的 handler，修复后再次保存文件会重新加载
+                logger.exception("Reload plugin failed, module=%s", module)
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator
+
+from app.metrics import metrics
+
+INTERACTIVE = "interactive"
+NORMAL = "normal"
+BULK = "bulk"
+# 优先级从高到低
+PRIORITIES = (INTERACTIVE, NORMAL, BULK)
+_RANK = {priority: rank for rank, priority in enumerate(PRIORITIES)}
+
+# 当前发送的消息优先级：用户消息触发的指令为 interactive，定时任务为 bulk，未指定为 normal
+send_priority: ContextVar[str] = ContextVar("send_priority", default=NORMAL)
+
+send_wait_seconds = metrics.histogram("send_queue_wait_seconds", "Time an outbound message waited for a send slot")
+send_waiting = metrics.gauge("send_queue_waiting", "Outbound messages waiting for a send slot")
+send_aged_total = metrics.counter("send_aged_total", "Send slots granted ahead of higher priorities because of aging")
+
+
+def check_priority(priority: str) -> str:
+    if priority not in _RANK:
+        raise ValueError(f"unknown priority: {priority}, expected one of {', '.join(PRIORITIES)}")
+    return priority
+
+
+@contextmanager
+def using_priority(priority: str) -> Iterator[None]:
+    """
+    在 with 块内（包括其中创建的任务）发送的消息使用 priority
+    """
+    token = send_priority.set(check_priority(priority))
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+
+class PriorityGate:
+    """
+    按优先级分配发送槽位，最多 capacity 条消息同时发送：
+    - 有空闲槽位时按 interactive > normal > bulk 的顺序放行排队中的消息，同一优先级先到先得
+    - 防止饿死：排队每满 aging 秒，等效优先级提升一级，bulk 等待 2 * aging 秒后与新到的 interactive 同级
+    """
+
+    def __init__(self, capacity: int, aging: float = 5.0) -> None:
+        self.capacity = max(1, capacity)
+        self.aging = aging
+        self._free = self.capacity
+        self._waiters: dict[str, deque[tuple[float, asyncio.Future]]] = {priority: deque() for priority in PRIORITIES}
+
+    def waiting(self, priority: str | None = None) -> int:
+        if priority is not None:
+            return len(self._waiters[priority])
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    @asynccontextmanager
+    async def slot(self, priority: str | None = None) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: str | None = None) -> None:
+        priority = check_priority(priority or send_priority.get())
+        if self._free > 0 and not self.waiting():
+            self._free -= 1
+            send_wait_seconds.observe(0, priority=priority)
+            return
+        future = asyncio.get_running_loop().create_future()
+        enqueued = time.monotonic()
+        waiters = self._waiters[priority]
+        waiters.append((enqueued, future))
+        send_waiting.set(len(waiters), priority=priority)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已分配槽位但调用方被取消，归还给下一个
+                self.release()
+            else:
+                try:
+                    waiters.remove((enqueued, future))
+                except ValueError:
+                    pass
+                send_waiting.set(len(waiters), priority=priority)
+            raise
+        send_wait_seconds.observe(time.monotonic() - enqueued, priority=priority)
+
+    def release(self) -> None:
+        self._free += 1
+        self._wake()
+
+    def _wake(self) -> None:
+        now = time.monotonic()
+        while self._free > 0:
+            best: str | None = None
+            best_score = 0.0
+            for priority in PRIORITIES:
+                waiters = self._waiters[priority]
+                while waiters and waiters[0][1].done():
+                    waiters.popleft()
+                if not waiters:
+                    continue
+                # 每个优先级内按到达顺序排队，只需比较各队首
+                score = _RANK[priority] - (now - waiters[0][0]) / self.aging if self.aging > 0 else _RANK[priority]
+                if best is None or score < best_score:
+                    best, best_score = priority, score
+            if best is None:
+                return
+            if any(self._waiters[priority] for priority in PRIORITIES[:_RANK[best]]):
+                send_aged_total.inc(priority=best)
+            _enqueued, future = self._waiters[best].popleft()
+            send_waiting.set(len(self._waiters[best]), priority=best)
+            self._free -= 1
+            future.set_result(None)
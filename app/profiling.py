@@ -0,0 +1,224 @@
+import asyncio
+import cProfile
+import collections
+import io
+import logging
+import marshal
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from types import FrameType
+from typing import Any
+
+from app.loop_monitor import _TimedAwaitable
+
+logger = logging.getLogger("assistant")
+
+MAX_PROFILE_SECONDS = 60.0
+
+
+class ProfilerBusyError(RuntimeError):
+    pass
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _collapse(frame: FrameType | None) -> list[str]:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class Profiler:
+    """
+    按需性能分析，同一时间只允许一个 CPU 分析；未调用时没有任何开销（不启动线程、不设置 profile 钩子）
+    - sample: 采样线程每 interval 秒记录一次所有线程的调用栈，输出 collapsed stacks（flamegraph.pl / speedscope 可直接读取）
+    - cprofile: 在事件循环线程开启 cProfile，输出 pstats 文件（python -m pstats / snakeviz 可读取），只覆盖事件循环线程
+    - 内存：tracemalloc 快照，与上一次快照对比增长最多的分配位置
+    """
+
+    def __init__(self) -> None:
+        self._busy = False
+        self._baseline: tracemalloc.Snapshot | None = None
+        self._snapshot_lock = threading.Lock()
+
+    def _acquire(self) -> None:
+        if self._busy:
+            raise ProfilerBusyError("another profile is running")
+        self._busy = True
+
+    async def sample(self, seconds: float, interval: float = 0.005) -> str:
+        """
+        :return: collapsed stacks，每行 “线程;外层函数;...;内层函数 采样次数”
+        """
+        self._acquire()
+        seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+        # 请求被取消时采样线程仍会执行到结束，由采样线程释放
+        counts = await asyncio.to_thread(self._sample, seconds, max(0.001, interval))
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+    def _sample(self, seconds: float, interval: float) -> collections.Counter:
+        me = threading.get_ident()
+        counts: collections.Counter[str] = collections.Counter()
+        deadline = time.monotonic() + seconds
+        samples = 0
+        try:
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    thread = names.get(ident, str(ident)).replace(";", ":").replace(" ", "_")
+                    counts[";".join([thread] + _collapse(frame))] += 1
+                samples += 1
+                time.sleep(interval)
+        finally:
+            self._busy = False
+        logger.info("CPU sampling finished, seconds=%s, samples=%s", seconds, samples)
+        return counts
+
+    async def cprofile(self, seconds: float) -> bytes:
+        """
+        :return: pstats 格式（marshal 序列化），保存为 .prof 文件后用 pstats 读取
+        """
+        self._acquire()
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as exc:
+                # 已有其他 profiler（如调试器）时无法开启
+                raise ProfilerBusyError(str(exc)) from exc
+            try:
+                await asyncio.sleep(min(max(seconds, 0.1), MAX_PROFILE_SECONDS))
+            finally:
+                profile.disable()
+        finally:
+            self._busy = False
+        profile.create_stats()
+        return marshal.dumps(profile.stats)
+
+    @staticmethod
+    def start_tracing(frames: int = 10) -> bool:
+        """
+        开启 tracemalloc，已开启时返回 False
+        """
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start(max(1, frames))
+        logger.info("Tracemalloc started, frames=%s", frames)
+        return True
+
+    def stop_tracing(self) -> None:
+        with self._snapshot_lock:
+            self._baseline = None
+        tracemalloc.stop()
+        logger.info("Tracemalloc stopped")
+
+    def snapshot(self, limit: int = 30, group_by: str = "lineno") -> dict[str, Any]:
+        """
+        拍摄内存快照，返回占用最多的分配位置，以及与上一次快照相比增长最多的位置（阻塞，需在线程中调用）
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        with self._snapshot_lock:
+            baseline, self._baseline = self._baseline, snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        result: dict[str, Any] = {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {"where": self._where(stat.traceback), "bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics(group_by)[:limit]
+            ],
+        }
+        if baseline is not None:
+            result["diff"] = [
+                {
+                    "where": self._where(stat.traceback),
+                    "bytes": stat.size,
+                    "bytes_diff": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in snapshot.compare_to(baseline, group_by)[:limit]
+            ]
+        return result
+
+    @staticmethod
+    def _where(traceback: tracemalloc.Traceback) -> list[str]:
+        return [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+
+
+def _awaited(awaitable: Any) -> Any:
+    for attr in ("cr_await", "gi_yieldfrom", "ag_await"):
+        inner = getattr(awaitable, attr, None)
+        if inner is not None:
+            return inner
+    # LoopMonitor.watch 包装的指令：生成器中用 send 驱动，需要从包装对象取回原协程
+    frame = getattr(awaitable, "gi_frame", None)
+    owner = frame.f_locals.get("self") if frame is not None else None
+    if isinstance(owner, _TimedAwaitable):
+        return owner._awaitable
+    return None
+
+
+def _task_stack(task: asyncio.Task) -> tuple[list[str], Any]:
+    """
+    沿 await 链展开任务的调用栈（外层在前），返回 (栈帧, 最终等待的对象)
+    """
+    lines = []
+    awaitable: Any = task.get_coro()
+    waiting = None
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) or getattr(
+            awaitable, "ag_frame", None
+        )
+        if frame is None:
+            waiting = awaitable
+            break
+        code = frame.f_code
+        lines.append(f'  File "{code.co_filename}", line {frame.f_lineno}, in {code.co_name}')
+        awaitable = _awaited(awaitable)
+    return lines, waiting
+
+
+def dump_tasks(name: str = "") -> str:
+    """
+    当前事件循环中所有任务及其 await 调用栈（需在事件循环线程调用）
+    :param name: 只输出名称或调用栈中包含该字符串的任务，如 handle_command_and_notify
+    """
+    current = asyncio.current_task()
+    tasks = sorted(asyncio.all_tasks(), key=lambda task: task.get_name())
+    out = io.StringIO()
+    shown = 0
+    for task in tasks:
+        if task is current:
+            continue
+        coro = task.get_coro()
+        label = f"{task.get_name()} {getattr(coro, '__qualname__', coro)}"
+        lines, waiting = _task_stack(task)
+        if name and name not in label and not any(name in line for line in lines):
+            continue
+        shown += 1
+        state = "done" if task.done() else "cancelling" if task.cancelling() else "pending"
+        out.write(f"Task {label} [{state}]\n")
+        for line in lines:
+            out.write(line + "\n")
+        if waiting is not None:
+            out.write(f"  waiting on {waiting!r}\n")
+        out.write("\n")
+    return f"{shown} tasks\n\n" + out.getvalue()
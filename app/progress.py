@@ -0,0 +1,144 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+import uuid
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    from app.command_router import CommandContext
+
+logger = logging.getLogger("assistant")
+
+DEFAULT_MIN_INTERVAL = float(os.getenv("PROGRESS_MIN_INTERVAL", "3"))
+_BAR_WIDTH = 10
+_ids = itertools.count(1)
+
+
+class ProgressReporter:
+    """
+    任务进度卡片：先发送一张按钮交互型模板卡片，之后的进度在原卡片上更新。
+    - 更新按 min_interval 节流，期间的多次 update 合并，只发送最新状态
+    - 优先用发送结果中的 response_code 更新卡片（每个 code 只能使用一次）；
+      code 不可用时撤回旧消息再发新卡片；撤回也失败时直接发送新卡片
+    - finish 不受节流限制，保证最终状态送达
+    """
+
+    def __init__(
+            self,
+            ctx: "CommandContext",
+            title: str,
+            min_interval: float | None = None,
+            clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ctx = ctx
+        self.title = title
+        self.min_interval = DEFAULT_MIN_INTERVAL if min_interval is None else min_interval
+        self._clock = clock
+        self.card_task_id = f"progress-{next(_ids)}-{uuid.uuid4().hex[:12]}"
+        self.description = ""
+        self.percent: float | None = None
+        self.finished = False
+        self.sent_count = 0
+        self.updated_count = 0
+        self._msgid: str | None = None
+        self._response_code: str | None = None
+        self._last_flush: float | None = None
+        self._dirty = False
+        self._pending: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def state(self) -> dict[str, Any]:
+        """
+        当前卡片内容（template_card）
+        """
+        progress = self.description
+        if self.percent is not None:
+            filled = int(round(self.percent / 100 * _BAR_WIDTH))
+            progress = f"{'■' * filled}{'□' * (_BAR_WIDTH - filled)} {self.percent:.0f}%\n{progress}".rstrip()
+        card: dict[str, Any] = {
+            "card_type": "button_interaction",
+            "main_title": {"title": self.title, "desc": "已完成" if self.finished else "执行中"},
+            "sub_title_text": progress or "-",
+            "task_id": self.card_task_id,
+            "button_list": [],
+        }
+        task = self.ctx.task
+        if task and not self.finished:
+            card["button_list"] = [{"text": "取消任务", "style": 2, "key": f"cmd:cancel {task.task_id}"}]
+        else:
+            card["button_list"] = [{"text": "已结束", "style": 4, "key": f"noop:{self.card_task_id}"}]
+        return card
+
+    async def start(self, description: str = "") -> None:
+        self.description = description
+        async with self._lock:
+            await self._flush()
+
+    async def update(self, description: str | None = None, percent: float | None = None) -> None:
+        if self.finished:
+            return
+        if description is not None:
+            self.description = description
+        if percent is not None:
+            self.percent = max(0.0, min(100.0, percent))
+        self.ctx.set_progress(f"{self.percent:.0f}%" if self.percent is not None else self.description)
+        self._dirty = True
+
+        wait = self._wait_time()
+        if wait <= 0:
+            async with self._lock:
+                if self._dirty:
+                    await self._flush()
+        elif self._pending is None or self._pending.done():
+            self._pending = asyncio.create_task(self._flush_later(wait))
+
+    async def finish(self, description: str | None = None, percent: float | None = None) -> None:
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        if description is not None:
+            self.description = description
+        if percent is not None:
+            self.percent = max(0.0, min(100.0, percent))
+        self.finished = True
+        async with self._lock:
+            await self._flush()
+
+    def _wait_time(self) -> float:
+        if self._last_flush is None:
+            return 0.0
+        return self._last_flush + self.min_interval - self._clock()
+
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        if self.ctx.task and self.ctx.task.task.done():
+            # 任务已结束（取消或超时），不再更新卡片
+            return
+        async with self._lock:
+            if self._dirty and not self.finished:
+                await self._flush()
+
+    async def _flush(self) -> None:
+        self._dirty = False
+        self._last_flush = self._clock()
+        card = self.state
+        try:
+            if self._response_code and self.ctx.update_card:
+                code, self._response_code = self._response_code, None
+                if await self.ctx.update_card(self.ctx.user_id, code, card):
+                    self.updated_count += 1
+                    return
+            if self._msgid and self.ctx.recall_message:
+                msgid, self._msgid = self._msgid, None
+                await self.ctx.recall_message(msgid)
+            result = await self.ctx.notify("template_card", card)
+        except Exception:
+            logger.exception("Progress card update failed, user=%s, title=%s", self.ctx.user_id, self.title)
+            return
+        self.sent_count += 1
+        if isinstance(result, dict):
+            self._msgid = result.get("msgid") or None
+            self._response_code = result.get("response_code") or None
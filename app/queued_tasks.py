@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from app.command_router import CommandContext, CommandRouter
+from app.job_queue import JobQueue
+
+
+class QueuedTaskCommands:
+    """
+    拆分部署（APP_ROLE=ingress）时回调进程上的 tasks / cancel：指令在 worker 上执行，按任务队列中的记录查看和取消。
+    任务 ID 为队列中的 ID，所有 worker 共用；取消执行中的任务时由持有租约的 worker 在下一轮领取任务时取消。
+    """
+
+    def __init__(self, queue: JobQueue) -> None:
+        self.queue = queue
+
+    def register_commands(self, router: CommandRouter) -> None:
+        router.register("tasks", self._handle_tasks, help="查看执行中的任务", aliases=("任务",))
+        router.register("cancel", self._handle_cancel, help="取消任务", usage="cancel <任务ID|all>", aliases=("取消",))
+
+    async def _handle_tasks(self, arg: str, ctx: CommandContext) -> None:
+        jobs = await asyncio.to_thread(self.queue.user_jobs, ctx.scoped_user_id)
+        if not jobs:
+            await ctx.notify_text("当前没有执行中的任务")
+            return
+        now = time.time()
+        lines = ["执行中的任务:"]
+        for job in jobs:
+            if job.cancel_requested:
+                state = "取消中"
+            elif job.status == "leased":
+                state = "执行中"
+            else:
+                state = f"排队中，已等待 {now - job.enqueued_at:.0f} 秒"
+            lines.append(f"#{job.job_id} {job.content} {state}")
+        await ctx.notify_text("\n".join(lines))
+
+    async def _handle_cancel(self, arg: str, ctx: CommandContext) -> None:
+        target = arg.strip().lstrip("#")
+        if not target:
+            await ctx.notify_text("用法: cancel <任务ID> 或 cancel all")
+            return
+        if target.lower() == "all":
+            job_ids = [job.job_id for job in await asyncio.to_thread(self.queue.user_jobs, ctx.scoped_user_id)]
+        else:
+            job_ids = [int(target)] if target.isdigit() else []
+        cancelled = []
+        for job_id in job_ids:
+            job = await asyncio.to_thread(self.queue.cancel, job_id, ctx.scoped_user_id)
+            if job is not None:
+                cancelled.append(job)
+        if not cancelled:
+            await ctx.notify_text(f"未找到任务: {target}")
+            return
+        for job in cancelled:
+            if job.status == "pending":
+                await ctx.notify_text(f"任务 #{job.job_id} {job.content} 已取消")
+            else:
+                await ctx.notify_text(f"任务 #{job.job_id} {job.content} 正在取消")
@@ -0,0 +1,365 @@
+"""
+线上流量回放：录制脱敏后的指令序列，在本地进程内按原始节奏（或加速）回放，统计各指令耗时分布
+
+    # 从消息日志或 service.log 录制
+    python -m app.replay record --journal data/journal.db --since 2024-05-01 -o trace.jsonl
+    python -m app.replay record --log logs/service.log -o trace.jsonl
+
+    # 回放：--speed 1 原速，N 为 N 倍速，0 为不等待尽快发送
+    python -m app.replay run trace.jsonl --speed 10 --json result.json --compare baseline.json
+
+回放时消息经加密回调接口进入服务，发送消息由 StubSender 代替（不访问企业微信接口），耗时由 --send-latency 模拟。
+"""
+import argparse
+import asyncio
+import base64
+import collections
+import datetime as dt
+import json
+import os
+import re
+import secrets
+import sqlite3
+import sys
+import tempfile
+import time
+from collections.abc import Iterable
+from urllib.parse import urlencode
+from zoneinfo import ZoneInfo
+
+TZ = ZoneInfo("Asia/Shanghai")
+_LOG_RE = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3}) \[\w+\] \S+ - Received message (.*) from (\S*) at .*$"
+)
+_MASK_RE = re.compile(r"\w", re.UNICODE)
+
+
+class Sanitizer:
+    """
+    用户 ID 替换为按出现顺序编号的 user1、user2…；指令参数中的字母数字替换为 x，保留长度和结构
+    """
+
+    def __init__(self, keep_args: bool = False) -> None:
+        self.keep_args = keep_args
+        self._users: dict[str, str] = {}
+
+    def user(self, user_id: str) -> str:
+        alias = self._users.get(user_id)
+        if alias is None:
+            alias = self._users[user_id] = f"user{len(self._users) + 1}"
+        return alias
+
+    def content(self, content: str) -> str:
+        command, sep, arg = content.strip().partition(" ")
+        if self.keep_args or not arg:
+            return content.strip()
+        return f"{command}{sep}{_MASK_RE.sub('x', arg)}"
+
+
+def _parse_time(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = dt.datetime.fromisoformat(value)
+        return (parsed if parsed.tzinfo else parsed.replace(tzinfo=TZ)).timestamp()
+
+
+def read_journal(path: str, since: float | None, until: float | None) -> Iterable[tuple[float, str, str]]:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT ts, user_id, msg_type, content FROM messages "
+            "WHERE ts >= ? AND ts < ? AND msg_type IN ('text', 'event') ORDER BY ts",
+            (since or 0, until or float("inf")),
+        )
+        for ts, user_id, msg_type, content in rows:
+            if msg_type == "event":
+                # 卡片按钮回调 cmd:<指令>
+                if not content.startswith("cmd:"):
+                    continue
+                content = content[len("cmd:"):]
+            yield ts, user_id, content
+    finally:
+        conn.close()
+
+
+def read_service_log(path: str, since: float | None, until: float | None) -> Iterable[tuple[float, str, str]]:
+    with open(path, encoding="utf-8", errors="replace") as fp:
+        for line in fp:
+            match = _LOG_RE.match(line.rstrip("\n"))
+            if not match or not match.group(3):
+                continue
+            when = dt.datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S").replace(tzinfo=TZ)
+            ts = when.timestamp() + int(match.group(2)) / 1000
+            if (since and ts < since) or (until and ts >= until):
+                continue
+            yield ts, match.group(4), match.group(3)
+
+
+def record(args: argparse.Namespace) -> None:
+    since, until = _parse_time(args.since), _parse_time(args.until)
+    if args.journal:
+        source = read_journal(args.journal, since, until)
+    else:
+        source = read_service_log(args.log, since, until)
+    sanitizer = Sanitizer(keep_args=args.keep_args)
+    start = None
+    count = 0
+    with open(args.output, "w", encoding="utf-8") as fp:
+        for ts, user_id, content in source:
+            if count >= args.limit:
+                break
+            start = ts if start is None else start
+            item = {"t": round(ts - start, 3), "user": sanitizer.user(user_id), "content": sanitizer.content(content)}
+            fp.write(json.dumps(item, ensure_ascii=False) + "\n")
+            count += 1
+    print(f"recorded {count} messages to {args.output}")
+
+
+class StubSender:
+    """
+    代替 WeComSender：不发起网络请求，每次调用阻塞 latency 秒（在工作线程中执行，与真实发送一致）
+    """
+
+    def __init__(self, agent_id: str, latency: float) -> None:
+        self.agent_id = agent_id
+        self.latency = latency
+        self.calls: collections.Counter[str] = collections.Counter()
+
+    def _call(self, name: str) -> dict:
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return {"errcode": 0, "errmsg": "ok", "msgid": f"stub{sum(self.calls.values())}"}
+
+    def send_body(self, message_type, body, target=None):
+        return self._call(f"send_{message_type}")
+
+    def upload_media(self, file_type, path):
+        self._call(f"upload_{file_type}")
+        return "stub-media-id"
+
+    def update_template_card(self, response_code, template_card, userids):
+        return self._call("update_template_card")
+
+    def recall_message(self, msgid):
+        return self._call("recall_message")
+
+    def upload_image(self, image_path, enable=True):
+        self._call("upload_image")
+        return "https://replay.invalid/stub-image.png"
+
+    def get_user_info(self, user_id):
+        return {**self._call("get_user_info"), "userid": user_id, "name": user_id}
+
+
+def _prepare_env(workdir: str) -> None:
+    # 回放使用独立的加密参数和临时数据目录，避免访问企业微信和改动线上数据
+    aes_key = base64.b64encode(secrets.token_bytes(32)).decode().rstrip("=")
+    os.environ.update(
+        APP_ROLE="all",
+        WECOM_TOKEN="replay",
+        WECOM_CORP_ID="replay",
+        WECOM_ENCODING_AES_KEY=aes_key,
+        # 不配置发送器（WeComSender 初始化时会请求 token），启动后替换为 StubSender
+        WECOM_AGENT_ID="",
+        WECOM_AGENT_SECRET="",
+        WECOM_TENANTS_FILE="",
+        JOURNAL_FILE="",
+        SCHEDULE_FILE=os.path.join(workdir, "schedules.db"),
+    )
+    os.environ.setdefault("LOG_DIR", os.path.join(workdir, "logs"))
+
+
+async def _post(app, path: str, query: dict[str, str], body: bytes) -> int:
+    # 进程内直接调用 ASGI 应用，不经过网络
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = 0
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": urlencode(query).encode(),
+        "headers": [(b"host", b"replay"), (b"content-type", b"text/xml")],
+        "server": ("replay", 80),
+        "client": ("127.0.0.1", 0),
+    }
+    await app(scope, receive, send)
+    return status
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(0.5),
+        "p90_ms": pick(0.9),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 2),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+    }
+
+
+async def replay(trace: list[dict], speed: float, send_latency: float, drain: float) -> dict:
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    _prepare_env(workdir)
+    import app.main as service
+    from app.wechat.WXBizMsgCrypt import WXBizMsgCrypt
+
+    agent_id = "1000001"
+    stub = StubSender(agent_id, send_latency)
+    service.default_tenant.sender = stub
+    crypto: WXBizMsgCrypt = service.default_tenant.crypto
+
+    pending: dict[tuple[str, str], collections.deque[float]] = collections.defaultdict(collections.deque)
+    command_latency: dict[str, list[float]] = collections.defaultdict(list)
+    callback_latency: list[float] = []
+    statuses: collections.Counter[int] = collections.Counter()
+    original = service.handle_command_and_notify
+
+    async def timed_handle(from_user: str, content: str, tenant=None) -> None:
+        try:
+            await original(from_user=from_user, content=content, tenant=tenant)
+        finally:
+            queue = pending.get((from_user, content))
+            if queue:
+                command = content.strip().split(maxsplit=1)[0].lower() if content.strip() else "(empty)"
+                command_latency[command].append(time.perf_counter() - queue.popleft())
+
+    service.handle_command_and_notify = timed_handle
+
+    async def deliver(index: int, item: dict) -> None:
+        now = int(time.time())
+        plain = (
+            f"<xml><ToUserName><![CDATA[replay]]></ToUserName><FromUserName><![CDATA[{item['user']}]]></FromUserName>"
+            f"<CreateTime>{now}</CreateTime><MsgType><![CDATA[text]]></MsgType>"
+            f"<Content><![CDATA[{service.cdata_safe(item['content'])}]]></Content>"
+            f"<MsgId>{index}</MsgId><AgentID>{agent_id}</AgentID></xml>"
+        )
+        nonce = secrets.token_hex(8)
+        _ret, body = crypto.EncryptMsg(plain, nonce, str(now))
+        signature = re.search(r"<MsgSignature><!\[CDATA\[(.*?)\]\]>", body).group(1)
+        query = {"msg_signature": signature, "timestamp": str(now), "nonce": nonce}
+        started = time.perf_counter()
+        pending[(item["user"], item["content"])].append(started)
+        status = await _post(service.app, "/wecom/callback", query, body.encode())
+        callback_latency.append(time.perf_counter() - started)
+        statuses[status] += 1
+
+    senders: list[asyncio.Task] = []
+    wall_start = time.perf_counter()
+    async with service.lifespan(service.app):
+        loop_start = time.perf_counter()
+        for index, item in enumerate(trace, start=1):
+            if speed > 0:
+                delay = loop_start + item["t"] / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            senders.append(asyncio.create_task(deliver(index, item)))
+        await asyncio.gather(*senders)
+        deadline = time.perf_counter() + drain
+        while any(pending.values()) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+    wall = time.perf_counter() - wall_start
+
+    return {
+        "messages": len(trace),
+        "speed": speed,
+        "send_latency_ms": send_latency * 1000,
+        "wall_seconds": round(wall, 3),
+        "http_status": {str(k): v for k, v in statuses.items()},
+        # 被合并、拒绝或超过 drain 时间仍未完成的指令
+        "incomplete": sum(len(q) for q in pending.values()),
+        "sender_calls": dict(stub.calls),
+        "callback": percentiles(callback_latency),
+        "commands": {name: percentiles(values) for name, values in sorted(command_latency.items())},
+    }
+
+
+def _format_report(result: dict, baseline: dict | None) -> str:
+    columns = ("count", "p50_ms", "p90_ms", "p99_ms", "max_ms", "mean_ms")
+    lines = [
+        f"messages={result['messages']} speed={result['speed']:g} wall={result['wall_seconds']}s "
+        f"incomplete={result['incomplete']} http={result['http_status']}",
+        f"{'command':<16}" + "".join(f" {c:>15}" for c in columns),
+    ]
+    rows = [("(callback)", result["callback"], (baseline or {}).get("callback"))]
+    rows += [(name, stats, (baseline or {}).get("commands", {}).get(name)) for name, stats in result["commands"].items()]
+    for name, stats, base in rows:
+        cells = []
+        for column in columns:
+            value = stats.get(column, "-")
+            if base and column != "count" and base.get(column):
+                cells.append(f"{value}({(value - base[column]) / base[column] * 100:+.0f}%)")
+            else:
+                cells.append(str(value))
+        lines.append(f"{name:<16}" + "".join(f" {cell:>15}" for cell in cells))
+    return "\n".join(lines)
+
+
+def run(args: argparse.Namespace) -> None:
+    with open(args.trace, encoding="utf-8") as fp:
+        trace = [json.loads(line) for line in fp if line.strip()]
+    result = asyncio.run(replay(trace, args.speed, args.send_latency / 1000, args.drain))
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fp:
+            baseline = json.load(fp)
+    print(_format_report(result, baseline))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fp:
+            json.dump(result, fp, ensure_ascii=False, indent=2)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Record and replay production command traces")
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    rec = sub.add_parser("record", help="record a sanitized trace")
+    source = rec.add_mutually_exclusive_group(required=True)
+    source.add_argument("--journal", help="message journal database (JOURNAL_FILE)")
+    source.add_argument("--log", help="service.log file")
+    rec.add_argument("--since", help="unix timestamp or ISO time")
+    rec.add_argument("--until", help="unix timestamp or ISO time")
+    rec.add_argument("--limit", type=int, default=100000)
+    rec.add_argument("--keep-args", action="store_true", help="keep command arguments verbatim")
+    rec.add_argument("-o", "--output", default="trace.jsonl")
+    rec.set_defaults(func=record)
+
+    rep = sub.add_parser("run", help="replay a trace against an in-process app.main:app")
+    rep.add_argument("trace")
+    rep.add_argument("--speed", type=float, default=1.0, help="1 = real time, N = N times faster, 0 = no waiting")
+    rep.add_argument("--send-latency", type=float, default=50, help="simulated WeCom API latency in ms")
+    rep.add_argument("--drain", type=float, default=60, help="seconds to wait for running commands after the last message")
+    rep.add_argument("--json", help="write the result as JSON")
+    rep.add_argument("--compare", help="baseline JSON from a previous run")
+    rep.set_defaults(func=run)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Awaitable, Callable, Hashable
+
+if TYPE_CHECKING:
+    from app.command_router import OutboundMessage
+
+Producer = Callable[[], Awaitable[list["OutboundMessage"]]]
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class ResultCache:
+    """
+    幂等指令的结果缓存：按 key 缓存指令产生的消息列表。
+    - ttl 过期
+    - 超过 max_entries 时淘汰最久未使用的条目（LRU）
+    - 同一 key 并发请求只执行一次（single-flight），其余请求等待同一结果；
+      所有等待的请求都被取消（用户取消或超时）时取消执行，下一次请求重新执行
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict[Hashable, tuple[float, list["OutboundMessage"]]] = OrderedDict()
+        self._inflight: dict[Hashable, _Flight] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> list["OutboundMessage"] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, messages = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return messages
+
+    def put(self, key: Hashable, messages: list["OutboundMessage"], ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, messages)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def get_or_run(self, key: Hashable, ttl: float, produce: Producer) -> list["OutboundMessage"]:
+        messages = self.get(key)
+        if messages is not None:
+            self.hits += 1
+            return messages
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.misses += 1
+            flight = self._inflight[key] = _Flight(asyncio.create_task(self._produce(key, ttl, produce)))
+        else:
+            self.hits += 1
+        flight.waiters += 1
+        try:
+            # 单个请求被取消时不影响其他等待同一结果的请求
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+
+    async def _produce(self, key: Hashable, ttl: float, produce: Producer) -> list["OutboundMessage"]:
+        try:
+            messages = await produce()
+            self.put(key, messages, ttl)
+            return messages
+        finally:
+            flight = self._inflight.get(key)
+            if flight is not None and flight.task is asyncio.current_task():
+                del self._inflight[key]
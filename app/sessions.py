@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.metrics import metrics
+
+logger = logging.getLogger("assistant")
+
+sessions_active = metrics.gauge("sessions_active", "Conversation sessions currently held in memory")
+session_bytes = metrics.gauge("session_bytes", "Approximate memory used by in-memory conversation sessions")
+sessions_evicted_total = metrics.counter("sessions_evicted_total", "Conversation sessions removed before being ended")
+
+
+def _encode(data: dict[str, Any]) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class Session:
+    """
+    单个用户的会话状态。data 必须可 JSON 序列化；step 为下一条消息要交给的续接处理函数名，None 表示没有等待中的步骤
+    """
+
+    __slots__ = ("key", "command", "step", "data", "expires_at", "size")
+
+    def __init__(
+            self,
+            key: str,
+            command: str = "",
+            step: str | None = None,
+            data: dict[str, Any] | None = None,
+            expires_at: float = 0.0,
+    ) -> None:
+        self.key = key
+        self.command = command
+        self.step = step
+        self.data = data if data is not None else {}
+        self.expires_at = expires_at
+        self.size = 0
+
+    def measure(self, encoded: str | None = None) -> int:
+        """
+        估算占用字节数：对象本身 + 序列化后的 data
+        """
+        encoded = _encode(self.data) if encoded is None else encoded
+        self.size = sys.getsizeof(self) + len(self.key) + len(self.command) + len(self.step or "") + len(
+            encoded.encode("utf-8")
+        )
+        return self.size
+
+    def to_dict(self, now: float | None = None) -> dict[str, Any]:
+        now = time.time() if now is None else now
+        return {
+            "key": self.key,
+            "command": self.command,
+            "step": self.step,
+            "bytes": self.size,
+            "expires_in": round(max(0.0, self.expires_at - now), 1),
+        }
+
+
+class SessionStore:
+    """
+    按用户保存多步指令（确认、向导、翻页等）的会话状态：
+    - 超过 ttl 秒未更新的会话过期；超过 max_sessions 个时淘汰最久未使用的
+    - path 为空时只保存在内存中；配置 path 时写入 SQLite，服务重启后仍然有效，多个 worker 共享同一个文件即可共享会话
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        key TEXT PRIMARY KEY,
+        command TEXT NOT NULL,
+        step TEXT,
+        data TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at);
+    CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at);
+    """
+
+    def __init__(self, path: str = "", ttl: float = 600, max_sessions: int = 10000) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_sessions = max(1, max_sessions)
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # 调用方持有 self._lock
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self._SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def get(self, key: str) -> Session | None:
+        if self.path:
+            return await asyncio.to_thread(self._load, key)
+        session = self._sessions.get(key)
+        if session is None:
+            return None
+        if session.expires_at <= time.time():
+            self._forget(key)
+            sessions_evicted_total.inc(reason="ttl")
+            return None
+        self._sessions.move_to_end(key)
+        return session
+
+    async def save(self, session: Session, ttl: float | None = None) -> None:
+        session.expires_at = time.time() + (ttl or self.ttl)
+        encoded = _encode(session.data)
+        if self.path:
+            session.measure(encoded)
+            await asyncio.to_thread(self._store, session, encoded)
+            return
+        self._forget(session.key)
+        self._sessions[session.key] = session
+        self._bytes += session.measure(encoded)
+        # 最久未使用的会话在最前面，顺带清理其中已过期的
+        now = time.time()
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.expires_at <= now:
+                sessions_evicted_total.inc(reason="ttl")
+            elif len(self._sessions) > self.max_sessions:
+                sessions_evicted_total.inc(reason="size")
+            else:
+                break
+            self._forget(oldest.key)
+        self._update_gauges()
+
+    async def delete(self, key: str) -> None:
+        if self.path:
+            await asyncio.to_thread(self._remove, key)
+            return
+        self._forget(key)
+        self._update_gauges()
+
+    def _forget(self, key: str) -> None:
+        session = self._sessions.pop(key, None)
+        if session is not None:
+            self._bytes -= session.size
+
+    def _update_gauges(self) -> None:
+        sessions_active.set(len(self._sessions))
+        session_bytes.set(self._bytes)
+
+    def _load(self, key: str) -> Session | None:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT command, step, data, expires_at FROM sessions WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        session = Session(key, row[0], row[1], json.loads(row[2]), row[3])
+        session.measure(row[2])
+        return session
+
+    def _store(self, session: Session, encoded: str) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (key, command, step, data, expires_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (session.key, session.command, session.step, encoded, session.expires_at, now),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._purge(conn, now)
+
+    def _purge(self, conn: sqlite3.Connection, now: float) -> None:
+        expired = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+        overflow = conn.execute(
+            "DELETE FROM sessions WHERE key IN"
+            " (SELECT key FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        ).rowcount
+        if expired:
+            sessions_evicted_total.inc(expired, reason="ttl")
+        if overflow:
+            sessions_evicted_total.inc(overflow, reason="size")
+
+    def _remove(self, key: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+    def report(self, limit: int = 100) -> dict[str, Any]:
+        """
+        活跃会话数量和每个会话的占用字节数（按占用从大到小）
+        """
+        now = time.time()
+        if self.path:
+            with self._lock:
+                conn = self._connect()
+                total, size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(data AS BLOB)) + LENGTH(key) + LENGTH(command)"
+                    " + COALESCE(LENGTH(step), 0)), 0) FROM sessions WHERE expires_at > ?",
+                    (now,),
+                ).fetchone()
+                rows = conn.execute(
+                    "SELECT key, command, step, data, expires_at FROM sessions WHERE expires_at > ?"
+                    " ORDER BY LENGTH(CAST(data AS BLOB)) DESC LIMIT ?",
+                    (now, limit),
+                ).fetchall()
+            size += total * sys.getsizeof(Session(""))
+            sessions = []
+            for key, command, step, data, expires_at in rows:
+                session = Session(key, command, step, expires_at=expires_at)
+                session.measure(data)
+                sessions.append(session)
+        else:
+            sessions = [session for session in self._sessions.values() if session.expires_at > now]
+            total, size = len(sessions), sum(session.size for session in sessions)
+            sessions = sorted(sessions, key=lambda session: session.size, reverse=True)[:limit]
+        return {
+            "active": total,
+            "bytes": size,
+            "sessions": [session.to_dict(now) for session in sessions],
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from app.messages import OutboundMessage, TextMessage, dumps
+from app.metrics import metrics
+
+logger = logging.getLogger("assistant")
+
+# (应用名, 接收人, 汇总消息)
+SendSummary = Callable[[str, str, OutboundMessage], Awaitable[Any]]
+
+SUPPRESS_MODES = ("summary", "drop")
+
+suppressed_total = metrics.counter("notify_suppressed_total", "Outbound messages suppressed as duplicates")
+summaries_total = metrics.counter("notify_suppress_summaries_total", "Summaries sent for suppressed duplicate messages")
+evicted_total = metrics.counter("notify_suppress_evicted_total", "Fingerprints evicted before their window ended")
+entries_gauge = metrics.gauge("notify_suppress_entries", "Message fingerprints currently tracked")
+
+
+def fingerprint(tenant: str, to_user: str, message: OutboundMessage) -> bytes:
+    """
+    应用、接收人、消息类型和消息内容的摘要
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{tenant}\0{to_user}\0{message.msg_type}\0".encode("utf-8"))
+    digest.update(dumps(message.payload))
+    return digest.digest()
+
+
+def _preview(message: OutboundMessage, limit: int = 40) -> str:
+    payload = message.payload
+    text = payload.get("content") or payload.get("title") or ""
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+class _Entry:
+    __slots__ = ("tenant", "to_user", "message", "expires_at", "count", "timer")
+
+    def __init__(self, tenant: str, to_user: str, message: OutboundMessage, expires_at: float) -> None:
+        self.tenant = tenant
+        self.to_user = to_user
+        self.message = message
+        self.expires_at = expires_at
+        self.count = 0
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class OutboundSuppressor:
+    """
+    抑制重复发送：同一应用、同一用户、类型和内容完全相同的消息，首条发出后 window 秒内的重复消息不再发送
+    - summary 模式：窗口结束时发送一条 “×N” 汇总；drop 模式：直接丢弃
+    - 最多记录 max_entries 个指纹，超过时淘汰最早的（被淘汰指纹的重复计数不再汇总）
+    """
+
+    def __init__(self, send_summary: SendSummary, window: float, max_entries: int = 10000, mode: str = "summary") -> None:
+        if mode not in SUPPRESS_MODES:
+            raise ValueError(f"unknown suppress mode: {mode}, expected one of {', '.join(SUPPRESS_MODES)}")
+        self._send_summary = send_summary
+        self.window = window
+        self.max_entries = max(1, max_entries)
+        self.mode = mode
+        # 按首条消息发送时间排序，最早过期的在最前面
+        self._entries: OrderedDict[bytes, _Entry] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def allow(self, tenant: str, to_user: str, message: OutboundMessage) -> bool:
+        """
+        返回 True 表示应当发送；重复消息计数后返回 False
+        """
+        now = time.monotonic()
+        self._prune(now)
+        key = fingerprint(tenant, to_user, message)
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.count += 1
+            suppressed_total.inc(msg_type=message.msg_type, mode=self.mode)
+            if entry.count == 1:
+                logger.warning("Duplicate outbound message suppressed, tenant=%s, user=%s, msg_type=%s",
+                               tenant, to_user, message.msg_type)
+                if self.mode == "summary":
+                    delay = max(0.0, entry.expires_at - now)
+                    entry.timer = asyncio.get_running_loop().call_later(delay, self._expire, key)
+            return False
+        self._entries[key] = _Entry(tenant, to_user, message, now + self.window)
+        while len(self._entries) > self.max_entries:
+            _key, oldest = self._entries.popitem(last=False)
+            if oldest.timer:
+                oldest.timer.cancel()
+            evicted_total.inc()
+        entries_gauge.set(len(self._entries))
+        return True
+
+    def _prune(self, now: float) -> None:
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now:
+                break
+            self._expire(key)
+
+    def _expire(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        entries_gauge.set(len(self._entries))
+        if entry.timer:
+            entry.timer.cancel()
+        if entry.count and self.mode == "summary":
+            task = asyncio.create_task(self._summarize(entry))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, entry: _Entry) -> None:
+        preview = _preview(entry.message)
+        text = f"上一条{entry.message.msg_type}消息在 {self.window:g} 秒内重复 ×{entry.count}，已省略"
+        if preview:
+            text += f": {preview}"
+        summaries_total.inc(msg_type=entry.message.msg_type)
+        try:
+            await self._send_summary(entry.tenant, entry.to_user, TextMessage(text))
+        except Exception:
+            logger.exception("Send suppression summary failed, user=%s", entry.to_user)
+
+    async def flush(self) -> None:
+        """
+        立即发送所有待发的汇总（服务关闭时调用）
+        """
+        for key in list(self._entries):
+            self._expire(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+
+from app.priority import PriorityGate
+from app.wechat.WXBizMsgCrypt import WXBizMsgCrypt, WeComReceiverConfig
+from app.wechat.wecom_sender import WeComSender, WeComSenderConfig
+
+logger = logging.getLogger("assistant")
+
+DEFAULT_TENANT = ""
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class RateLimiter:
+    """
+    令牌桶限流：每秒 rate 个请求，最多突发 burst 个
+    """
+
+    __slots__ = ("rate", "burst", "_tokens", "_updated", "_lock")
+
+    def __init__(self, rate: float, burst: int | None = None) -> None:
+        self.rate = rate
+        self.burst = max(1, burst or int(rate) or 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock: asyncio.Lock | None = None
+
+    async def acquire(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass(frozen=True)
+class TenantConfig:
+    name: str
+    corp_id: str
+    token: str
+    encoding_aes_key: str | None = None
+    agent_id: str | None = None
+    agent_secret: str | None = None
+    base_url: str | None = None
+    # 允许使用的指令，None 表示全部
+    commands: frozenset[str] | None = None
+    # 每秒发送消息数上限，0 表示不限制
+    rate_limit: float = 0
+    rate_burst: int | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "TenantConfig":
+        name = str(data.get("name", ""))
+        if not _NAME_RE.match(name):
+            raise ValueError(f"invalid tenant name: {name!r}")
+        for key in ("corp_id", "token"):
+            if not data.get(key):
+                raise ValueError(f"tenant {name}: {key} is required")
+        commands = data.get("commands")
+        return cls(
+            name=name,
+            corp_id=str(data["corp_id"]),
+            token=str(data["token"]),
+            encoding_aes_key=data.get("encoding_aes_key") or None,
+            agent_id=str(data["agent_id"]) if data.get("agent_id") else None,
+            agent_secret=data.get("agent_secret") or None,
+            base_url=data.get("base_url") or None,
+            commands=frozenset(c.lower() for c in commands) if commands is not None else None,
+            rate_limit=float(data.get("rate_limit", 0)),
+            rate_burst=data.get("rate_burst"),
+        )
+
+
+class Tenant:
+    """
+    一个企业微信应用：独立的加解密、发送器（token）和限流；同 host 的应用共用连接池
+    """
+
+    __slots__ = ("name", "config", "crypto", "sender", "limiter")
+
+    def __init__(self, config: TenantConfig) -> None:
+        self.name = config.name
+        self.config = config
+        self.crypto = (
+            WXBizMsgCrypt(
+                WeComReceiverConfig(
+                    corp_id=config.corp_id,
+                    token=config.token,
+                    encoding_aes_key=config.encoding_aes_key,
+                )
+            )
+            if config.encoding_aes_key
+            else None
+        )
+        self.sender = (
+            WeComSender(
+                WeComSenderConfig(corp_id=config.corp_id, agent_secret=config.agent_secret, agent_id=config.agent_id),
+                base_url=config.base_url,
+            )
+            if config.agent_id and config.agent_secret
+            else None
+        )
+        self.limiter = RateLimiter(config.rate_limit, config.rate_burst) if config.rate_limit > 0 else None
+
+    @asynccontextmanager
+    async def send_slot(self, gate: PriorityGate) -> AsyncIterator[None]:
+        """
+        先按本应用的限流等待，再占用全局发送槽位：达到限流的应用等待时不占用其他应用的槽位
+        """
+        if self.limiter:
+            await self.limiter.acquire()
+        async with gate.slot():
+            yield
+
+
+class TenantRegistry:
+    """
+    按名称（回调路径 /wecom/callback/{name}）或 AgentID 查找应用
+    """
+
+    def __init__(self) -> None:
+        self._by_name: dict[str, Tenant] = {}
+        self._by_agent_id: dict[str, Tenant] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def __iter__(self):
+        return iter(self._by_name.values())
+
+    def add(self, tenant: Tenant) -> Tenant:
+        if tenant.name in self._by_name:
+            raise ValueError(f"duplicate tenant: {tenant.name!r}")
+        agent_id = tenant.config.agent_id
+        if agent_id and agent_id in self._by_agent_id:
+            raise ValueError(f"duplicate tenant agent_id: {agent_id}")
+        self._by_name[tenant.name] = tenant
+        if agent_id:
+            self._by_agent_id[agent_id] = tenant
+        return tenant
+
+    def get(self, name: str) -> Tenant | None:
+        return self._by_name.get(name)
+
+    def by_agent_id(self, agent_id: str) -> Tenant | None:
+        return self._by_agent_id.get(agent_id)
+
+    def load(self, path: str) -> None:
+        """
+        从 JSON 配置文件加载应用: {"tenants": [{"name": ..., "corp_id": ..., ...}]}
+        """
+        with open(path, encoding="utf-8") as fp:
+            data = json.load(fp)
+        for item in data.get("tenants", []):
+            tenant = self.add(Tenant(TenantConfig.from_dict(item)))
+            logger.info("Tenant loaded: %s, agent_id=%s", tenant.name, tenant.config.agent_id)
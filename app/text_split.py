@@ -0,0 +1,119 @@
+from collections import deque
+
+# 企业微信各消息类型 content 的字节上限
+MESSAGE_BYTE_LIMITS = {"text": 2048, "markdown": 4096}
+
+_FENCE = "```"
+_FENCE_CLOSE = "\n" + _FENCE
+TRUNCATED_NOTICE = "（内容过长，后续内容已省略）"
+
+
+def _hard_split(line: str, limit: int, first: int | None = None) -> list[str]:
+    """
+    按字节切分超长单行，切分点回退到 UTF-8 字符边界
+    :param first: 第一段的字节上限（所在段已有内容时更小），默认与 limit 相同
+    """
+    data = line.encode("utf-8")
+    parts = []
+    start = 0
+    while len(data) - start > (limit if parts or first is None else first):
+        end = start + (limit if parts or first is None else first)
+        while end > start and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode("utf-8"))
+        start = end
+    parts.append(data[start:].decode("utf-8"))
+    return parts
+
+
+def split_message(text: str, limit: int, markdown: bool = False, max_parts: int = 0) -> list[str]:
+    """
+    把超过字节上限的文本切分为多段，单次线性扫描：
+    - 优先在行边界切分，超长单行在 UTF-8 字符边界切分
+    - markdown 优先在空行（段落）边界切分；代码块被切断时在段尾补齐 ``` 并在下一段重新打开，
+      重新打开的 ```lang 行计入该段的字节数，过长时只用 ``` 重新打开
+    :param text: 文本内容
+    :param limit: 每段的最大字节数
+    :param markdown: 是否按 markdown 处理
+    :param max_parts: 最多切分的段数，0 表示不限制；超出时停止扫描，最后一段替换为 TRUNCATED_NOTICE
+    :return: 切分后的各段，未超限时原样返回
+    """
+    if len(text) <= limit // 4 or len(text.encode("utf-8")) <= limit:
+        return [text]
+
+    budget = limit - len(_FENCE_CLOSE) if markdown else limit
+    chunks: list[str] = []
+    lines: list[str] = []
+    size = 0
+    boundary = 0
+    fence: str | None = None
+    pending: deque[str] = deque()
+    source = iter(text.splitlines(keepends=True))
+
+    def emit(chunk_lines: list[str], open_fence: str | None) -> None:
+        body = "".join(chunk_lines).rstrip("\n")
+        if open_fence:
+            body += _FENCE_CLOSE
+        if body:
+            chunks.append(body)
+
+    def reopen() -> str:
+        if not fence:
+            return ""
+        # 语言标注过长时只用 ``` 重新打开，保证续段有足够的空间放内容
+        return fence + "\n" if len(fence.encode("utf-8")) < budget // 4 else _FENCE + "\n"
+
+    def start_chunk() -> None:
+        nonlocal lines, size, boundary
+        prefix = reopen()
+        lines = [prefix] if prefix else []
+        size = len(prefix.encode("utf-8"))
+        boundary = 0
+
+    truncated = False
+    while True:
+        line = pending.popleft() if pending else next(source, None)
+        if line is None:
+            break
+        if max_parts and len(chunks) >= max_parts:
+            truncated = True
+            break
+        n = len(line.encode("utf-8"))
+
+        if size + n > budget:
+            if markdown and 0 < boundary < len(lines):
+                # 回退到最近的段落边界，边界之后的行重新处理
+                carry = lines[boundary:]
+                emit(lines[:boundary], None)
+                fence = None
+                start_chunk()
+                pending.appendleft(line)
+                pending.extendleft(reversed(carry))
+                continue
+            if lines and (not fence or len(lines) > 1):
+                emit(lines, fence)
+                start_chunk()
+            if size + n > budget:
+                # 第一部分放入当前段（只有打开代码块的行或为空），其余部分各占一段，段首为重新打开的 ``` 行
+                parts = _hard_split(line, budget - len(reopen().encode("utf-8")), first=budget - size)
+                for part in parts[:-1]:
+                    lines.append(part)
+                    emit(lines, fence)
+                    start_chunk()
+                line = parts[-1]
+                n = len(line.encode("utf-8"))
+
+        lines.append(line)
+        size += n
+        if markdown:
+            stripped = line.strip()
+            if stripped.startswith(_FENCE):
+                fence = None if fence else stripped
+            elif not stripped and not fence:
+                boundary = len(lines)
+
+    if not truncated:
+        emit(lines, fence)
+    if max_parts and (truncated or len(chunks) > max_parts):
+        chunks = chunks[:max_parts - 1] + [TRUNCATED_NOTICE]
+    return chunks
@@ -1,6 +1,8 @@
 chat_api = {
     'GET_ACCESS_TOKEN': '/cgi-bin/gettoken?corpid={}&corpsecret={}',
     'MESSAGE_SEND': '/cgi-bin/message/send?access_token={}',
+    'MESSAGE_UPDATE_TEMPLATE_CARD': '/cgi-bin/message/update_template_card?access_token={}',
+    'MESSAGE_RECALL': '/cgi-bin/message/recall?access_token={}',
     'MEDIA_UPLOAD': '/cgi-bin/media/upload?access_token={}&type={}',
     "IMG_UPLOAD": '/cgi-bin/media/uploadimg?access_token={}',
     "GET_DEPARTMENTS": '/cgi-bin/department/list?access_token={}',
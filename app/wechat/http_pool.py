@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from app.metrics import metrics
+
+logger = logging.getLogger("assistant")
+
+DEFAULT_BASE_URL = "https://qyapi.weixin.qq.com"
+DEFAULT_POOL_SIZE = int(os.getenv("WECOM_HTTP_POOL_SIZE", "20"))
+# 空闲超过 MAX_IDLE 秒或建立超过 MAX_AGE 秒的连接在下次使用前关闭重建，避免使用已被服务端或 NAT 断开的连接
+MAX_IDLE = float(os.getenv("WECOM_HTTP_MAX_IDLE", "55"))
+MAX_AGE = float(os.getenv("WECOM_HTTP_MAX_AGE", "300"))
+
+connect_seconds = metrics.histogram("wecom_http_connect_seconds", "Time spent on DNS, TCP and TLS setup per connection")
+request_seconds = metrics.histogram("wecom_http_request_seconds", "Time spent on WeCom HTTP requests, including connect")
+connections_opened_total = metrics.counter("wecom_http_connections_opened_total", "Connections opened to WeCom")
+connections_recycled_total = metrics.counter("wecom_http_connections_recycled_total", "Pooled connections closed before reuse")
+probes_total = metrics.counter("wecom_http_probes_total", "Keep-alive probes sent on idle pooled connections")
+
+_sessions: dict[str, requests.Session] = {}
+_lock = threading.Lock()
+# host（不含端口）-> 最近一次请求的 monotonic 时间
+_last_request: dict[str, float] = {}
+
+
+class _TimedConnectionMixin:
+    """
+    记录连接建立耗时、建立时间和最近使用时间
+    """
+
+    created_at = 0.0
+    last_used = 0.0
+
+    def connect(self) -> None:
+        start = time.perf_counter()
+        super().connect()
+        elapsed = time.perf_counter() - start
+        self.created_at = self.last_used = time.monotonic()
+        connect_seconds.observe(elapsed, host=self.host)
+        connections_opened_total.inc(host=self.host)
+
+    def expired(self, now: float) -> str | None:
+        if not self.is_connected:
+            return None
+        if now - self.created_at > MAX_AGE:
+            return "age"
+        if now - self.last_used > MAX_IDLE:
+            return "idle"
+        return None
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _ManagedPoolMixin:
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        reason = conn.expired(time.monotonic()) if isinstance(conn, _TimedConnectionMixin) else None
+        if reason:
+            connections_recycled_total.inc(host=self.host, reason=reason)
+            conn.close()
+        return conn
+
+    def _put_conn(self, conn) -> None:
+        if isinstance(conn, _TimedConnectionMixin):
+            conn.last_used = time.monotonic()
+        super()._put_conn(conn)
+
+
+class _ManagedHTTPConnectionPool(_ManagedPoolMixin, HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _ManagedHTTPSConnectionPool(_ManagedPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _ManagedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _ManagedHTTPConnectionPool,
+            "https": _ManagedHTTPSConnectionPool,
+        }
+
+    def send(self, request, *args, **kwargs):
+        host = urlsplit(request.url).hostname or ""
+        start = time.perf_counter()
+        try:
+            return super().send(request, *args, **kwargs)
+        finally:
+            request_seconds.observe(time.perf_counter() - start, host=host)
+            _last_request[host] = time.monotonic()
+
+
+def get_session(base_url: str) -> requests.Session:
+    """
+    按 host 共享的 requests.Session，同一 host 的多个应用复用同一个连接池
+    :param base_url: 接口地址，如 https://qyapi.weixin.qq.com
+    :return: Session
+    """
+    host = urlsplit(base_url).netloc or base_url
+    session = _sessions.get(host)
+    if session is not None:
+        return session
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = _ManagedAdapter(pool_connections=1, pool_maxsize=DEFAULT_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+    return session
+
+
+def close_sessions() -> None:
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+class ConnectionKeeper:
+    """
+    企业微信接口连接保温：
+    - 启动时预先建立 warm 个连接，首条消息不再承担 DNS、TCP、TLS 耗时
+    - 超过 probe_interval 秒没有请求时，在保温连接上发送轻量请求保持连接，过期的连接关闭后重新建立
+    """
+
+    def __init__(
+            self,
+            base_urls: list[str],
+            warm: int = 2,
+            probe_interval: float = 30,
+            probe_path: str = "/cgi-bin/gettoken",
+    ) -> None:
+        self.base_urls = list(dict.fromkeys(base_urls))
+        self.warm = max(0, min(warm, DEFAULT_POOL_SIZE))
+        self.probe_interval = probe_interval
+        self.probe_path = probe_path
+        self._task: asyncio.Task | None = None
+
+    def _pool(self, base_url: str):
+        # 与 requests 发送请求时取同一个连接池：连接池按 TLS 参数区分，verify 等参数需与 requests 一样合并环境变量
+        session = get_session(base_url)
+        settings = session.merge_environment_settings(base_url, {}, None, None, None)
+        request = requests.Request("GET", base_url).prepare()
+        return session.get_adapter(base_url).get_connection_with_tls_context(
+            request, settings["verify"], proxies=settings["proxies"], cert=settings["cert"]
+        )
+
+    def _checkout(self, pool) -> list:
+        conns = []
+        for _ in range(self.warm):
+            try:
+                conns.append(pool._get_conn(timeout=0))
+            except Exception:
+                break
+        return conns
+
+    def warm_up(self) -> None:
+        for base_url in self.base_urls:
+            pool = self._pool(base_url)
+            conns = self._checkout(pool)
+            idle = [conn for conn in conns if not conn.is_connected]
+            try:
+                if idle:
+                    with ThreadPoolExecutor(max_workers=len(idle)) as executor:
+                        list(executor.map(self._connect, idle))
+            finally:
+                for conn in conns:
+                    pool._put_conn(conn)
+            logger.info("Connections warmed up, host=%s, count=%s", pool.host, len(idle))
+
+    @staticmethod
+    def _connect(conn) -> None:
+        try:
+            conn.connect()
+        except Exception as exc:
+            logger.warning("Warm up connection failed, host=%s: %s", conn.host, exc)
+            conn.close()
+
+    def probe(self) -> None:
+        """
+        对空闲的 host 执行一轮保温
+        """
+        now = time.monotonic()
+        for base_url in self.base_urls:
+            pool = self._pool(base_url)
+            if now - _last_request.get(pool.host, 0.0) < self.probe_interval:
+                continue
+            conns = self._checkout(pool)
+            try:
+                for conn in conns:
+                    self._probe(conn)
+            finally:
+                for conn in conns:
+                    pool._put_conn(conn)
+
+    def _probe(self, conn) -> None:
+        if not conn.is_connected:
+            self._connect(conn)
+            return
+        try:
+            conn.request("GET", self.probe_path, headers={"Connection": "keep-alive"})
+            conn.getresponse().read()
+            probes_total.inc(host=conn.host, result="ok")
+        except Exception as exc:
+            probes_total.inc(host=conn.host, result="error")
+            logger.info("Keep-alive probe failed, host=%s: %s", conn.host, exc)
+            conn.close()
+
+    def start(self) -> None:
+        if self._task is None and self.warm > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        await asyncio.to_thread(self.warm_up)
+        if self.probe_interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                await asyncio.to_thread(self.probe)
+            except Exception:
+                logger.exception("Connection keep-alive round failed")
@@ -15,6 +15,10 @@ class WeComSender(WorkChatApi):
         self._handler = HandlerTool(config.corp_id, config.agent_secret, config.agent_id, **kwargs)
         self._Handler = self._handler
 
+    @property
+    def agent_id(self):
+        return self._handler.agentid
+
     def get_token(self):
         """
         获取token
@@ -155,6 +159,52 @@ class WeComSender(WorkChatApi):
         }
         return self._handler.send_message("miniprogram_notice", program_msg, **kwargs)
 
+    def send_body(self, message_type, body, target=None):
+        """
+        发送已序列化的消息请求体
+        :param message_type: 消息类型
+        :param body: message/send 请求体（JSON 字节），可由 OutboundMessage.to_request_body 生成
+        :param target: 发送对象，仅用于日志
+        :return:
+        """
+        return self._handler.send_body(message_type, body, target=target)
+
+    def upload_media(self, file_type, path):
+        """
+        上传临时素材，3天有效期
+        :param file_type: 文件类型(image,voice,video,file)
+        :param path: 文件路径
+        :return: media_id
+        """
+        return self._handler.upload_media(file_type, path)
+
+    def send_template_card(self, template_card, **kwargs):
+        """
+        发送模板卡片消息，按钮交互型等卡片的返回结果中带有 response_code，可用于更新卡片
+        :param template_card: 卡片内容
+        :param kwargs: touser(用户), todept(部门), totags(标签用户).
+        :return:
+        """
+        return self._handler.send_message("template_card", template_card, **kwargs)
+
+    def update_template_card(self, response_code, template_card, userids):
+        """
+        更新模板卡片消息
+        :param response_code: 发送或回调返回的 response_code，只能使用一次
+        :param template_card: 新的卡片内容
+        :param userids: 需要更新卡片的用户列表
+        :return:
+        """
+        return self._handler.update_template_card(response_code, template_card, userids)
+
+    def recall_message(self, msgid):
+        """
+        撤回应用消息
+        :param msgid: 发送消息返回的 msgid
+        :return:
+        """
+        return self._handler.recall_message(msgid)
+
     def upload_image(self, image_path, enable=True):
         """
         上传图片，返回图片链接，永久有效，主要用于图文消息卡片. imag_link参数
@@ -4,7 +4,9 @@ import hashlib
 from abc import ABC, abstractmethod
 from pathlib import Path
 import configparser
+import threading
 from .api import chat_api
+from .http_pool import DEFAULT_BASE_URL, get_session
 import requests
 
 from app.wechat.logger import get_wechat_logger
@@ -65,6 +67,8 @@ class WorkChatApi(ABC):
 
 
 tokenp = Path.cwd().joinpath(".token")
+# 多个应用共用 token 文件，写入时加锁并保留其他应用的节点
+_token_file_lock = threading.Lock()
 logger = get_wechat_logger()
 DEFAULT_HTTP_TIMEOUT = float(os.getenv("WECOM_HTTP_TIMEOUT", "10"))
 
@@ -79,7 +83,8 @@ class HandlerTool:
         self.corpsecret = corpsecret
         self.agentid = agentid
         self._op = None
-        self.url = 'https://qyapi.weixin.qq.com'
+        self.url = kwargs.pop("base_url", None) or DEFAULT_BASE_URL
+        self.session = get_session(self.url)
         self.http_timeout = float(kwargs.pop("timeout", DEFAULT_HTTP_TIMEOUT))
         self.conf = configparser.ConfigParser()
         self.judgment_type(corpid, corpsecret, agentid, **kwargs)
@@ -89,7 +94,7 @@ class HandlerTool:
     @staticmethod
     def is_image(file):
 
-        if not (file.suffix in (".JPG", ".PNG", ".jpg", ".png") and (5 <= file.stat().st_size <= 2 * 1024 * 1024)):
+        if not (file.suffix.lower() in (".jpg", ".jpeg", ".png") and (5 <= file.stat().st_size <= 2 * 1024 * 1024)):
             raise TypeError(
                 {"Code": "ERROR", "message": '图片文件不合法, 请检查文件类型(jpg, png, JPG, PNG)或文件大小(5B~2M)'})
 
@@ -175,7 +180,7 @@ class HandlerTool:
         """
 
         try:
-            rsp = requests.get(self.url + uri, timeout=self.http_timeout, **kwargs)
+            rsp = self.session.get(self.url + uri, timeout=self.http_timeout, **kwargs)
             rsp.raise_for_status()
             result = rsp.json()
             errcode = result.get("errcode")
@@ -201,7 +206,7 @@ class HandlerTool:
         try:
             url = self.url + uri
             for i in range(2):
-                rsp = requests.post(url.format(self.token), timeout=self.http_timeout, **kwargs)
+                rsp = self.session.post(url.format(self.token), timeout=self.http_timeout, **kwargs)
                 rsp.raise_for_status()
                 result = rsp.json()
                 logger.debug('request %s send wechat notify result: %s', i, result)
@@ -264,12 +269,16 @@ class HandlerTool:
         expires_in = int(rsp.get("expires_in", 7200))
         tokeninfo = {"token": rsp.get("access_token"), "tokenout": str(int(time.time()) + expires_in)}
 
-        self.conf[self._op] = tokeninfo
         try:
-            with open(str(tokenp), "w", encoding='utf-8') as fp:
-                self.conf.write(fp)
+            with _token_file_lock:
                 self.conf.clear()
-                logger.info('token持久化成功.. --> %s', tokenp)
+                if tokenp.is_file():
+                    self.conf.read(tokenp, encoding="utf-8")
+                self.conf[self._op] = tokeninfo
+                with open(str(tokenp), "w", encoding='utf-8') as fp:
+                    self.conf.write(fp)
+                    self.conf.clear()
+                    logger.info('token持久化成功.. --> %s', tokenp)
 
         except Exception as e:
             logger.exception("token持久化失败: %s", e)
@@ -318,6 +327,44 @@ class HandlerTool:
         logger.info("发送 %s %s --> %s", message_type, message, target)
         return self._post(chat_api.get('MESSAGE_SEND'), json=data)
 
+    def send_body(self, message_type, body, target=None):
+        """
+        发送已序列化的消息请求体
+        :param message_type: 消息类型，仅用于日志
+        :param body: message/send 请求体（JSON 字节）
+        :param target: 发送对象，仅用于日志
+        :return:
+        """
+        logger.info("发送 %s (%s bytes) --> %s", message_type, len(body), target or "-")
+        return self._post(chat_api.get('MESSAGE_SEND'), data=body,
+                          headers={"Content-Type": "application/json; charset=utf-8"})
+
+    def update_template_card(self, response_code, template_card, userids):
+        """
+        更新模板卡片消息
+        :param response_code: 发送或回调返回的 response_code，只能使用一次
+        :param template_card: 新的卡片内容
+        :param userids: 需要更新卡片的用户列表
+        :return:
+        """
+        data = {
+            "userids": userids,
+            "agentid": self.agentid,
+            "response_code": response_code,
+            "template_card": template_card,
+        }
+        logger.info("更新模板卡片 %s --> %s", template_card.get("task_id"), userids)
+        return self._post(chat_api.get('MESSAGE_UPDATE_TEMPLATE_CARD'), json=data)
+
+    def recall_message(self, msgid):
+        """
+        撤回24小时内发送的应用消息
+        :param msgid: 发送消息返回的 msgid
+        :return:
+        """
+        logger.info("撤回消息 %s", msgid)
+        return self._post(chat_api.get('MESSAGE_RECALL'), json={"msgid": msgid})
+
     def upload_media(self, file_type, path):
         """
         上传临时素材， 3天有效期
@@ -368,6 +415,7 @@ class HandlerTool:
         url = chat_api.get("GET_USER_INFO").format(self.token, user_id)
         user_data = self._get(url)
         logger.info('get_user_info: %s', user_data)
+        return user_data
 
     def get_users_id(self, data):
         data["access_token"] = self.token
@@ -0,0 +1,187 @@
+"""
+任务队列 worker：从 JOB_QUEUE_URL 指定的队列领取回调进程（APP_ROLE=ingress）写入的指令并执行
+
+    python -m app.worker            # 运行 worker
+    python -m app.worker --leases   # 查看当前租约
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+from collections.abc import Awaitable, Callable
+
+from app.job_queue import JobQueue, QueuedJob, open_job_queue
+
+logger = logging.getLogger("assistant")
+
+
+class JobWorker:
+    """
+    循环领取任务，最多同时执行 concurrency 个；执行期间每 lease_seconds/3 续租一次。
+    进程崩溃时租约到期后由其他 worker 重新领取；正常退出时未完成的任务释放回队列。
+    每轮检查一次用户在回调进程取消的任务（cancel 指令），取消后不再重新执行。
+    按用户公平领取任务，per_user_concurrency 大于 0 时单个用户在所有 worker 上同时执行的任务不超过该数量。
+    """
+
+    def __init__(
+            self,
+            queue: JobQueue,
+            run: Callable[[str, str], Awaitable[None]],
+            concurrency: int = 16,
+            lease_seconds: float = 60,
+            poll_interval: float = 1.0,
+            owner: str | None = None,
+            per_user_concurrency: int = 0,
+    ) -> None:
+        self.queue = queue
+        self.run = run
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.per_user_concurrency = per_user_concurrency
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self._running: dict[int, asyncio.Task] = {}
+        self._cancelled: set[int] = set()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+
+    async def run_forever(self, grace: float = 30) -> None:
+        logger.info("Job worker started, owner=%s, concurrency=%s", self.owner, self.concurrency)
+        while not self._stopping:
+            free = self.concurrency - len(self._running)
+            jobs = []
+            if free > 0:
+                try:
+                    jobs = await asyncio.to_thread(
+                        self.queue.lease, self.owner, free, self.lease_seconds, self.per_user_concurrency
+                    )
+                except Exception:
+                    logger.exception("Lease jobs failed")
+            for job in jobs:
+                task = asyncio.create_task(self._execute(job))
+                self._running[job.job_id] = task
+                task.add_done_callback(lambda _t, job_id=job.job_id: self._finished(job_id))
+            if self._running:
+                await self._cancel_requested()
+            if not jobs:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        await self._drain(grace)
+        logger.info("Job worker stopped, owner=%s", self.owner)
+
+    def _finished(self, job_id: int) -> None:
+        self._running.pop(job_id, None)
+        self._cancelled.discard(job_id)
+        self._wakeup.set()
+
+    async def _cancel_requested(self) -> None:
+        try:
+            job_ids = await asyncio.to_thread(self.queue.cancel_requests, self.owner)
+        except Exception:
+            logger.exception("Check cancel requests failed")
+            return
+        for job_id in job_ids:
+            task = self._running.get(job_id)
+            if task is not None and job_id not in self._cancelled:
+                self._cancelled.add(job_id)
+                task.cancel()
+                logger.info("Job cancel requested, job=%s", job_id)
+
+    async def _execute(self, job: QueuedJob) -> None:
+        logger.info("Job leased, job=%s, user=%s, attempts=%s", job.job_id, job.user_id, job.attempts)
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await self.run(job.user_id, job.content)
+        except asyncio.CancelledError:
+            if job.job_id not in self._cancelled:
+                await asyncio.to_thread(self.queue.release, job.job_id, self.owner)
+                logger.info("Job released, job=%s", job.job_id)
+                raise
+            # 用户取消：确认任务，不再重新执行
+            asyncio.current_task().uncancel()
+            logger.info("Job cancelled, job=%s", job.job_id)
+        except Exception:
+            # 指令已部分执行（可能已给用户发送消息），失败时不重试
+            logger.exception("Job failed, job=%s, user=%s", job.job_id, job.user_id)
+        finally:
+            heartbeat.cancel()
+        if not await asyncio.to_thread(self.queue.ack, job.job_id, self.owner):
+            logger.warning("Job ack rejected, lease lost, job=%s", job.job_id)
+
+    async def _heartbeat(self, job: QueuedJob) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await asyncio.to_thread(self.queue.extend, job.job_id, self.owner, self.lease_seconds):
+                    logger.warning("Job lease lost, job=%s", job.job_id)
+                    return
+            except Exception:
+                logger.exception("Extend lease failed, job=%s", job.job_id)
+
+    async def _drain(self, grace: float) -> None:
+        if not self._running:
+            return
+        logger.info("Waiting for %s running jobs", len(self._running))
+        _done, pending = await asyncio.wait(list(self._running.values()), timeout=grace)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def _main() -> None:
+    from app.main import (
+        _env_float, _env_int, close_resources, connection_keeper, cpu_pool, image_preparer, loop_monitor, run_command,
+    )
+
+    queue = open_job_queue(os.getenv("JOB_QUEUE_URL", "sqlite:///data/jobs.db"))
+    worker = JobWorker(
+        queue,
+        run=run_command,
+        concurrency=_env_int("WORKER_CONCURRENCY", 16),
+        lease_seconds=_env_float("WORKER_LEASE_SECONDS", 60),
+        poll_interval=_env_float("WORKER_POLL_INTERVAL", 1.0),
+        per_user_concurrency=_env_int("CMD_USER_CONCURRENCY", 2),
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    loop_monitor.start()
+    connection_keeper.start()
+    await cpu_pool.start()
+    await image_preparer.start()
+    try:
+        await worker.run_forever(grace=_env_float("WORKER_STOP_GRACE", 30))
+    finally:
+        await loop_monitor.stop()
+        await close_resources()
+        queue.close()
+
+
+def _print_leases() -> None:
+    queue = open_job_queue(os.getenv("JOB_QUEUE_URL", "sqlite:///data/jobs.db"))
+    now = time.time()
+    print(" ".join(f"{key}={value}" for key, value in queue.stats().items()))
+    for job in queue.leases():
+        print(f"{job.job_id}\t{job.lease_owner}\texpires_in={job.lease_expires - now:.1f}s\t"
+              f"attempts={job.attempts}\t{job.user_id}\t{job.content}")
+    queue.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WeCom command worker")
+    parser.add_argument("--leases", action="store_true", help="show queue stats and current leases, then exit")
+    if parser.parse_args().leases:
+        _print_leases()
+    else:
+        asyncio.run(_main())
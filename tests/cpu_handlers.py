@@ -0,0 +1,19 @@
+"""
+进程池测试用的 handler，必须是可在子进程中导入的模块级函数
+"""
+from app.command_router import CommandContext
+
+
+async def report(arg: str, ctx: CommandContext) -> None:
+    ctx.set_progress("计算中")
+    await ctx.notify_text(f"结果: {arg.upper()}")
+
+
+async def spin(arg: str, ctx: CommandContext) -> None:
+    await ctx.notify_text("开始")
+    while True:
+        try:
+            sum(range(1000))
+        except Exception:
+            # 中断不应被 except Exception 吞掉
+            pass
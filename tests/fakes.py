@@ -0,0 +1,72 @@
+"""
+测试用的企业微信替身：记录发送、更新卡片、撤回的调用，不访问网络
+"""
+import itertools
+from typing import Any
+
+from app.command_router import CommandContext
+from app.messages import OutboundMessage
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class FakeWeCom:
+    """
+    与 main 中 send_message / update_card / recall_message 行为一致的替身：
+    - 发送成功返回 msgid，with_response_code=True 时同时返回 response_code（每个 code 只能用于一次更新）
+    - update_ok / recall_ok 为 False 时模拟接口返回错误
+    """
+
+    def __init__(self, with_response_code: bool = True, update_ok: bool = True, recall_ok: bool = True) -> None:
+        self.with_response_code = with_response_code
+        self.update_ok = update_ok
+        self.recall_ok = recall_ok
+        self.sent: list[tuple[str, OutboundMessage]] = []
+        self.updated: list[tuple[str, str, dict[str, Any]]] = []
+        self.recalled: list[str] = []
+        self._ids = itertools.count(1)
+        self._used_codes: set[str] = set()
+
+    async def send_message(self, to_user: str, message: OutboundMessage) -> dict[str, Any]:
+        self.sent.append((to_user, message))
+        n = next(self._ids)
+        result = {"errcode": 0, "msgid": f"msg-{n}"}
+        if self.with_response_code:
+            result["response_code"] = f"code-{n}"
+        return result
+
+    async def update_card(self, to_user: str, response_code: str, card: dict[str, Any]) -> bool:
+        if not self.update_ok or response_code in self._used_codes:
+            return False
+        self._used_codes.add(response_code)
+        self.updated.append((to_user, response_code, card))
+        return True
+
+    async def recall_message(self, msgid: str) -> bool:
+        if not self.recall_ok:
+            return False
+        self.recalled.append(msgid)
+        return True
+
+    def context(self, user_id: str = "zhangsan", content: str = "", tenant: str = "") -> CommandContext:
+        return CommandContext(
+            user_id=user_id,
+            content=content,
+            send_message=self.send_message,
+            update_card=self.update_card,
+            recall_message=self.recall_message,
+            tenant=tenant,
+        )
+
+    @property
+    def texts(self) -> list[str]:
+        return [message.payload.get("content", "") for _user, message in self.sent]
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.coalescer import NotificationCoalescer
+from app.messages import MarkdownMessage, TemplateCardMessage, TextMessage
+from app.text_split import MESSAGE_BYTE_LIMITS
+from tests.fakes import FakeWeCom
+
+
+def test_merges_burst_within_window():
+    async def run():
+        wecom = FakeWeCom()
+        coalescer = NotificationCoalescer(wecom.send_message, window=0.02)
+        for i in range(3):
+            await coalescer.send("zhangsan", TextMessage(f"第{i}条"))
+        await coalescer.send("lisi", TextMessage("另一个用户"))
+        await asyncio.sleep(0.05)
+        return wecom, coalescer
+
+    wecom, coalescer = asyncio.run(run())
+    assert sorted(wecom.texts) == ["另一个用户", "第0条\n第1条\n第2条"]
+    assert coalescer._locks == {}
+
+
+def test_type_switch_flushes_first_and_keeps_order():
+    async def run():
+        wecom = FakeWeCom()
+        coalescer = NotificationCoalescer(wecom.send_message, window=10)
+        await coalescer.send("zhangsan", TextMessage("a"))
+        await coalescer.send("zhangsan", TextMessage("b"))
+        await coalescer.send("zhangsan", MarkdownMessage("**c**"))
+        await coalescer.send("zhangsan", TemplateCardMessage({"card_type": "text_notice"}))
+        return wecom
+
+    wecom = asyncio.run(run())
+    assert [message.msg_type for _user, message in wecom.sent] == ["text", "markdown", "template_card"]
+    assert wecom.texts[:2] == ["a\nb", "**c**"]
+
+
+def test_merged_message_stays_under_byte_limit():
+    async def run():
+        wecom = FakeWeCom()
+        coalescer = NotificationCoalescer(wecom.send_message, window=10)
+        chunk = "字" * 300
+        for _ in range(6):
+            await coalescer.send("zhangsan", TextMessage(chunk))
+        await coalescer.flush()
+        return wecom
+
+    wecom = asyncio.run(run())
+    assert len(wecom.sent) > 1
+    assert all(len(text.encode("utf-8")) <= MESSAGE_BYTE_LIMITS["text"] for text in wecom.texts)
+    assert "".join(wecom.texts).replace("\n", "") == "字" * 1800
+
@@ -0,0 +1,73 @@
+import time
+
+from app.command_index import CommandIndex, edit_distance
+from app.command_router import CommandRouter
+
+ENTRIES = [
+    ("schedule", ("定时",)),
+    ("schedules", ("定时任务",)),
+    ("status", ()),
+    ("stats", ("统计",)),
+    ("echo", ("复读",)),
+    ("time", ("时间",)),
+]
+
+
+def test_resolve_names_aliases_and_unique_prefixes():
+    index = CommandIndex(ENTRIES)
+    assert index.resolve("echo") == "echo"
+    assert index.resolve("复读") == "echo"
+    assert index.resolve("定时任务") == "schedules"
+    assert index.resolve("ec") == "echo"
+    # 有歧义的前缀不解析
+    assert index.resolve("st") is None
+    assert index.resolve("sched") is None
+    assert index.resolve("schedule") == "schedule"
+    assert index.resolve("e") is None
+
+
+def test_completions_list_ambiguous_prefixes():
+    index = CommandIndex(ENTRIES)
+    assert index.completions("sta") == ["stats", "status"]
+    assert index.completions("sch") == ["schedule", "schedules"]
+    assert index.completions("s") == []
+
+
+def test_suggest_ranks_by_distance():
+    index = CommandIndex(ENTRIES)
+    assert index.suggest("ehco") == ["echo"]
+    assert index.suggest("tmie") == ["time"]
+    assert index.suggest("scheduel") == ["schedule", "schedules"]
+    assert index.suggest("xyz") == []
+
+
+def test_alias_conflict_keeps_first_owner():
+    index = CommandIndex([("ping", ("p1",)), ("pong", ("p1",))])
+    assert index.resolve("p1") == "ping"
+
+
+def test_edit_distance_with_transpositions_and_limit():
+    assert edit_distance("echo", "ehco", 2) == 1
+    assert edit_distance("kitten", "sitting", 3) == 3
+    assert edit_distance("a", "abcdef", 2) == 3
+
+
+def test_long_tokens_skip_suggestions_quickly():
+    index = CommandIndex(ENTRIES)
+    start = time.perf_counter()
+    assert index.suggest("x" * 5000) == []
+    assert time.perf_counter() - start < 0.1
+
+
+def test_router_resolves_message_to_command_name():
+    async def handler(arg, ctx) -> None:
+        pass
+
+    router = CommandRouter()
+    router.register("schedule", handler, aliases=("定时",))
+    router.register("unschedule", handler, aliases=("删除定时",))
+    # 回调进程按这个结果决定指令在本进程执行还是写入任务队列
+    assert router.resolve("定时 every 1m echo x") == "schedule"
+    assert router.resolve("  UNSCH 3") == "unschedule"
+    assert router.resolve("echo x") is None
+    assert router.resolve("") is None
@@ -0,0 +1,156 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.command_router import CommandContext, CommandRouter
+from app.command_stats import CommandStats, record_upload
+from app.metrics import MetricsRegistry
+from tests.fakes import FakeWeCom
+
+
+async def _reply(arg: str, ctx: CommandContext) -> None:
+    await ctx.notify_text("1")
+    await ctx.notify_text("2")
+
+
+async def _fail(arg: str, ctx: CommandContext) -> None:
+    raise RuntimeError("boom")
+
+
+async def _slow(arg: str, ctx: CommandContext) -> None:
+    await asyncio.sleep(1)
+
+
+async def _upload(arg: str, ctx: CommandContext) -> None:
+    record_upload(arg)
+
+
+def _row(stats: CommandStats, command: str) -> dict:
+    return next(row for row in stats.report() if row["command"] == command)
+
+
+def test_outcomes_and_messages_counted_per_command():
+    # 指标是进程级的，指令名带前缀避免与其他测试混在一起
+    async def run():
+        stats = CommandStats()
+        router = CommandRouter(stats=stats, task_timeout=0.05)
+        router.register("cs_reply", _reply)
+        router.register("cs_fail", _fail)
+        router.register("cs_slow", _slow)
+        wecom = FakeWeCom()
+        for content in ("cs_reply", "cs_reply", "cs_slow"):
+            await router.dispatch(wecom.context(content=content))
+        # 异常由调用方记录日志，这里照常抛出
+        with pytest.raises(RuntimeError):
+            await router.dispatch(wecom.context(content="cs_fail"))
+        return stats
+
+    stats = asyncio.run(run())
+    reply, fail, slow = (_row(stats, command) for command in ("cs_reply", "cs_fail", "cs_slow"))
+    assert (reply["calls"], reply["outcomes"]["ok"], reply["messages"]) == (2, 2, 4)
+    assert fail["outcomes"]["error"] == 1
+    assert slow["outcomes"]["timeout"] == 1
+    assert slow["wall_seconds"]["p50"] is not None
+    assert "cs_fail: 1 次（失败 1）" in stats.format_report(50)
+
+
+def test_track_restores_send_and_records_upload(tmp_path):
+    path = tmp_path / "report.bin"
+    path.write_bytes(b"x" * 2048)
+
+    async def run():
+        stats = CommandStats()
+        ctx = FakeWeCom().context()
+        send = ctx.send_message
+        with stats.track("cs_upload", ctx) as usage:
+            assert ctx.send_message is not send
+            await _upload(str(path), ctx)
+            await ctx.notify_text("done")
+        # 不在指令中时忽略
+        record_upload(str(path))
+        return stats, usage, ctx.send_message is send
+
+    stats, usage, restored = asyncio.run(run())
+    assert restored
+    assert (usage.upload_bytes, usage.messages, usage.outcome) == (2048, 1, "ok")
+    assert _row(stats, "cs_upload")["upload_bytes"] == 2048
+
+
+def test_cancelled_outcome():
+    async def run():
+        stats = CommandStats()
+        task = asyncio.create_task(_tracked_sleep(stats))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return _row(stats, "cs_cancel")["outcomes"]
+
+    assert asyncio.run(run())["cancelled"] == 1
+
+
+async def _tracked_sleep(stats: CommandStats) -> None:
+    with stats.track("cs_cancel", FakeWeCom().context()):
+        await asyncio.sleep(1)
+
+
+def test_stats_command_requires_admin():
+    async def run():
+        stats = CommandStats()
+        router = CommandRouter(stats=stats)
+        router.register("cs_reply", _reply)
+        stats.register_commands(router, admins=["admin"])
+        wecom = FakeWeCom()
+        await router.dispatch(wecom.context(content="cs_reply"))
+        await router.dispatch(wecom.context(content="stats"))
+        await router.dispatch(wecom.context(user_id="admin", content="stats 5"))
+        return wecom.texts
+
+    texts = asyncio.run(run())
+    assert texts[2] == "没有权限"
+    assert texts[3].startswith("指令统计")
+
+
+def test_registry_rejects_type_conflict():
+    registry = MetricsRegistry()
+    assert registry.counter("jobs_total", "") is registry.counter("jobs_total", "")
+    registry.gauge("depth", "")
+    with pytest.raises(ValueError, match="already registered as gauge"):
+        registry.counter("depth", "")
+    with pytest.raises(ValueError, match="already registered as counter"):
+        registry.histogram("jobs_total", "")
+
+
+def test_gauge_and_histogram_render():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("depth", "Queue depth")
+    gauge.set(5, queue="a")
+    gauge.dec(2, queue="a")
+    histogram = registry.histogram("latency", "Latency", buckets=(1, 2))
+    for value in (0.5, 1.5, 1.5, 3):
+        histogram.observe(value)
+    text = registry.render()
+    assert '# TYPE depth gauge\ndepth{queue="a"} 3\n' in text
+    assert 'latency_bucket{le="1"} 1\nlatency_bucket{le="2"} 3\nlatency_bucket{le="+Inf"} 4\n' in text
+    assert "latency_sum 6.5\nlatency_count 4\n" in text
+    assert histogram.quantile(0.5) == pytest.approx(1.5)
+    assert histogram.quantile(0.5, other="x") is None
+
+
+def test_render_while_other_threads_add_labels():
+    registry = MetricsRegistry()
+    counter = registry.counter("calls_total", "")
+    histogram = registry.histogram("wall", "")
+
+    def writer() -> None:
+        for n in range(20000):
+            counter.inc(command=f"c{n % 500}")
+            histogram.observe(0.01, command=f"c{n % 500}")
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    # 渲染期间字典被另一个线程修改，不应抛出 "dictionary changed size during iteration"
+    while thread.is_alive():
+        registry.render()
+    thread.join()
+    assert "calls_total{command=\"c499\"} 40" in registry.render()
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from app.command_router import CommandRouter
+from app.cpu_pool import CpuHandlerPool
+from tests import cpu_handlers
+from tests.fakes import FakeWeCom
+
+
+def _router(pool: CpuHandlerPool, task_timeout: float | None = None) -> CommandRouter:
+    router = CommandRouter(task_timeout=task_timeout, cpu_pool=pool)
+    router.register("report", cpu_handlers.report, cpu_bound=True)
+    router.register("spin", cpu_handlers.spin, cpu_bound=True)
+    return router
+
+
+def test_forwards_messages_and_progress_from_worker():
+    async def run():
+        pool = CpuHandlerPool(max_workers=1)
+        await pool.start()
+        try:
+            wecom = FakeWeCom()
+            router = _router(pool)
+            progress = []
+            ctx = wecom.context(content="report abc")
+            original = ctx.set_progress
+            ctx.set_progress = lambda value: (progress.append(value), original(value))
+            await router.dispatch(ctx)
+            return wecom.texts, progress
+        finally:
+            pool.shutdown()
+
+    texts, progress = asyncio.run(run())
+    assert texts == ["结果: ABC"]
+    assert progress == ["计算中"]
+
+
+def test_timeout_interrupts_worker_and_frees_it():
+    async def run():
+        pool = CpuHandlerPool(max_workers=1)
+        await pool.start()
+        try:
+            wecom = FakeWeCom()
+            router = _router(pool, task_timeout=1)
+            await router.dispatch(wecom.context(content="spin"))
+            # 只有一个子进程，中断后才能执行下一个任务
+            await asyncio.wait_for(router.dispatch(wecom.context(content="report ok")), 10)
+            await pool.recycle()
+            await asyncio.wait_for(router.dispatch(wecom.context(content="report again")), 10)
+            return wecom.texts
+        finally:
+            pool.shutdown()
+
+    texts = asyncio.run(run())
+    assert texts[0] == "开始"
+    assert "执行超时" in texts[1]
+    assert texts[2:] == ["结果: OK", "结果: AGAIN"]
+
+
+def test_rejects_non_module_level_handler():
+    async def local(arg, ctx):
+        pass
+
+    with pytest.raises(ValueError):
+        CommandRouter().register("local", local, cpu_bound=True)
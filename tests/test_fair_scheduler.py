@@ -0,0 +1,131 @@
+import asyncio
+import contextvars
+
+from app.command_router import CommandRouter
+from app.fair_scheduler import ACCEPTED, COALESCED, REJECTED, FairCommandScheduler
+
+
+class _Recorder:
+    """
+    记录开始执行的指令，指令在 gate 设置之前一直阻塞
+    """
+
+    def __init__(self) -> None:
+        self.started: list[tuple[str, str]] = []
+        self.gate = asyncio.Event()
+
+    async def run(self, user_id: str, content: str) -> None:
+        self.started.append((user_id, content))
+        await self.gate.wait()
+
+
+async def _settle(scheduler: FairCommandScheduler | None = None) -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+    while scheduler is not None and (scheduler.active or scheduler.pending()):
+        await asyncio.sleep(0)
+
+
+def test_round_robin_across_users():
+    async def run():
+        recorder = _Recorder()
+        scheduler = FairCommandScheduler(recorder.run, max_concurrency=2, per_user_concurrency=2)
+        for i in range(4):
+            scheduler.submit("heavy", f"job{i}")
+        scheduler.submit("light", "ping")
+        await _settle()
+        first = list(recorder.started)
+        recorder.gate.set()
+        await _settle(scheduler)
+        return first, recorder.started
+
+    first, started = asyncio.run(run())
+    assert first == [("heavy", "job0"), ("heavy", "job1")]
+    # 后提交的用户排在同一用户剩余的排队任务之前，不会等到它们全部执行完
+    assert started.index(("light", "ping")) < started.index(("heavy", "job3"))
+    assert len(started) == 5
+
+
+def test_per_user_concurrency_cap():
+    async def run():
+        recorder = _Recorder()
+        scheduler = FairCommandScheduler(recorder.run, max_concurrency=10, per_user_concurrency=2)
+        for i in range(5):
+            scheduler.submit("zhangsan", f"job{i}")
+        await _settle()
+        result = len(recorder.started), scheduler.active, scheduler.pending("zhangsan")
+        recorder.gate.set()
+        await _settle(scheduler)
+        return result, scheduler.active, scheduler.pending()
+
+    (started, active, pending), active_after, pending_after = asyncio.run(run())
+    assert (started, active, pending) == (2, 2, 3)
+    assert (active_after, pending_after) == (0, 0)
+
+
+def test_serialize_per_user_keeps_order():
+    async def run():
+        order = []
+
+        async def handler(user_id: str, content: str) -> None:
+            await asyncio.sleep(0.01 if content == "a" else 0)
+            order.append(content)
+
+        scheduler = FairCommandScheduler(handler, per_user_concurrency=4, serialize_per_user=True)
+        for content in ("a", "b", "c"):
+            scheduler.submit("zhangsan", content)
+        await asyncio.sleep(0.05)
+        return order
+
+    assert asyncio.run(run()) == ["a", "b", "c"]
+
+
+def test_coalesce_and_reject_when_queue_full():
+    async def run():
+        recorder = _Recorder()
+        rejected = []
+
+        async def on_reject(user_id: str, content: str) -> None:
+            rejected.append(content)
+
+        scheduler = FairCommandScheduler(
+            recorder.run, per_user_concurrency=1, per_user_queue=2, on_reject=on_reject,
+        )
+        results = [scheduler.submit("zhangsan", content) for content in ("run", "q1", "q1", "q2", "q3")]
+        await _settle()
+        recorder.gate.set()
+        await _settle(scheduler)
+        return results, rejected, recorder.started
+
+    results, rejected, started = asyncio.run(run())
+    assert results == [ACCEPTED, ACCEPTED, COALESCED, ACCEPTED, REJECTED]
+    assert rejected == ["q3"]
+    assert [content for _user, content in started] == ["run", "q1", "q2"]
+
+
+def test_runs_in_submit_context():
+    var = contextvars.ContextVar("var", default="default")
+
+    async def run():
+        seen = []
+
+        async def handler(user_id: str, content: str) -> None:
+            seen.append(var.get())
+
+        scheduler = FairCommandScheduler(handler)
+        var.set("submitted")
+        scheduler.submit("zhangsan", "ping")
+        var.set("changed")
+        await _settle()
+        return seen
+
+    assert asyncio.run(run()) == ["submitted"]
+
+
+def test_builtin_commands_bypass_scheduler():
+    router = CommandRouter()
+    assert router.is_builtin("help")
+    assert router.is_builtin("取消 3")
+    assert router.is_builtin("  TASKS ")
+    assert not router.is_builtin("ping")
+    assert not router.is_builtin("")
@@ -0,0 +1,56 @@
+import gzip
+import os
+
+from app.file_parts import split_file
+
+LIMIT = 200_000
+
+
+def _write(path, data: bytes) -> str:
+    path.write_bytes(data)
+    return str(path)
+
+
+def _read_all(paths: list[str]) -> bytes:
+    data = b""
+    for path in paths:
+        with open(path, "rb") as fp:
+            data += fp.read()
+    return data
+
+
+def test_incompressible_data_split_into_gzip_members(tmp_path):
+    data = os.urandom(1_000_000)
+    out = tmp_path / "out"
+    out.mkdir()
+    parts = split_file(_write(tmp_path / "dump.bin", data), str(out), limit=LIMIT)
+    assert parts.compressed and len(parts.paths) > 1
+    assert all(os.path.getsize(path) <= LIMIT for path in parts.paths)
+    # 每个分片可单独解压，按顺序拼接后解压得到原文件
+    assert b"".join(gzip.decompress(_read_all([path])) for path in parts.paths) == data
+    assert gzip.decompress(_read_all(parts.paths)) == data
+    total = len(parts.paths)
+    assert [os.path.basename(path) for path in parts.paths][0] == f"dump.bin.gz.part1of{total}"
+    assert sorted(parts.paths) == parts.paths
+    assert parts.join_hint() == "cat dump.bin.gz.part* > dump.bin.gz && gunzip dump.bin.gz"
+
+
+def test_compressible_file_fits_in_one_part(tmp_path):
+    data = b"timestamp,value\n" + b"2026-10-19,42\n" * 200_000
+    parts = split_file(_write(tmp_path / "report.csv", data), str(tmp_path), limit=LIMIT)
+    assert [os.path.basename(path) for path in parts.paths] == ["report.csv.gz"]
+    assert gzip.decompress(_read_all(parts.paths)) == data
+    assert parts.join_hint() == "gunzip report.csv.gz"
+
+
+def test_compressed_formats_split_by_bytes(tmp_path):
+    data = os.urandom(LIMIT * 3)
+    out = tmp_path / "out"
+    out.mkdir()
+    parts = split_file(_write(tmp_path / "photos.zip", data), str(out), limit=LIMIT)
+    assert not parts.compressed
+    # 恰好是 limit 的整数倍时不产生空分片
+    assert [os.path.getsize(path) for path in parts.paths] == [LIMIT] * 3
+    assert _read_all(parts.paths) == data
+    assert parts.join_hint() == "cat photos.zip.part* > photos.zip"
+    assert sorted(os.listdir(out)) == [os.path.basename(path) for path in parts.paths]
@@ -0,0 +1,74 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.wechat import http_pool
+from app.wechat.http_pool import ConnectionKeeper, connections_opened_total, connections_recycled_total, get_session
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.server.paths.append(self.path)
+        body = b'{"errcode":0}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.paths = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_port}"
+    http_pool.close_sessions()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _opened() -> float:
+    return connections_opened_total.value(host="127.0.0.1")
+
+
+def test_session_shared_per_host_and_connection_reused(server):
+    _httpd, base_url = server
+    session = get_session(base_url)
+    assert get_session(base_url + "/cgi-bin") is session
+    before = _opened()
+    for _ in range(3):
+        assert session.get(f"{base_url}/cgi-bin/message/send").json() == {"errcode": 0}
+    assert _opened() - before == 1
+
+
+def test_idle_connection_recycled_before_reuse(server, monkeypatch):
+    _httpd, base_url = server
+    session = get_session(base_url)
+    session.get(base_url)
+    monkeypatch.setattr(http_pool, "MAX_IDLE", 0.0)
+    before = _opened(), connections_recycled_total.value(host="127.0.0.1", reason="idle")
+    session.get(base_url)
+    after = _opened(), connections_recycled_total.value(host="127.0.0.1", reason="idle")
+    assert (after[0] - before[0], after[1] - before[1]) == (1, 1)
+
+
+def test_warm_up_and_probe(server):
+    httpd, base_url = server
+    keeper = ConnectionKeeper([base_url, base_url], warm=2, probe_interval=0, probe_path="/cgi-bin/gettoken")
+    before = _opened()
+    keeper.warm_up()
+    assert _opened() - before == 2
+    assert httpd.paths == []
+    # 预先建立的连接直接用于请求
+    get_session(base_url).get(base_url)
+    assert _opened() - before == 2
+    keeper.probe()
+    assert httpd.paths[1:] == ["/cgi-bin/gettoken", "/cgi-bin/gettoken"]
@@ -0,0 +1,101 @@
+import asyncio
+import io
+import os
+
+import pytest
+
+from app.image_prep import ImagePreparer, _transcode, image_cache_hits_total, image_prepared_total, needs_prepare
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _noise(path, size=(800, 600), mode="RGB", fmt=None) -> str:
+    image = Image.frombytes(mode, size, os.urandom(size[0] * size[1] * len(mode)))
+    image.save(path, format=fmt)
+    return str(path)
+
+
+def test_needs_prepare(tmp_path):
+    small = _noise(tmp_path / "small.jpg", size=(32, 32))
+    assert not needs_prepare(small)
+    assert needs_prepare(small, limit=10)
+    assert needs_prepare(_noise(tmp_path / "shot.bmp", size=(32, 32)))
+
+
+def test_transcode_downscales_until_under_limit(tmp_path):
+    src = _noise(tmp_path / "photo.bmp", size=(1600, 1200))
+    data, suffix = _transcode(src, 60_000, max_side=1000)
+    assert suffix == ".jpg" and len(data) <= 60_000
+    with Image.open(io.BytesIO(data)) as image:
+        assert max(image.size) <= 1000
+
+
+def test_transcode_keeps_png_for_transparent_images(tmp_path):
+    image = Image.new("RGBA", (200, 100), (255, 0, 0, 128))
+    image.save(tmp_path / "chart.webp", format="WEBP", lossless=True)
+    data, suffix = _transcode(str(tmp_path / "chart.webp"), 1_000_000, max_side=2560)
+    assert suffix == ".png"
+    with Image.open(io.BytesIO(data)) as result:
+        assert result.mode == "RGBA" and result.size == (200, 100)
+
+
+def test_preparer_caches_by_content(tmp_path):
+    async def run():
+        preparer = ImagePreparer(cache_dir=str(tmp_path / "cache"), max_workers=1, max_side=400, limit=30_000)
+        src = _noise(tmp_path / "a.bmp", size=(600, 400))
+        copy = tmp_path / "b.bmp"
+        copy.write_bytes(open(src, "rb").read())
+        prepared_before, hits_before = image_prepared_total.value(), image_cache_hits_total.value()
+        try:
+            first, second = await asyncio.gather(preparer.prepare(src), preparer.prepare(src))
+            third = await preparer.prepare(str(copy))
+        finally:
+            preparer.shutdown()
+        return (
+            first, second, third,
+            image_prepared_total.value() - prepared_before, image_cache_hits_total.value() - hits_before,
+        )
+
+    first, second, third, prepared, hits = asyncio.run(run())
+    # 并发请求只处理一次，内容相同的文件直接命中缓存
+    assert first == second == third
+    assert (prepared, hits) == (1, 1)
+    assert os.path.getsize(first) <= 30_000
+
+
+def test_prune_removes_least_recently_used(tmp_path):
+    preparer = ImagePreparer(cache_dir=str(tmp_path), max_cache_bytes=250)
+    for i, name in enumerate(("old", "mid", "new")):
+        path = tmp_path / f"{name}.jpg"
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+    preparer._prune()
+    assert sorted(os.listdir(tmp_path)) == ["mid.jpg", "new.jpg"]
+
+
+def test_start_spawns_workers_off_the_event_loop(tmp_path):
+    async def run():
+        preparer = ImagePreparer(cache_dir=str(tmp_path / "cache"), max_workers=2)
+        ticks = 0
+
+        async def tick() -> None:
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticker = asyncio.create_task(tick())
+        try:
+            await preparer.start()
+            started = preparer._executor
+            await preparer.start()
+            return ticks, started, preparer._executor is started, len(started._processes)
+        finally:
+            ticker.cancel()
+            preparer.shutdown()
+
+    ticks, started, reused, workers = asyncio.run(run())
+    # 子进程启动期间事件循环仍在运行
+    assert ticks > 1
+    assert started is not None and reused
+    assert workers == 2
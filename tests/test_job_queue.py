@@ -0,0 +1,199 @@
+import asyncio
+import time
+
+import pytest
+
+from app.command_router import CommandRouter
+from app.job_queue import MemoryJobQueue, SQLiteJobQueue, open_job_queue
+from app.queued_tasks import QueuedTaskCommands
+from app.worker import JobWorker
+from tests.fakes import FakeWeCom
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def queue(request, tmp_path):
+    queue = MemoryJobQueue() if request.param == "memory" else SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    yield queue
+    queue.close()
+
+
+def _expire() -> None:
+    # lease_seconds=0 的租约在下一次 lease 时已过期
+    time.sleep(0.01)
+
+
+def test_dedup_and_exclusive_lease(queue):
+    assert queue.enqueue("zhangsan", "ping", dedup_key="msg-1")
+    assert not queue.enqueue("zhangsan", "ping", dedup_key="msg-1")
+    queue.enqueue("lisi", "time")
+    first = queue.lease("w1", 10, 60)
+    assert [job.content for job in first] == ["ping", "time"]
+    assert queue.lease("w2", 10, 60) == []
+    assert queue.stats()["leased"] == 2
+
+
+def test_expired_lease_moves_to_another_worker(queue):
+    queue.enqueue("zhangsan", "ping")
+    job = queue.lease("w1", 1, 0)[0]
+    _expire()
+    again = queue.lease("w2", 1, 60)
+    assert [j.job_id for j in again] == [job.job_id]
+    assert again[0].attempts == 2
+    # 原 worker 的租约已失效
+    assert not queue.ack(job.job_id, "w1")
+    assert not queue.extend(job.job_id, "w1", 60)
+    assert queue.ack(job.job_id, "w2")
+    assert queue.user_jobs("zhangsan") == []
+
+
+def test_dead_letter_after_max_attempts(queue):
+    queue.enqueue("zhangsan", "crash")
+    for _ in range(queue.max_attempts):
+        assert len(queue.lease("w1", 1, 0)) == 1
+        _expire()
+    assert queue.lease("w1", 1, 60) == []
+    assert queue.stats()["dead"] == 1
+
+
+def test_release_returns_job_to_queue(queue):
+    queue.enqueue("zhangsan", "ping")
+    job = queue.lease("w1", 1, 60)[0]
+    assert not queue.release(job.job_id, "w2")
+    assert queue.release(job.job_id, "w1")
+    assert [j.job_id for j in queue.lease("w2", 1, 60)] == [job.job_id]
+
+
+def test_cancel_pending_and_leased(queue):
+    queue.enqueue("zhangsan", "a")
+    queue.enqueue("zhangsan", "b")
+    leased = queue.lease("w1", 1, 60)[0]
+    pending = next(job for job in queue.user_jobs("zhangsan") if job.status == "pending")
+    assert queue.cancel(pending.job_id, "lisi") is None
+    assert queue.cancel(pending.job_id, "zhangsan").status == "pending"
+    assert queue.cancel(leased.job_id, "zhangsan").status == "leased"
+    assert queue.cancel_requests("w1") == [leased.job_id]
+    assert queue.cancel_requests("w2") == []
+    assert [job.cancel_requested for job in queue.user_jobs("zhangsan")] == [True]
+    assert queue.lease("w2", 10, 60) == []
+    queue.ack(leased.job_id, "w1")
+    assert queue.user_jobs("zhangsan") == []
+
+
+def test_cancel_requested_job_not_rerun_after_crash(queue):
+    queue.enqueue("zhangsan", "a")
+    job = queue.lease("w1", 1, 0)[0]
+    queue.cancel(job.job_id, "zhangsan")
+    _expire()
+    assert queue.lease("w2", 1, 60) == []
+    assert queue.stats()["cancelled"] == 1
+
+
+def test_sqlite_queue_shared_between_connections(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    ingress, worker = open_job_queue(f"sqlite:///{path}"), open_job_queue(f"sqlite:///{path}")
+    try:
+        ingress.enqueue("zhangsan", "ping")
+        assert [job.content for job in worker.lease("w1", 1, 60)] == ["ping"]
+        assert ingress.leases()[0].lease_owner == "w1"
+    finally:
+        ingress.close()
+        worker.close()
+
+
+def test_lease_is_fair_and_capped_per_user(queue):
+    for content in ("a1", "a2", "a3", "a4"):
+        queue.enqueue("zhangsan", content)
+    queue.enqueue("lisi", "b1")
+    # 各用户的第 1 条先于任何用户的第 2 条，不按入队顺序
+    first = queue.lease("w1", 3, 60, per_user=2)
+    assert [job.content for job in first] == ["a1", "b1", "a2"]
+    # 上限按所有 worker 上执行中的任务计算
+    assert queue.lease("w2", 10, 60, per_user=2) == []
+    queue.ack(first[0].job_id, "w1")
+    assert [job.content for job in queue.lease("w2", 10, 60, per_user=2)] == ["a3"]
+
+
+def test_open_job_queue_rejects_unknown_scheme():
+    with pytest.raises(ValueError):
+        open_job_queue("redis://localhost")
+
+
+def test_worker_runs_jobs_and_honours_cancel():
+    async def run():
+        queue = MemoryJobQueue()
+        done, started = [], asyncio.Event()
+
+        async def run_command(user_id: str, content: str) -> None:
+            if content == "slow":
+                started.set()
+                await asyncio.Event().wait()
+            done.append(content)
+
+        worker = JobWorker(queue, run_command, concurrency=2, poll_interval=0.01, owner="w1")
+        runner = asyncio.create_task(worker.run_forever(grace=1))
+        queue.enqueue("zhangsan", "slow")
+        queue.enqueue("zhangsan", "ping")
+        await asyncio.wait_for(started.wait(), 1)
+
+        wecom, router = FakeWeCom(), CommandRouter()
+        QueuedTaskCommands(queue).register_commands(router)
+        await router.dispatch(wecom.context(content="tasks"))
+        await router.dispatch(wecom.context(content="cancel all"))
+        while queue.user_jobs("zhangsan"):
+            await asyncio.sleep(0.01)
+        worker.stop()
+        await runner
+        return done, wecom.texts, queue.stats()
+
+    done, texts, stats = asyncio.run(run())
+    assert done == ["ping"]
+    assert texts[0].startswith("执行中的任务:\n#1 slow 执行中")
+    assert texts[1] == "任务 #1 slow 正在取消"
+    assert stats["leased"] == 0
+
+
+def test_worker_releases_running_jobs_on_stop():
+    async def run():
+        queue = MemoryJobQueue()
+        started = asyncio.Event()
+
+        async def run_command(user_id: str, content: str) -> None:
+            started.set()
+            await asyncio.Event().wait()
+
+        worker = JobWorker(queue, run_command, poll_interval=0.01, owner="w1")
+        runner = asyncio.create_task(worker.run_forever(grace=0.01))
+        queue.enqueue("zhangsan", "slow")
+        await asyncio.wait_for(started.wait(), 1)
+        worker.stop()
+        await runner
+        return queue
+
+    queue = asyncio.run(run())
+    assert [job.status for job in queue.user_jobs("zhangsan")] == ["pending"]
+
+
+def test_worker_limits_running_jobs_per_user():
+    async def run():
+        queue = MemoryJobQueue()
+        running: dict[str, int] = {}
+        peak: dict[str, int] = {}
+
+        async def run_command(user_id: str, content: str) -> None:
+            running[user_id] = running.get(user_id, 0) + 1
+            peak[user_id] = max(peak.get(user_id, 0), running[user_id])
+            await asyncio.sleep(0.02)
+            running[user_id] -= 1
+
+        for i in range(6):
+            queue.enqueue("zhangsan", f"job {i}")
+        queue.enqueue("lisi", "ping")
+        worker = JobWorker(queue, run_command, concurrency=8, poll_interval=0.01, owner="w1", per_user_concurrency=2)
+        runner = asyncio.create_task(worker.run_forever(grace=1))
+        while queue.user_jobs("zhangsan") or queue.user_jobs("lisi"):
+            await asyncio.sleep(0.01)
+        worker.stop()
+        await runner
+        return peak
+
+    assert asyncio.run(run()) == {"zhangsan": 2, "lisi": 1}
@@ -0,0 +1,150 @@
+import asyncio
+import datetime as dt
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.command_router import CommandRouter
+from app.job_scheduler import CronSpec, JobScheduler, ScheduledJob
+from app.messages import TextMessage
+from tests.fakes import FakeWeCom
+
+TZ = ZoneInfo("Asia/Shanghai")
+
+
+def _scheduler(tmp_path, fired: list | None = None, **kwargs) -> JobScheduler:
+    async def fire_message(user_id, message):
+        fired.append((user_id, message))
+
+    return JobScheduler(
+        fire_command=lambda user_id, command: fired.append((user_id, command)),
+        fire_message=fire_message,
+        store_path=str(tmp_path / "schedules.db"),
+        tz=TZ,
+        **kwargs,
+    )
+
+
+def test_cron_next_after():
+    weekday_morning = CronSpec("0 9 * * 1-5")
+    friday = dt.datetime(2026, 10, 16, 9, 0, tzinfo=TZ)
+    assert weekday_morning.next_after(friday) == dt.datetime(2026, 10, 19, 9, 0, tzinfo=TZ)
+    every_15 = CronSpec("*/15 * * * *")
+    assert every_15.next_after(dt.datetime(2026, 10, 19, 10, 7, 30, tzinfo=TZ)).minute == 15
+    # 日和周都指定时满足其一即可
+    either = CronSpec("0 0 1 * 0")
+    assert either.next_after(dt.datetime(2026, 10, 19, tzinfo=TZ)) == dt.datetime(2026, 10, 25, tzinfo=TZ)
+    assert CronSpec("0 0 * * 7").weekdays == frozenset({0})
+
+
+@pytest.mark.parametrize("expr", ["* * * *", "60 * * * *", "*/0 * * * *", "5-1 * * * *"])
+def test_cron_rejects_invalid(expr):
+    with pytest.raises(ValueError):
+        CronSpec(expr)
+
+
+def test_per_user_limit_and_listing(tmp_path):
+    async def run():
+        scheduler = _scheduler(tmp_path, max_jobs_per_user=2)
+        await scheduler.add("zhangsan", "every 1h", command="time")
+        await scheduler.add("zhangsan", "every 2h", command="ping")
+        await scheduler.add("lisi", "every 1h", command="time")
+        with pytest.raises(ValueError):
+            await scheduler.add("zhangsan", "every 3h", command="echo")
+        removed = await scheduler.remove("1", user_id="lisi")
+        return scheduler, removed
+
+    scheduler, removed = asyncio.run(run())
+    assert not removed
+    assert sorted(job.command for job in scheduler.list_jobs("zhangsan")) == ["ping", "time"]
+    assert len(scheduler) == 3
+
+
+def test_processes_share_the_store(tmp_path):
+    async def run():
+        first, second = _scheduler(tmp_path), _scheduler(tmp_path)
+        a = await first.add("zhangsan", "every 1h", command="time")
+        b = await second.add("lisi", "cron 0 9 * * *", message=TextMessage("早上好"))
+        await second.remove(a.job_id)
+        return a, b, first
+
+    a, b, first = asyncio.run(run())
+    assert a.job_id != b.job_id
+    assert [job.job_id for job in first.list_jobs()] == [b.job_id]
+    assert first.list_jobs("lisi")[0].message == TextMessage("早上好")
+
+
+def test_interval_aligned_to_creation():
+    scheduler = JobScheduler(lambda user_id, command: None, None, store_path="unused.db")
+    job = ScheduledJob("1", "zhangsan", "every 1m", command="time", created_at=1000.0)
+    # 各进程、接替的 owner 计算出的下次执行时间相同
+    assert scheduler._next_run(job, 1000.0) == 1060.0
+    assert scheduler._next_run(job, 1130.0) == 1180.0
+
+
+def test_only_owner_fires(tmp_path):
+    async def run():
+        fired_first, fired_second = [], []
+        first = _scheduler(tmp_path, fired_first)
+        second = _scheduler(tmp_path, fired_second)
+        await first.add("zhangsan", "every 1s", command="ping")
+        first.start()
+        await asyncio.sleep(0.1)
+        second.start()
+        await asyncio.sleep(1.2)
+        fired_while_not_owner = list(fired_second)
+        await first.stop()
+        # 原 owner 退出后由另一个进程接替
+        await asyncio.sleep(1.2)
+        await second.stop()
+        return fired_first, fired_while_not_owner, fired_second
+
+    fired_first, fired_while_not_owner, fired_second = asyncio.run(run())
+    assert fired_first == [("zhangsan", "ping")]
+    assert fired_while_not_owner == []
+    assert fired_second and set(fired_second) == {("zhangsan", "ping")}
+
+
+def test_owner_notified_of_changes_by_other_processes(tmp_path):
+    async def run():
+        fired = []
+        owner, other = _scheduler(tmp_path, fired), _scheduler(tmp_path)
+        owner.start()
+        await asyncio.sleep(0.1)
+        kept = await other.add("zhangsan", "every 1s", command="kept")
+        removed = await other.add("lisi", "every 1s", command="removed")
+        await asyncio.sleep(0.1)
+        loaded = sorted(owner._jobs)
+        await other.remove(removed.job_id)
+        await asyncio.sleep(1.1)
+        await owner.stop()
+        return loaded, [kept.job_id, removed.job_id], fired
+
+    loaded, added, fired = asyncio.run(run())
+    # 不轮询：owner 通过通知只读取变化的行
+    assert loaded == sorted(added)
+    assert fired == [("zhangsan", "kept")]
+
+
+def test_imports_legacy_json(tmp_path):
+    (tmp_path / "schedules.json").write_text(
+        '{"next_id": 8, "jobs": [{"job_id": "7", "user_id": "zhangsan", "spec": "every 1h", "command": "time"}]}',
+        encoding="utf-8",
+    )
+    scheduler = _scheduler(tmp_path)
+    assert [(job.job_id, job.command) for job in scheduler.list_jobs("zhangsan")] == [("7", "time")]
+    assert (tmp_path / "schedules.json.imported").exists()
+    assert not (tmp_path / "schedules.json").exists()
+
+
+@pytest.mark.parametrize("command", ["schedule every 1m echo x", "定时 every 1m echo x", "unsch 1", "定时任务"])
+def test_schedule_cannot_create_schedules(tmp_path, command):
+    async def run():
+        scheduler = _scheduler(tmp_path)
+        router = CommandRouter()
+        scheduler.register_commands(router)
+        wecom = FakeWeCom()
+        await router.dispatch(wecom.context(content=f"schedule every 1m {command}"))
+        return wecom.texts, len(scheduler)
+
+    assert asyncio.run(run()) == (["定时任务中不能再管理定时任务"], 0)
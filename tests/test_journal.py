@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from app.command_router import CommandRouter
+from app.journal import MessageJournal, journal_dropped_total
+from tests.fakes import FakeWeCom
+
+
+def _journal(tmp_path, **kwargs) -> MessageJournal:
+    return MessageJournal(path=str(tmp_path / "journal.db"), **kwargs)
+
+
+def test_batches_are_written_in_background(tmp_path):
+    async def run():
+        journal = _journal(tmp_path, batch_size=2, flush_interval=10)
+        journal.start()
+        journal.record("", "zhangsan", "text", content="ping")
+        await asyncio.sleep(0.05)
+        before_batch = journal.query()
+        journal.record("", "zhangsan", "event", event="enter_agent")
+        # 攒够 batch_size 条后立即写入，不等 flush_interval
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if len(journal.query()) == 2:
+                break
+        after_batch = journal.query()
+        await journal.stop()
+        return before_batch, after_batch
+
+    before_batch, after_batch = asyncio.run(run())
+    assert before_batch == []
+    assert [entry.msg_type for entry in after_batch] == ["event", "text"]
+
+
+def test_query_filters_and_order(tmp_path):
+    async def run():
+        journal = _journal(tmp_path)
+        now = time.time()
+        journal.record("corp-a", "zhangsan", "text", content="a1", ts=now - 30)
+        journal.record("corp-a", "zhangsan", "image", ts=now - 20)
+        journal.record("corp-b", "zhangsan", "text", content="b1", ts=now - 10)
+        journal.record("corp-a", "lisi", "text", content="l1", ts=now)
+        await journal.stop()
+        return journal, now
+
+    journal, now = asyncio.run(run())
+    assert [e.content for e in journal.query(tenant="corp-a", user_id="zhangsan", msg_type="text")] == ["a1"]
+    assert [e.content for e in journal.query(msg_type="text", limit=2)] == ["l1", "b1"]
+    assert [e.tenant for e in journal.query(since=now - 15, until=now)] == ["corp-b"]
+
+
+def test_compact_removes_old_entries(tmp_path):
+    async def run():
+        journal = _journal(tmp_path, retention_days=1)
+        journal.record("", "zhangsan", "text", content="old", ts=time.time() - 2 * 86400)
+        journal.record("", "zhangsan", "text", content="new")
+        await journal.flush()
+        return journal, journal.compact()
+
+    journal, deleted = asyncio.run(run())
+    assert deleted == 1
+    assert [e.content for e in journal.query()] == ["new"]
+
+
+def test_full_buffer_drops_and_counts(tmp_path):
+    journal = _journal(tmp_path, max_pending=2)
+    before = journal_dropped_total.value()
+    for i in range(3):
+        journal.record("", "zhangsan", "text", content=str(i))
+    assert journal_dropped_total.value() - before == 1
+
+
+def test_history_shows_own_messages(tmp_path):
+    async def run():
+        journal = _journal(tmp_path)
+        journal.record("corp-a", "zhangsan", "text", content="ping")
+        journal.record("corp-a", "lisi", "text", content="others")
+        journal.record("corp-a", "zhangsan", "event", event="enter_agent")
+        await journal.flush()
+        router, wecom = CommandRouter(), FakeWeCom()
+        journal.register_commands(router)
+        await router.dispatch(wecom.context(content="history 5", tenant="corp-a"))
+        await router.dispatch(wecom.context(content="历史 x", tenant="corp-a"))
+        await journal.stop()
+        return wecom.texts
+
+    history, usage = asyncio.run(run())
+    lines = history.split("\n")
+    assert lines[0] == "最近 2 条消息:"
+    assert lines[1].endswith("[text] ping") and lines[2].endswith("[event] enter_agent")
+    assert usage.startswith("用法: history")
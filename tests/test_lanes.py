@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import pytest
+
+from app.lanes import ExecutorLane, LaneFullError
+
+
+async def _until(predicate) -> None:
+    for _ in range(500):
+        if predicate():
+            return
+        await asyncio.sleep(0.001)
+    raise AssertionError("condition not reached")
+
+
+def test_slow_lane_does_not_delay_fast_lane():
+    async def run():
+        slow, fast = ExecutorLane("upload", 1, 10), ExecutorLane("send", 1, 10)
+        release = threading.Event()
+        try:
+            blocked = [asyncio.create_task(slow.run(release.wait)) for _ in range(3)]
+            await _until(lambda: slow.stats()["active"] == 1)
+            start = time.perf_counter()
+            result = await fast.run(lambda: "sent")
+            elapsed = time.perf_counter() - start
+            release.set()
+            await asyncio.gather(*blocked)
+            await _until(lambda: slow.stats()["active"] == 0)
+            return result, elapsed, slow.stats()
+        finally:
+            release.set()
+            slow.shutdown()
+            fast.shutdown()
+
+    result, elapsed, stats = asyncio.run(run())
+    assert result == "sent"
+    assert elapsed < 0.5
+    assert (stats["active"], stats["queued"]) == (0, 0)
+
+
+def test_rejects_when_queue_full():
+    async def run():
+        lane = ExecutorLane("upload", 1, 1)
+        release = threading.Event()
+        try:
+            running = asyncio.create_task(lane.run(release.wait))
+            await _until(lambda: lane.saturated)
+            queued = asyncio.create_task(lane.run(release.wait))
+            await asyncio.sleep(0)
+            with pytest.raises(LaneFullError):
+                await lane.run(release.wait)
+            release.set()
+            await asyncio.gather(running, queued)
+        finally:
+            release.set()
+            lane.shutdown()
+
+    asyncio.run(run())
+
+
+def test_cancelled_queued_call_is_not_counted():
+    async def run():
+        lane = ExecutorLane("upload", 1, 10)
+        release = threading.Event()
+        try:
+            running = asyncio.create_task(lane.run(release.wait))
+            await _until(lambda: lane.saturated)
+            queued = asyncio.create_task(lane.run(lambda: "never"))
+            await asyncio.sleep(0)
+            queued.cancel()
+            await asyncio.gather(queued, return_exceptions=True)
+            release.set()
+            await running
+            await _until(lambda: lane.stats()["active"] == 0)
+            return lane.stats()["queued"]
+        finally:
+            release.set()
+            lane.shutdown()
+
+    assert asyncio.run(run()) == 0
+
+
+def test_runs_in_caller_context():
+    var = contextvars.ContextVar("var", default="default")
+
+    async def run():
+        lane = ExecutorLane("send", 1, 1)
+        var.set("caller")
+        try:
+            return await lane.run(var.get)
+        finally:
+            lane.shutdown()
+
+    assert asyncio.run(run()) == "caller"
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import pytest
+
+from app.loop_monitor import LoopMonitor, slow_steps_total, stalls_total
+
+
+def test_watch_reports_slow_segments_only():
+    async def handler() -> str:
+        await asyncio.sleep(0.05)
+        time.sleep(0.06)
+        await asyncio.sleep(0)
+        return "ok"
+
+    async def run():
+        monitor = LoopMonitor(threshold=0.05)
+        before = slow_steps_total.value(where="command slow")
+        result = await monitor.watch(handler(), "command slow")
+        return result, slow_steps_total.value(where="command slow") - before
+
+    # 等待 sleep 的时间不计入，只有同步的 time.sleep 计为占用事件循环
+    assert asyncio.run(run()) == ("ok", 1)
+
+
+def test_watch_propagates_cancellation_and_errors():
+    async def run():
+        monitor = LoopMonitor(threshold=0.05)
+        task = asyncio.create_task(monitor.watch(asyncio.sleep(10), "command sleep"))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        async def fail() -> None:
+            await asyncio.sleep(0)
+            raise KeyError("boom")
+
+        with pytest.raises(KeyError):
+            await monitor.watch(fail(), "command fail")
+
+    asyncio.run(run())
+
+
+def test_step_reports_slow_sync_code():
+    monitor = LoopMonitor(threshold=0.01)
+    before = slow_steps_total.value(where="decrypt")
+    with monitor.step("decrypt"):
+        time.sleep(0.02)
+    with monitor.step("decrypt"):
+        pass
+    assert slow_steps_total.value(where="decrypt") - before == 1
+
+
+def test_watchdog_catches_blocked_loop_and_lag_is_measured():
+    async def run():
+        monitor = LoopMonitor(interval=0.01, threshold=0.05)
+        before = stalls_total.value()
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        return stalls_total.value() - before, monitor.quantiles()
+
+    stalls, quantiles = asyncio.run(run())
+    assert stalls == 1
+    assert quantiles[1] >= 0.15
+
+
+def test_disabled_monitor_is_passthrough():
+    async def run():
+        monitor = LoopMonitor(threshold=0)
+        monitor.start()
+        result = await monitor.watch(asyncio.sleep(0, "value"), "command")
+        await monitor.stop()
+        return monitor.enabled, result
+
+    assert asyncio.run(run()) == (False, "value")
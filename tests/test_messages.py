@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from app.messages import (
+    FileMessage,
+    ImageMessage,
+    MarkdownMessage,
+    OutboundMessage,
+    TemplateCardMessage,
+    TextMessage,
+    make_message,
+)
+
+
+def test_cannot_instantiate_base_class():
+    with pytest.raises(TypeError):
+        OutboundMessage()
+
+
+def test_equality_and_hash_follow_type_and_payload():
+    assert TextMessage("hi") == TextMessage("hi")
+    assert TextMessage("hi") != MarkdownMessage("hi")
+    a = TemplateCardMessage({"card_type": "text_notice", "main_title": {"title": "t"}})
+    b = TemplateCardMessage({"main_title": {"title": "t"}, "card_type": "text_notice"})
+    assert a == b and hash(a) == hash(b)
+    assert len({TextMessage("x"), TextMessage("x"), MarkdownMessage("x")}) == 2
+
+
+def test_make_message_round_trip():
+    for message in (TextMessage("hi"), FileMessage("/tmp/report.csv"), ImageMessage("/tmp/a.png")):
+        assert make_message(message.msg_type, message.payload) == message
+    assert make_message("mini_program", {
+        "appid": "wx1", "page": "index", "title": "t", "description": None, "content_item": [],
+    }).msg_type == "miniprogram_notice"
+
+
+@pytest.mark.parametrize("msg_type, payload", [
+    ("unknown", {}),
+    ("text", {"content": 1}),
+    ("text", {"text": "wrong field"}),
+    ("file", {"file_path": ""}),
+    ("news", {"articles": []}),
+    ("template_card", {"main_title": {}}),
+])
+def test_invalid_payload_raises_value_error(msg_type, payload):
+    with pytest.raises(ValueError):
+        make_message(msg_type, payload)
+
+
+def test_media_file_not_checked_at_construction():
+    # 文件在发送时才读取，构造时不检查是否存在
+    assert FileMessage("/nonexistent/file.bin").upload_path == "/nonexistent/file.bin"
+
+
+def test_request_body():
+    body = json.loads(MarkdownMessage("**粗体**").to_request_body("1000002", "zhangsan"))
+    assert body == {"touser": "zhangsan", "msgtype": "markdown", "agentid": "1000002", "markdown": {"content": "**粗体**"}}
+    image = json.loads(ImageMessage("/tmp/a.png").to_request_body("1", "lisi", media_id="m-1"))
+    assert image["image"] == {"media_id": "m-1"}
+    with pytest.raises(ValueError):
+        ImageMessage("/tmp/a.png").to_request_body("1", "lisi")
@@ -0,0 +1,142 @@
+import asyncio
+import itertools
+import os
+import sys
+import time
+
+import pytest
+
+from app.command_router import CommandRouter
+from app.plugins import PluginRegistry, parse_specs
+from tests.fakes import FakeWeCom
+
+_packages = itertools.count(1)
+
+
+def _plugin(text: str, name: str = "cmd") -> str:
+    return (
+        "from app.plugins import command\n\n\n"
+        f'@command("{name}", help="测试指令", aliases=("{name}别名",))\n'
+        "async def handle(arg, ctx):\n"
+        f'    await ctx.notify_text("{text}")\n'
+    )
+
+
+class _FakePool:
+    def __init__(self) -> None:
+        self.recycled = 0
+
+    async def recycle(self) -> None:
+        self.recycled += 1
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    # 每个测试使用不同的包名，避免 sys.modules 中残留的模块互相影响
+    name = f"plugin_pkg_{next(_packages)}"
+    directory = tmp_path / name
+    directory.mkdir()
+    (directory / "__init__.py").write_text("")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield name, directory
+    for module in [m for m in sys.modules if m == name or m.startswith(f"{name}.")]:
+        del sys.modules[module]
+
+
+def _touch_later(path) -> None:
+    # 保证 mtime 与上次不同
+    stamp = time.time() + 10
+    os.utime(path, (stamp, stamp))
+
+
+def test_parse_specs_reads_literal_arguments(tmp_path):
+    path = tmp_path / "mod.py"
+    path.write_text(
+        "from app.plugins import command\n"
+        "import app.plugins as plugins\n"
+        '@command("Report", "生成报表", usage="report <月份>", cpu_bound=True, cache_ttl=60)\n'
+        "async def report(arg, ctx): ...\n"
+        '@plugins.command("ping")\n'
+        "async def ping(arg, ctx): ...\n"
+        "NAME = 'dynamic'\n"
+        "@command(NAME)\n"
+        "async def dynamic(arg, ctx): ...\n",
+        encoding="utf-8",
+    )
+    specs = parse_specs(str(path), "mod")
+    assert [(s.name, s.help, s.usage, s.cpu_bound, s.cache_ttl) for s in specs] == [
+        ("report", "生成报表", "report <月份>", True, 60),
+        ("ping", "", "ping", False, None),
+    ]
+
+
+def test_modules_imported_on_first_use(package):
+    name, directory = package
+    (directory / "first.py").write_text(_plugin("v1"), encoding="utf-8")
+
+    async def run():
+        registry = PluginRegistry(name, reload_interval=0)
+        registry.discover()
+        router, wecom = CommandRouter(plugins=registry), FakeWeCom()
+        await router.dispatch(wecom.context(content="help"))
+        imported_after_help = f"{name}.first" in sys.modules
+        await router.dispatch(wecom.context(content="cmd别名"))
+        return imported_after_help, wecom.texts
+
+    imported_after_help, (help_text, reply) = asyncio.run(run())
+    assert not imported_after_help
+    assert "cmd - 测试指令（cmd别名）" in help_text
+    assert reply == "v1"
+
+
+def test_reload_rescan_and_pool_recycle(package):
+    name, directory = package
+    module = directory / "first.py"
+    module.write_text(_plugin("v1"), encoding="utf-8")
+
+    async def run():
+        registry = PluginRegistry(name, reload_interval=0.01)
+        registry.discover()
+        pool = _FakePool()
+        router, wecom = CommandRouter(plugins=registry, cpu_pool=pool), FakeWeCom()
+        await router.dispatch(wecom.context(content="cmd"))
+
+        module.write_text(_plugin("v2"), encoding="utf-8")
+        _touch_later(module)
+        (directory / "second.py").write_text(_plugin("new", name="added"), encoding="utf-8")
+        await asyncio.sleep(0.02)
+        await router.dispatch(wecom.context(content="cmd"))
+        await router.dispatch(wecom.context(content="added"))
+        recycled = pool.recycled
+
+        os.remove(directory / "second.py")
+        await asyncio.sleep(0.02)
+        await router.dispatch(wecom.context(content="added"))
+        return wecom.texts, recycled, registry.reloads
+
+    texts, recycled, reloads = asyncio.run(run())
+    assert texts[:3] == ["v1", "v2", "new"]
+    assert texts[3].startswith("未知指令: added")
+    # 重新加载后进程池换用新的子进程，新增模块首次导入不需要
+    assert (recycled, reloads) == (1, 1)
+
+
+def test_failed_reload_keeps_previous_handler(package):
+    name, directory = package
+    module = directory / "first.py"
+    module.write_text(_plugin("v1"), encoding="utf-8")
+
+    async def run():
+        registry = PluginRegistry(name, reload_interval=0.01)
+        registry.discover()
+        router, wecom = CommandRouter(plugins=registry), FakeWeCom()
+        await router.dispatch(wecom.context(content="cmd"))
+        module.write_text(_plugin("v2") + "raise RuntimeError('broken')\n", encoding="utf-8")
+        _touch_later(module)
+        await asyncio.sleep(0.02)
+        await router.dispatch(wecom.context(content="cmd"))
+        return wecom.texts, registry.reloads
+
+    texts, reloads = asyncio.run(run())
+    assert texts == ["v1", "v1"]
+    assert reloads == 0
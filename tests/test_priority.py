@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from app.priority import BULK, INTERACTIVE, NORMAL, PriorityGate, check_priority, send_priority, using_priority
+
+
+async def _queue(gate: PriorityGate, order: list, priority: str | None, label: str) -> asyncio.Task:
+    async def send() -> None:
+        async with gate.slot(priority):
+            order.append(label)
+
+    task = asyncio.create_task(send())
+    await asyncio.sleep(0)
+    return task
+
+
+def test_higher_priority_goes_first():
+    async def run():
+        gate, order = PriorityGate(capacity=1, aging=60), []
+        await gate.acquire(NORMAL)
+        tasks = [
+            await _queue(gate, order, BULK, "bulk"),
+            await _queue(gate, order, NORMAL, "normal"),
+            await _queue(gate, order, INTERACTIVE, "interactive-1"),
+            await _queue(gate, order, INTERACTIVE, "interactive-2"),
+        ]
+        gate.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["interactive-1", "interactive-2", "normal", "bulk"]
+
+
+def test_aging_prevents_starvation():
+    async def run():
+        gate, order = PriorityGate(capacity=1, aging=0.01), []
+        await gate.acquire(NORMAL)
+        bulk = await _queue(gate, order, BULK, "bulk")
+        await asyncio.sleep(0.05)
+        interactive = await _queue(gate, order, INTERACTIVE, "interactive")
+        gate.release()
+        await asyncio.gather(bulk, interactive)
+        return order
+
+    assert asyncio.run(run()) == ["bulk", "interactive"]
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+    async def run():
+        gate, order = PriorityGate(capacity=1), []
+        await gate.acquire(NORMAL)
+        cancelled = await _queue(gate, order, INTERACTIVE, "cancelled")
+        waiting = await _queue(gate, order, BULK, "bulk")
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        gate.release()
+        await waiting
+        return order, gate.waiting(), gate._free
+
+    assert asyncio.run(run()) == (["bulk"], 0, 1)
+
+
+def test_default_priority_from_context():
+    async def run():
+        gate, order = PriorityGate(capacity=1, aging=60), []
+        await gate.acquire()
+        with using_priority(BULK):
+            bulk = await _queue(gate, order, None, "bulk")
+        with using_priority(INTERACTIVE):
+            interactive = await _queue(gate, order, None, "interactive")
+        waiting = (gate.waiting(BULK), gate.waiting(INTERACTIVE))
+        gate.release()
+        await asyncio.gather(bulk, interactive)
+        return waiting, order
+
+    waiting, order = asyncio.run(run())
+    assert waiting == (1, 1)
+    assert order == ["interactive", "bulk"]
+    assert send_priority.get() == NORMAL
+
+
+def test_unknown_priority_rejected():
+    with pytest.raises(ValueError):
+        check_priority("urgent")
+    with pytest.raises(ValueError):
+        with using_priority("urgent"):
+            pass
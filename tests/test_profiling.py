@@ -0,0 +1,99 @@
+import asyncio
+import marshal
+import threading
+import tracemalloc
+
+import pytest
+
+from app.loop_monitor import LoopMonitor
+from app.profiling import Profiler, ProfilerBusyError, dump_tasks
+
+
+def _spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sample_collects_thread_stacks_and_rejects_overlap():
+    async def run():
+        profiler = Profiler()
+        stop = threading.Event()
+        worker = threading.Thread(target=_spin, args=(stop,), name="busy worker")
+        worker.start()
+        try:
+            sampling = asyncio.create_task(profiler.sample(0.1, interval=0.005))
+            await asyncio.sleep(0)
+            with pytest.raises(ProfilerBusyError):
+                await profiler.cprofile(0.1)
+            stacks = await sampling
+        finally:
+            stop.set()
+            worker.join()
+        # 上一次分析结束后可以再次开始
+        again = await profiler.sample(0.1)
+        return stacks, again
+
+    stacks, again = asyncio.run(run())
+    lines = stacks.splitlines()
+    assert any(line.startswith("busy_worker;") and "_spin (test_profiling.py:" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert again
+
+
+def test_cprofile_returns_pstats_data():
+    async def run():
+        return await Profiler().cprofile(0.1)
+
+    stats = marshal.loads(asyncio.run(run()))
+    assert any(name == "sleep" for (_file, _line, name) in stats)
+
+
+def test_memory_snapshot_diff():
+    profiler = Profiler()
+    started = profiler.start_tracing()
+    try:
+        assert not profiler.start_tracing()
+        first = profiler.snapshot(limit=5)
+        retained = [bytearray(1024) for _ in range(1000)]
+        second = profiler.snapshot(limit=5)
+    finally:
+        if started:
+            profiler.stop_tracing()
+    assert "diff" not in first
+    assert second["diff"][0]["bytes_diff"] >= 1024 * 1000
+    assert any("test_profiling.py" in where for where in second["diff"][0]["where"])
+    assert retained
+    with pytest.raises(RuntimeError):
+        profiler.snapshot()
+
+
+async def _handle_command_and_notify(event: asyncio.Event) -> None:
+    await _wait_inner(event)
+
+
+async def _wait_inner(event: asyncio.Event) -> None:
+    await event.wait()
+
+
+def test_dump_tasks_filters_and_unwraps_watched_commands():
+    async def run():
+        event = asyncio.Event()
+        monitor = LoopMonitor()
+        plain = asyncio.create_task(_handle_command_and_notify(event), name="plain")
+        watched = asyncio.create_task(monitor.watch(_handle_command_and_notify(event), "cmd"), name="watched")
+        other = asyncio.create_task(asyncio.sleep(10), name="other")
+        await asyncio.sleep(0)
+        dump = dump_tasks("_wait_inner")
+        everything = dump_tasks()
+        event.set()
+        other.cancel()
+        await asyncio.gather(plain, watched, other, return_exceptions=True)
+        return dump, everything
+
+    dump, everything = asyncio.run(run())
+    assert dump.startswith("2 tasks\n")
+    assert "Task plain" in dump and "Task watched" in dump and "Task other" not in dump
+    # 经 LoopMonitor.watch 包装的任务也能展开到最内层的等待
+    watched = dump[dump.index("Task watched"):]
+    assert "in _wait_inner" in watched and "  waiting on " in watched
+    assert everything.startswith("3 tasks\n")
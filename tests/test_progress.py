@@ -0,0 +1,124 @@
+import asyncio
+
+from app.progress import ProgressReporter
+from tests.fakes import FakeClock, FakeWeCom
+
+
+def _reporter(wecom: FakeWeCom, clock: FakeClock, min_interval: float = 10) -> ProgressReporter:
+    return ProgressReporter(wecom.context(), "导出报表", min_interval=min_interval, clock=clock)
+
+
+def test_update_uses_response_code():
+    async def run():
+        wecom, clock = FakeWeCom(), FakeClock()
+        reporter = _reporter(wecom, clock)
+        await reporter.start("准备中")
+        clock.advance(10)
+        await reporter.update("处理中", percent=50)
+        return wecom, reporter
+
+    wecom, reporter = asyncio.run(run())
+    assert len(wecom.sent) == 1
+    assert [code for _user, code, _card in wecom.updated] == ["code-1"]
+    assert "50%" in wecom.updated[0][2]["sub_title_text"]
+    assert (reporter.sent_count, reporter.updated_count) == (1, 1)
+
+
+def test_used_response_code_falls_back_to_recall_and_resend():
+    async def run():
+        wecom, clock = FakeWeCom(update_ok=False), FakeClock()
+        reporter = _reporter(wecom, clock)
+        await reporter.start()
+        clock.advance(10)
+        await reporter.update("处理中")
+        return wecom
+
+    wecom = asyncio.run(run())
+    assert wecom.updated == []
+    assert wecom.recalled == ["msg-1"]
+    assert len(wecom.sent) == 2
+    assert wecom.sent[1][1].payload["sub_title_text"] == "处理中"
+
+
+def test_without_response_code_recalls_old_card():
+    async def run():
+        wecom, clock = FakeWeCom(with_response_code=False), FakeClock()
+        reporter = _reporter(wecom, clock)
+        await reporter.start()
+        clock.advance(10)
+        await reporter.update("第二步")
+        clock.advance(10)
+        await reporter.update("第三步")
+        return wecom
+
+    wecom = asyncio.run(run())
+    assert wecom.recalled == ["msg-1", "msg-2"]
+    assert len(wecom.sent) == 3
+
+
+def test_recall_failure_still_sends_new_card():
+    async def run():
+        wecom, clock = FakeWeCom(update_ok=False, recall_ok=False), FakeClock()
+        reporter = _reporter(wecom, clock)
+        await reporter.start()
+        clock.advance(10)
+        await reporter.update("处理中")
+        return wecom
+
+    wecom = asyncio.run(run())
+    assert wecom.recalled == []
+    assert len(wecom.sent) == 2
+
+
+def test_plain_send_without_update_or_recall():
+    async def run():
+        wecom, clock = FakeWeCom(), FakeClock()
+        ctx = wecom.context()
+        ctx.update_card = ctx.recall_message = None
+        reporter = ProgressReporter(ctx, "导出报表", min_interval=10, clock=clock)
+        await reporter.start()
+        clock.advance(10)
+        await reporter.update("处理中")
+        return wecom
+
+    wecom = asyncio.run(run())
+    assert (wecom.updated, wecom.recalled) == ([], [])
+    assert len(wecom.sent) == 2
+
+
+def test_updates_within_interval_are_coalesced():
+    async def run():
+        wecom, clock = FakeWeCom(), FakeClock()
+        reporter = _reporter(wecom, clock)
+        await reporter.start()
+        # 距离上次发送还差 0.05 秒，期间的多次更新合并为一次
+        clock.advance(9.95)
+        for percent in (10, 20, 30):
+            await reporter.update(percent=percent)
+        assert wecom.updated == []
+        await asyncio.sleep(0.2)
+        return wecom
+
+    wecom = asyncio.run(run())
+    assert len(wecom.updated) == 1
+    assert "30%" in wecom.updated[0][2]["sub_title_text"]
+
+
+def test_finish_is_not_throttled_and_cancels_pending_update():
+    async def run():
+        wecom, clock = FakeWeCom(), FakeClock()
+        reporter = _reporter(wecom, clock)
+        await reporter.start()
+        clock.advance(1)
+        await reporter.update(percent=50)
+        await reporter.finish("完成", percent=100)
+        await asyncio.sleep(0.05)
+        await reporter.update(percent=10)
+        return wecom
+
+    wecom = asyncio.run(run())
+    assert len(wecom.updated) == 1
+    card = wecom.updated[0][2]
+    assert card["main_title"]["desc"] == "已完成"
+    assert "100%" in card["sub_title_text"]
+    assert card["button_list"][0]["text"] == "已结束"
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import time
+
+from app.journal import MessageJournal
+from app.replay import Sanitizer, StubSender, _format_report, main, percentiles, read_service_log, replay
+
+
+def test_sanitizer_masks_users_and_arguments():
+    sanitizer = Sanitizer()
+    assert sanitizer.user("zhangsan") == "user1"
+    assert sanitizer.user("lisi") == "user2"
+    assert sanitizer.user("zhangsan") == "user1"
+    assert sanitizer.content(" echo 手机 13800000000, ok ") == "echo xx xxxxxxxxxxx, xx"
+    assert sanitizer.content("help") == "help"
+    assert Sanitizer(keep_args=True).content("echo 13800000000") == "echo 13800000000"
+
+
+def test_record_from_journal(tmp_path):
+    journal = MessageJournal(path=str(tmp_path / "journal.db"))
+    journal.record("", "zhangsan", "text", content="echo secret", ts=1000.0)
+    journal.record("", "lisi", "image", ts=1001.0)
+    journal.record("", "lisi", "event", content="cmd:time", ts=1002.5)
+    journal.record("", "lisi", "event", content="enter_agent", ts=1003.0)
+    journal.record("", "zhangsan", "text", content="ping", ts=1004.0)
+    asyncio.run(journal.stop())
+
+    output = tmp_path / "trace.jsonl"
+    main(["record", "--journal", str(tmp_path / "journal.db"), "--until", "1004", "-o", str(output)])
+    trace = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert trace == [
+        {"t": 0.0, "user": "user1", "content": "echo xxxxxx"},
+        {"t": 2.5, "user": "user2", "content": "time"},
+    ]
+
+
+def test_read_service_log(tmp_path):
+    path = tmp_path / "service.log"
+    path.write_text(
+        "2026-10-19 09:00:00,250 [INFO] assistant - Received message ping from zhangsan at 1760835600\n"
+        "2026-10-19 09:00:01,000 [INFO] assistant - Command done\n"
+        "2026-10-19 09:00:02,500 [INFO] assistant - Received message echo 你好 from lisi at 1760835602\n",
+        encoding="utf-8",
+    )
+    rows = list(read_service_log(str(path), None, None))
+    assert [(user, content) for _ts, user, content in rows] == [("zhangsan", "ping"), ("lisi", "echo 你好")]
+    assert round(rows[1][0] - rows[0][0], 3) == 2.25
+
+
+def test_percentiles_and_report_comparison():
+    stats = percentiles([0.01, 0.02, 0.03, 0.04])
+    assert stats == {"count": 4, "p50_ms": 30.0, "p90_ms": 40.0, "p99_ms": 40.0, "max_ms": 40.0, "mean_ms": 25.0}
+    assert percentiles([]) == {"count": 0}
+    result = {
+        "messages": 4, "speed": 0, "wall_seconds": 1.0, "incomplete": 0, "http_status": {"200": 4},
+        "callback": stats, "commands": {"ping": stats},
+    }
+    baseline = {"callback": {**stats, "p50_ms": 15.0}, "commands": {}}
+    report = _format_report(result, baseline)
+    assert "30.0(+100%)" in report.splitlines()[2]
+    assert report.splitlines()[3].startswith("ping")
+
+
+def test_stub_sender_covers_the_sender_calls_used_by_the_service():
+    stub = StubSender("1000001", latency=0)
+    assert stub.upload_image("chart.png").startswith("https://")
+    assert stub.get_user_info("user1")["userid"] == "user1"
+    assert stub.calls == {"upload_image": 1, "get_user_info": 1}
+
+
+def test_replay_trace_in_process(tmp_path, monkeypatch):
+    # replay 会改写这些环境变量，由 monkeypatch 在测试结束后还原
+    for key in (
+            "APP_ROLE", "WECOM_TOKEN", "WECOM_CORP_ID", "WECOM_ENCODING_AES_KEY", "WECOM_AGENT_ID",
+            "WECOM_AGENT_SECRET", "WECOM_TENANTS_FILE", "JOURNAL_FILE", "SCHEDULE_FILE",
+    ):
+        monkeypatch.setenv(key, "")
+    monkeypatch.setenv("LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("IMAGE_CACHE_DIR", str(tmp_path / "image_cache"))
+    monkeypatch.setenv("CPU_POOL_SIZE", "1")
+    monkeypatch.setenv("IMAGE_POOL_SIZE", "1")
+    trace = [
+        {"t": 0.0, "user": "user1", "content": "ping"},
+        {"t": 30.0, "user": "user2", "content": "echo xx"},
+    ]
+
+    start = time.perf_counter()
+    result = asyncio.run(replay(trace, speed=0, send_latency=0.001, drain=5))
+    # speed 0 不按录制时间等待
+    assert time.perf_counter() - start < 20
+    assert result["messages"] == 2 and result["incomplete"] == 0
+    assert result["http_status"] == {"200": 2}
+    assert set(result["commands"]) == {"ping", "echo"}
+    assert all(row["count"] == 1 for row in result["commands"].values())
+    assert result["sender_calls"]["send_text"] == 2
+    report = _format_report(result, result).splitlines()
+    assert [line.split()[0] for line in report[2:]] == ["(callback)", "echo", "ping"]
+    assert "(+0%)" in report[3]
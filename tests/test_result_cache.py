@@ -0,0 +1,115 @@
+import asyncio
+
+from app.command_router import CommandContext, CommandRouter
+from app.messages import TextMessage
+from app.result_cache import ResultCache
+from tests.fakes import FakeWeCom
+
+
+def test_single_flight_runs_producer_once():
+    async def run():
+        cache, calls = ResultCache(), []
+
+        async def produce():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return [TextMessage("ok")]
+
+        results = await asyncio.gather(*(cache.get_or_run("k", 60, produce) for _ in range(5)))
+        again = await cache.get_or_run("k", 60, produce)
+        return cache, calls, results, again
+
+    cache, calls, results, again = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == [TextMessage("ok")] for result in results)
+    assert again == [TextMessage("ok")]
+    assert (cache.misses, cache.hits) == (1, 5)
+
+
+def test_ttl_expiry_and_lru_eviction():
+    async def run():
+        cache = ResultCache(max_entries=2)
+
+        async def produce():
+            return [TextMessage("v")]
+
+        await cache.get_or_run("short", 0.01, produce)
+        await asyncio.sleep(0.02)
+        expired = cache.get("short") is None
+        for key in ("a", "b"):
+            await cache.get_or_run(key, 60, produce)
+        cache.get("a")
+        await cache.get_or_run("c", 60, produce)
+        return expired, cache
+
+    expired, cache = asyncio.run(run())
+    assert expired
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_one_waiter_cancelled_does_not_cancel_others():
+    async def run():
+        cache = ResultCache()
+
+        async def produce():
+            await asyncio.sleep(0.02)
+            return [TextMessage("ok")]
+
+        first = asyncio.create_task(cache.get_or_run("k", 60, produce))
+        second = asyncio.create_task(cache.get_or_run("k", 60, produce))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == [TextMessage("ok")]
+
+
+def test_producer_cancelled_when_all_waiters_leave():
+    async def run():
+        cache, state = ResultCache(), {"cancelled": False, "calls": 0}
+
+        async def produce():
+            state["calls"] += 1
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                state["cancelled"] = True
+                raise
+            return []
+
+        waiter = asyncio.create_task(cache.get_or_run("k", 60, produce))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+
+        async def quick():
+            state["calls"] += 1
+            return [TextMessage("new")]
+
+        result = await cache.get_or_run("k", 60, quick)
+        return state, result
+
+    state, result = asyncio.run(run())
+    assert state == {"cancelled": True, "calls": 2}
+    assert result == [TextMessage("new")]
+
+
+def test_router_caches_per_tenant():
+    async def run():
+        calls = []
+
+        async def handler(arg: str, ctx: CommandContext) -> None:
+            calls.append(ctx.tenant)
+            await ctx.notify_text(f"{ctx.tenant} {arg}")
+
+        router = CommandRouter()
+        router.register("report", handler, cache_ttl=60)
+        wecom = FakeWeCom()
+        for tenant in ("corp-a", "corp-a", "corp-b"):
+            await router.dispatch(wecom.context(content="report x", tenant=tenant))
+        return calls, wecom.texts
+
+    calls, texts = asyncio.run(run())
+    assert calls == ["corp-a", "corp-b"]
+    assert texts == ["corp-a x", "corp-a x", "corp-b x"]
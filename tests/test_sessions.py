@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app.command_router import CommandContext, CommandRouter
+from app.sessions import Session, SessionStore, sessions_evicted_total
+from tests.fakes import FakeWeCom
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = SessionStore(path="" if request.param == "memory" else str(tmp_path / "sessions.db"), ttl=60)
+    yield store
+    store.close()
+
+
+def test_save_get_delete(store):
+    async def run():
+        await store.save(Session("zhangsan", command="order", step="confirm", data={"item": "咖啡"}))
+        loaded = await store.get("zhangsan")
+        await store.delete("zhangsan")
+        return loaded, await store.get("zhangsan")
+
+    loaded, deleted = asyncio.run(run())
+    assert (loaded.command, loaded.step, loaded.data) == ("order", "confirm", {"item": "咖啡"})
+    assert loaded.size > 0
+    assert deleted is None
+
+
+def test_sessions_expire(store):
+    async def run():
+        await store.save(Session("zhangsan"), ttl=0.01)
+        await asyncio.sleep(0.02)
+        return await store.get("zhangsan"), store.report()["active"]
+
+    assert asyncio.run(run()) == (None, 0)
+
+
+def test_memory_store_evicts_least_recently_used():
+    async def run():
+        store = SessionStore(max_sessions=2)
+        before = sessions_evicted_total.value(reason="size")
+        await store.save(Session("a"))
+        await store.save(Session("b"))
+        await store.get("a")
+        await store.save(Session("c"))
+        report = store.report()
+        return (
+            [key for key in ("a", "b", "c") if await store.get(key)],
+            sessions_evicted_total.value(reason="size") - before,
+            report,
+        )
+
+    kept, evicted, report = asyncio.run(run())
+    assert kept == ["a", "c"]
+    assert evicted == 1
+    assert report["active"] == 2 and report["bytes"] == sum(s["bytes"] for s in report["sessions"])
+
+
+async def _order(arg: str, ctx: CommandContext) -> None:
+    await ctx.continue_with("order.confirm", {"item": arg})
+    await ctx.notify_text(f"确认购买 {arg}？回复 是/否")
+
+
+async def _confirm(text: str, ctx: CommandContext) -> None:
+    session = await ctx.session()
+    if text == "是":
+        await ctx.end_session()
+        await ctx.notify_text(f"已下单 {session.data['item']}")
+    else:
+        await ctx.continue_with("order.confirm")
+        await ctx.notify_text("请回复 是 或 否")
+
+
+def test_continuation_flow_and_builtins_during_session():
+    async def run():
+        router = CommandRouter(sessions=SessionStore())
+        router.register("order", _order)
+        router.register_continuation("order.confirm", _confirm)
+        wecom = FakeWeCom()
+        for content in ("order 咖啡", "也许", "help", "是", "是"):
+            await router.dispatch(wecom.context(content=content))
+        other = FakeWeCom()
+        await router.dispatch(other.context(content="order 茶", tenant="corp-b"))
+        await router.dispatch(other.context(content="退出", tenant="corp-b"))
+        return wecom.texts, other.texts
+
+    texts, other = asyncio.run(run())
+    assert texts[:2] == ["确认购买 咖啡？回复 是/否", "请回复 是 或 否"]
+    # 会话进行中 help 仍按指令处理，不作为续接输入
+    assert texts[2].startswith("可用指令:")
+    assert texts[3] == "已下单 咖啡"
+    assert texts[4].startswith("未知指令: 是")
+    assert other == ["确认购买 茶？回复 是/否", "已退出"]
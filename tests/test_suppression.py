@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from app.messages import MarkdownMessage, TextMessage
+from app.suppression import OutboundSuppressor, evicted_total
+
+
+class _Summaries:
+    def __init__(self) -> None:
+        self.sent: list[tuple[str, str, str]] = []
+
+    async def __call__(self, tenant: str, to_user: str, message) -> None:
+        self.sent.append((tenant, to_user, message.payload["content"]))
+
+
+def test_duplicates_suppressed_and_summarised_after_window():
+    async def run():
+        summaries = _Summaries()
+        suppressor = OutboundSuppressor(summaries, window=0.05)
+        results = [suppressor.allow("", "zhangsan", TextMessage("磁盘告警")) for _ in range(4)]
+        await asyncio.sleep(0.1)
+        after_window = suppressor.allow("", "zhangsan", TextMessage("磁盘告警"))
+        return results, after_window, summaries.sent
+
+    results, after_window, sent = asyncio.run(run())
+    assert results == [True, False, False, False]
+    assert after_window
+    assert sent == [("", "zhangsan", "上一条text消息在 0.05 秒内重复 ×3，已省略: 磁盘告警")]
+
+
+def test_fingerprint_distinguishes_tenant_user_and_type():
+    async def run():
+        suppressor = OutboundSuppressor(_Summaries(), window=60)
+        return [
+            suppressor.allow("", "zhangsan", TextMessage("hi")),
+            suppressor.allow("", "lisi", TextMessage("hi")),
+            suppressor.allow("corp-b", "zhangsan", TextMessage("hi")),
+            suppressor.allow("", "zhangsan", MarkdownMessage("hi")),
+            suppressor.allow("", "zhangsan", TextMessage("hi!")),
+        ]
+
+    assert asyncio.run(run()) == [True] * 5
+
+
+def test_drop_mode_sends_no_summary():
+    async def run():
+        summaries = _Summaries()
+        suppressor = OutboundSuppressor(summaries, window=60, mode="drop")
+        suppressor.allow("", "zhangsan", TextMessage("x"))
+        suppressor.allow("", "zhangsan", TextMessage("x"))
+        await suppressor.flush()
+        return summaries.sent, len(suppressor)
+
+    assert asyncio.run(run()) == ([], 0)
+
+
+def test_flush_sends_pending_summaries():
+    async def run():
+        summaries = _Summaries()
+        suppressor = OutboundSuppressor(summaries, window=60)
+        for _ in range(3):
+            suppressor.allow("", "zhangsan", TextMessage("x"))
+        await suppressor.flush()
+        return summaries.sent
+
+    assert [text for _tenant, _user, text in asyncio.run(run())] == ["上一条text消息在 60 秒内重复 ×2，已省略: x"]
+
+
+def test_bounded_entries_evict_oldest():
+    async def run():
+        suppressor = OutboundSuppressor(_Summaries(), window=60, max_entries=2)
+        before = evicted_total.value()
+        for text in ("a", "b", "c"):
+            suppressor.allow("", "zhangsan", TextMessage(text))
+        return len(suppressor), evicted_total.value() - before, suppressor.allow("", "zhangsan", TextMessage("a"))
+
+    assert asyncio.run(run()) == (2, 1, True)
+
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        OutboundSuppressor(_Summaries(), window=60, mode="merge")
@@ -0,0 +1,97 @@
+import asyncio
+
+from app.command_router import CommandContext, CommandRouter
+from tests.fakes import FakeWeCom
+
+
+async def _wait_forever(arg: str, ctx: CommandContext) -> None:
+    ctx.set_progress("第 1 步")
+    await asyncio.Event().wait()
+
+
+def _router(task_timeout: float | None = None) -> CommandRouter:
+    router = CommandRouter(task_timeout=task_timeout)
+    router.register("slow", _wait_forever, help="一直执行")
+    return router
+
+
+async def _started(router: CommandRouter, count: int = 1) -> None:
+    # 等到 handler 已开始执行（设置了进度）
+    while len([info for info in router.tasks.list_tasks() if info.progress]) < count:
+        await asyncio.sleep(0)
+
+
+def test_timeout_stops_handler_and_notifies():
+    async def run():
+        wecom, router = FakeWeCom(), _router(task_timeout=0.05)
+        await router.dispatch(wecom.context(content="slow"))
+        return wecom, router
+
+    wecom, router = asyncio.run(run())
+    assert wecom.texts == ["任务 #1 slow 执行超时（0.05 秒），已终止"]
+    assert len(router.tasks) == 0
+
+
+def test_tasks_lists_running_commands_with_progress():
+    async def run():
+        wecom, router = FakeWeCom(), _router()
+        task = asyncio.create_task(router.dispatch(wecom.context(content="slow 参数")))
+        await _started(router)
+        await router.dispatch(wecom.context(content="tasks"))
+        await router.dispatch(wecom.context(content="cancel all"))
+        await task
+        return wecom, router
+
+    wecom, router = asyncio.run(run())
+    listing, cancelled = wecom.texts
+    assert listing.startswith("执行中的任务:\n#1 slow 已运行 0 秒")
+    assert "进度 第 1 步" in listing
+    assert cancelled == "任务 #1 slow 已取消"
+    assert len(router.tasks) == 0
+
+
+def test_cancel_only_own_tasks():
+    async def run():
+        wecom, router = FakeWeCom(), _router()
+        task = asyncio.create_task(router.dispatch(wecom.context(user_id="zhangsan", content="slow")))
+        await _started(router)
+        await router.dispatch(wecom.context(user_id="lisi", content="cancel 1"))
+        await router.dispatch(wecom.context(user_id="lisi", content="tasks"))
+        still_running = not task.done()
+        await router.dispatch(wecom.context(user_id="zhangsan", content="取消 #1"))
+        await task
+        return wecom, still_running
+
+    wecom, still_running = asyncio.run(run())
+    assert still_running
+    assert wecom.texts == ["未找到任务: 1", "当前没有执行中的任务", "任务 #1 slow 已取消"]
+
+
+def test_tasks_are_scoped_by_tenant():
+    async def run():
+        wecom, router = FakeWeCom(), _router()
+        task = asyncio.create_task(router.dispatch(wecom.context(content="slow", tenant="corp-a")))
+        await _started(router)
+        await router.dispatch(wecom.context(content="cancel all", tenant="corp-b"))
+        await router.dispatch(wecom.context(content="cancel all", tenant="corp-a"))
+        await task
+        return wecom
+
+    assert asyncio.run(run()).texts == ["未找到任务: all", "任务 #1 slow 已取消"]
+
+
+def test_run_subprocess_is_killed_on_timeout():
+    async def handler(arg: str, ctx: CommandContext) -> None:
+        await ctx.run_subprocess("sleep", "5")
+
+    async def run():
+        wecom, router = FakeWeCom(), CommandRouter(task_timeout=0.1)
+        router.register("sleep", handler)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await router.dispatch(wecom.context(content="sleep"))
+        return wecom, loop.time() - start
+
+    wecom, elapsed = asyncio.run(run())
+    assert elapsed < 2
+    assert "执行超时" in wecom.texts[0]
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.command_router import CommandContext, CommandRouter, scope_user_id, split_scoped_user_id
+from app.priority import PriorityGate
+from app.tenants import RateLimiter, Tenant, TenantConfig, TenantRegistry
+from tests.fakes import FakeWeCom
+
+
+def _config(**overrides) -> dict:
+    return {"name": "corp-a", "corp_id": "ww1", "token": "t", "agent_id": "1000001", **overrides}
+
+
+def test_config_validation():
+    config = TenantConfig.from_dict(_config(commands=["Ping", "time"], rate_limit="5"))
+    assert config.commands == frozenset({"ping", "time"})
+    assert config.rate_limit == 5.0
+    for bad in (_config(name="a/b"), _config(corp_id=""), _config(token=None)):
+        with pytest.raises(ValueError):
+            TenantConfig.from_dict(bad)
+
+
+def test_registry_lookup_and_duplicates(tmp_path):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps({"tenants": [_config(), _config(name="corp-b", agent_id="1000002")]}))
+    registry = TenantRegistry()
+    registry.load(str(path))
+    assert len(registry) == 2
+    assert registry.get("corp-b").config.agent_id == "1000002"
+    assert registry.by_agent_id("1000001").name == "corp-a"
+    with pytest.raises(ValueError):
+        registry.add(Tenant(TenantConfig.from_dict(_config(name="corp-c"))))
+    with pytest.raises(ValueError):
+        registry.add(Tenant(TenantConfig.from_dict(_config(agent_id="1000009"))))
+
+
+def test_scoped_user_id_round_trip():
+    scoped = scope_user_id("corp-a", "zhangsan")
+    assert scoped != "zhangsan"
+    assert split_scoped_user_id(scoped) == ("corp-a", "zhangsan")
+    assert scope_user_id("", "zhangsan") == "zhangsan"
+    assert split_scoped_user_id("zhangsan") == ("", "zhangsan")
+
+
+def test_rate_limiter_allows_burst_then_paces():
+    async def run():
+        limiter = RateLimiter(rate=20, burst=3)
+        start = time.monotonic()
+        for _ in range(3):
+            await limiter.acquire()
+        burst = time.monotonic() - start
+        for _ in range(2):
+            await limiter.acquire()
+        return burst, time.monotonic() - start
+
+    burst, total = asyncio.run(run())
+    assert burst < 0.02
+    assert total >= 0.09
+
+
+def test_throttled_tenant_does_not_hold_send_slots():
+    async def send(tenant: Tenant, gate: PriorityGate, sent: list) -> None:
+        async with tenant.send_slot(gate):
+            sent.append((tenant.name, time.monotonic()))
+
+    async def run():
+        gate, sent = PriorityGate(capacity=1), []
+        throttled = Tenant(TenantConfig.from_dict(_config(rate_limit=2, rate_burst=1)))
+        free = Tenant(TenantConfig.from_dict(_config(name="corp-b", agent_id="1000002")))
+        start = time.monotonic()
+        # 第一条用掉令牌，后两条各需等待 0.5 秒
+        waiting = [asyncio.create_task(send(throttled, gate, sent)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        await send(free, gate, sent)
+        await asyncio.gather(*waiting)
+        return [(name, at - start) for name, at in sent]
+
+    sent = asyncio.run(run())
+    assert [name for name, _at in sent] == ["corp-a", "corp-b", "corp-a", "corp-a"]
+    assert sent[1][1] < 0.2
+    assert sent[-1][1] >= 0.9
+
+
+def test_dispatch_restricts_commands_per_tenant():
+    async def ping(arg: str, ctx: CommandContext) -> None:
+        await ctx.notify_text("pong")
+
+    async def run():
+        router = CommandRouter()
+        router.register("ping", ping)
+        router.register("admin", ping)
+        wecom = FakeWeCom()
+        allowed = frozenset({"ping"})
+        await router.dispatch(wecom.context(content="ping", tenant="corp-a"), commands=allowed)
+        await router.dispatch(wecom.context(content="admin", tenant="corp-a"), commands=allowed)
+        await router.dispatch(wecom.context(content="tasks", tenant="corp-a"), commands=allowed)
+        return wecom.texts
+
+    pong, unknown, tasks = asyncio.run(run())
+    assert pong == "pong"
+    assert unknown.startswith("未知指令: admin")
+    assert tasks == "当前没有执行中的任务"
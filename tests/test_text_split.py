@@ -0,0 +1,69 @@
+from app.text_split import TRUNCATED_NOTICE, split_message
+
+
+def _size(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def test_short_text_unchanged():
+    assert split_message("你好", 10) == ["你好"]
+    assert split_message("a" * 10, 10) == ["a" * 10]
+
+
+def test_long_line_splits_on_utf8_boundaries():
+    text = "中文😀" * 200
+    chunks = split_message(text, 100)
+    assert all(_size(chunk) <= 100 for chunk in chunks)
+    assert "".join(chunks) == text
+
+
+def test_prefers_line_boundaries():
+    lines = [f"第{i:02d}行" + "x" * 20 for i in range(20)]
+    chunks = split_message("\n".join(lines), 120)
+    assert all(_size(chunk) <= 120 for chunk in chunks)
+    assert [line for chunk in chunks for line in chunk.split("\n")] == lines
+
+
+def test_markdown_prefers_paragraph_boundaries():
+    paragraphs = ["\n".join(f"p{p} 行{i}" for i in range(4)) for p in range(6)]
+    chunks = split_message("\n\n".join(paragraphs), 80, markdown=True)
+    assert len(chunks) > 1
+    assert all(_size(chunk) <= 80 for chunk in chunks)
+    for chunk in chunks:
+        # 每段只包含完整的段落
+        assert chunk.strip().split("\n\n") == [p for p in paragraphs if p in chunk]
+
+
+def test_markdown_reopens_cut_code_fence():
+    code = "\n".join(f"print({i})" for i in range(40))
+    text = f"说明\n\n```python\n{code}\n```\n结尾"
+    chunks = split_message(text, 120, markdown=True)
+    assert len(chunks) > 2
+    assert all(_size(chunk) <= 120 for chunk in chunks)
+    for chunk in chunks:
+        # 每段中的代码块都是闭合的
+        assert chunk.count("```") % 2 == 0
+    assert chunks[1].startswith("```python\n")
+    assert chunks[-1].endswith("结尾")
+
+
+def test_reopened_long_fence_counted_in_budget():
+    opener = "```" + "x" * 70
+    code = "\n".join("y" * 200 for _ in range(3))
+    chunks = split_message(f"{opener}\n{code}\n```", 120, markdown=True)
+    assert all(_size(chunk) <= 120 for chunk in chunks)
+    assert chunks[0].startswith(opener + "\n")
+    # 语言标注过长时续段只用 ``` 重新打开
+    assert all(chunk.startswith("```\n") for chunk in chunks[1:])
+    assert "".join(chunk.split("\n", 1)[1].removesuffix("\n```") for chunk in chunks).count("y") == 600
+
+
+def test_max_parts_truncates_with_notice():
+    lines = [f"第{i:02d}行" + "x" * 20 for i in range(40)]
+    text = "\n".join(lines)
+    assert len(split_message(text, 120)) > 3
+    chunks = split_message(text, 120, max_parts=3)
+    assert len(chunks) == 3
+    assert chunks[-1] == TRUNCATED_NOTICE
+    assert chunks[:2] == split_message(text, 120)[:2]
+    assert split_message("短", 120, max_parts=1) == ["短"]